@@ -7,6 +7,7 @@ AI小说工具启动脚本
 import os
 import sys
 import traceback
+import multiprocessing
 
 
 def main():
@@ -30,4 +31,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包后的程序在子进程（EPUB并行分割）中需要先调用 freeze_support
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
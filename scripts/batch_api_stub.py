@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+批处理接口本地替身服务（不依赖网络）：离线测试 src/core/novel_condenser/batch_api.py
+
+- OpenAI：POST /v1/files、POST /v1/batches、GET /v1/batches/<id>、GET /v1/files/<id>/content
+- Gemini：POST /v1beta/models/<model>:batchGenerateContent、GET /v1beta/batches/<id>
+- 同时提供同步接口 /v1/chat/completions 与 :generateContent，供密钥验证使用
+- 任务在 --delay 秒后完成；"脱水"结果为原文的前 40%（至少300字），--fail-rate 按比例返回错误
+
+用法：
+    python scripts/batch_api_stub.py --port 18780 --delay 3
+    # api_keys.json 中的 redirect_url：
+    #   OpenAI: http://127.0.0.1:18780/v1
+    #   Gemini: http://127.0.0.1:18780/v1beta/models/
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_lock = threading.Lock()
+_files: dict = {}      # file_id -> bytes
+_batches: dict = {}    # batch_id -> dict
+
+
+def _condense(text: str) -> str:
+    return text[:max(300, int(len(text) * 0.4))]
+
+
+def _openai_response(body: dict) -> dict:
+    messages = body.get("messages") or []
+    text = _condense(messages[-1]["content"] if messages else "")
+    return {"object": "chat.completion", "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]}
+
+
+def _gemini_response(body: dict) -> dict:
+    parts = (body.get("contents") or [{}])[0].get("parts") or []
+    text = _condense(parts[-1].get("text", "") if parts else "")
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 3.0
+    fail_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload, content_type: str = "application/json") -> None:
+        data = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        if self.headers.get("Authorization", "").startswith("Bearer ") or self.headers.get("x-goog-api-key"):
+            return True
+        self._send(401, {"error": {"message": "missing api key"}})
+        return False
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _progress(self, batch: dict) -> float:
+        return (time.time() - batch["created_at"]) / self.delay if self.delay > 0 else 1.0
+
+    def _failed(self) -> bool:
+        return random.random() < self.fail_rate
+
+    # OpenAI ------------------------------------------------------------------
+
+    def _upload_file(self) -> None:
+        raw = self._read_body()
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw)
+        content = b""
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                content = part.get_payload(decode=True)
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        with _lock:
+            _files[file_id] = content
+        self._send(200, {"id": file_id, "object": "file", "bytes": len(content), "purpose": "batch"})
+
+    def _create_openai_batch(self) -> None:
+        body = json.loads(self._read_body())
+        lines = _files.get(body.get("input_file_id"))
+        if lines is None:
+            self._send(404, {"error": {"message": "input file not found"}})
+            return
+        requests = [json.loads(line) for line in lines.decode("utf-8").splitlines() if line.strip()]
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        with _lock:
+            _batches[batch_id] = {"kind": "openai", "created_at": time.time(), "requests": requests,
+                                  "endpoint": body.get("endpoint")}
+        self._send(200, self._openai_batch_info(batch_id))
+
+    def _openai_batch_info(self, batch_id: str) -> dict:
+        batch = _batches[batch_id]
+        progress = self._progress(batch)
+        total = len(batch["requests"])
+        info = {"id": batch_id, "object": "batch", "endpoint": batch["endpoint"], "created_at": int(batch["created_at"]),
+                "request_counts": {"total": total, "completed": min(total, int(total * progress)), "failed": 0}}
+        if progress < 0.2:
+            info["status"] = "validating"
+        elif progress < 1.0:
+            info["status"] = "in_progress"
+        else:
+            self._finish_openai_batch(batch_id, batch)
+            info.update(status="completed", output_file_id=batch["output_file_id"],
+                        error_file_id=batch["error_file_id"])
+            info["request_counts"] = {"total": total, "completed": total - batch["failed"], "failed": batch["failed"]}
+        return info
+
+    def _finish_openai_batch(self, batch_id: str, batch: dict) -> None:
+        with _lock:
+            if "output_file_id" in batch:
+                return
+            outputs, errors = [], []
+            for request in batch["requests"]:
+                line = {"id": f"req_{uuid.uuid4().hex[:8]}", "custom_id": request["custom_id"]}
+                if self._failed():
+                    line.update(response={"status_code": 500, "body": {"error": {"message": "stub failure"}}},
+                                error=None)
+                    errors.append(line)
+                else:
+                    line.update(response={"status_code": 200, "body": _openai_response(request["body"])}, error=None)
+                    outputs.append(line)
+            batch["failed"] = len(errors)
+            for key, lines in (("output_file_id", outputs), ("error_file_id", errors)):
+                file_id = f"file-{uuid.uuid4().hex[:12]}" if lines else None
+                if file_id:
+                    _files[file_id] = "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lines).encode("utf-8")
+                batch[key] = file_id
+
+    # Gemini ------------------------------------------------------------------
+
+    def _create_gemini_batch(self) -> None:
+        body = json.loads(self._read_body())
+        requests = body["batch"]["input_config"]["requests"]["requests"]
+        batch_id = f"batches/{uuid.uuid4().hex[:12]}"
+        with _lock:
+            _batches[batch_id] = {"kind": "gemini", "created_at": time.time(), "requests": requests,
+                                  "display_name": body["batch"].get("display_name")}
+        self._send(200, self._gemini_operation(batch_id))
+
+    def _gemini_operation(self, batch_id: str) -> dict:
+        batch = _batches[batch_id]
+        progress = self._progress(batch)
+        metadata = {"@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatch",
+                    "name": batch_id, "displayName": batch["display_name"]}
+        if progress < 1.0:
+            metadata["state"] = "BATCH_STATE_PENDING" if progress < 0.2 else "BATCH_STATE_RUNNING"
+            return {"name": batch_id, "metadata": metadata}
+        with _lock:
+            if "responses" not in batch:
+                batch["responses"] = [
+                    {"error": {"code": 500, "message": "stub failure"}, "metadata": item.get("metadata")}
+                    if self._failed() else
+                    {"response": _gemini_response(item["request"]), "metadata": item.get("metadata")}
+                    for item in batch["requests"]
+                ]
+        metadata["state"] = "BATCH_STATE_SUCCEEDED"
+        return {"name": batch_id, "metadata": metadata, "done": True, "response": {
+            "@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatchOutput",
+            "inlinedResponses": {"inlinedResponses": batch["responses"]},
+        }}
+
+    # 路由 --------------------------------------------------------------------
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        path = self.path.split("?")[0]
+        if path == "/v1/files":
+            self._upload_file()
+        elif path == "/v1/batches":
+            self._create_openai_batch()
+        elif path == "/v1/chat/completions":
+            self._send(200, _openai_response(json.loads(self._read_body())))
+        elif path.endswith(":batchGenerateContent"):
+            self._create_gemini_batch()
+        elif path.endswith(":generateContent"):
+            self._send(200, _gemini_response(json.loads(self._read_body())))
+        else:
+            self._send(404, {"error": {"message": f"unknown path {path}"}})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path = self.path.split("?")[0]
+        if path.startswith("/v1/batches/") and path[len("/v1/batches/"):] in _batches:
+            self._send(200, self._openai_batch_info(path[len("/v1/batches/"):]))
+        elif path.startswith("/v1/files/") and path.endswith("/content"):
+            content = _files.get(path[len("/v1/files/"):-len("/content")])
+            if content is None:
+                self._send(404, {"error": {"message": "file not found"}})
+            else:
+                self._send(200, content, "application/jsonl")
+        elif path.startswith("/v1beta/batches/") and path[len("/v1beta/"):] in _batches:
+            self._send(200, self._gemini_operation(path[len("/v1beta/"):]))
+        else:
+            self._send(404, {"error": {"message": f"unknown path {path}"}})
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="批处理接口本地替身服务（OpenAI Batch / Gemini Batch Mode）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址 (默认: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=18780, help="监听端口 (默认: 18780)")
+    parser.add_argument("--delay", type=float, default=3.0, help="批处理任务完成所需秒数 (默认: 3)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="单个请求返回错误的比例 (默认: 0)")
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"批处理替身服务: http://{args.host}:{args.port}  (任务耗时 {args.delay}s, 失败比例 {args.fail_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,12 +4,20 @@
 最小回归脚本（不依赖网络）：
 - TXT -> EPUB：生成临时输入，调用核心合并函数，校验输出 epub 的基本结构
 - 配置路径：校验能返回 api_keys.json 路径字符串
+- 文本解码：同目录中一个损坏的章节不影响后续章节的编码识别
+- 短章节打包：响应的分隔标记缺失、重复或格式错误时拆分失败（返回None，改为逐章请求）
+- 分布式协调：过期租约的章节被重新领取，原工作端迟到的结果仍被采用
+- 多书调度：同一优先级内按权重分配章节，高优先级的书（包括运行中加入的）先处理
+- 批处理接口：对本地替身服务（scripts/batch_api_stub.py）完成一次 OpenAI 批处理的提交、轮询与写回
 """
 
 from __future__ import annotations
 
+import json
 import os
 import shutil
+import threading
+import time
 import uuid
 import zipfile
 from pathlib import Path
@@ -60,6 +68,192 @@ def smoke_txt_to_epub() -> None:
         shutil.rmtree(root, ignore_errors=True)
 
 
+def smoke_directory_encoding() -> None:
+    from src.core import utils
+
+    project_root = Path(__file__).resolve().parents[1]
+    root = project_root / "tmp" / f"ainovellab-smoke-{uuid.uuid4().hex}"
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+        text = "第一章\n\n这是用GBK编码保存的章节内容。"
+        # 1: 正常GBK；2: 末尾多一个无效字节，只能由兜底编码解码；3: 正常GBK
+        (root / "1.txt").write_bytes(text.encode("gbk"))
+        (root / "2.txt").write_bytes(text.encode("gbk") + b"\x81")
+        (root / "3.txt").write_bytes(text.encode("gbk"))
+
+        _, encoding = utils.decode_text_file(str(root / "1.txt"))
+        _assert(encoding == "gbk", f"第1个文件应识别为 gbk，实际: {encoding}")
+        utils.decode_text_file(str(root / "2.txt"))
+        content, encoding = utils.decode_text_file(str(root / "3.txt"))
+        _assert(encoding == "gbk" and content == text, f"损坏文件之后的第3个文件应识别为 gbk，实际: {encoding}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def smoke_pack_markers() -> None:
+    from src.core.novel_condenser.api_service import PACK_END_MARKER, PACK_START_MARKER, split_packed_response
+
+    def section(index: int, body: str) -> str:
+        return f"{PACK_START_MARKER.format(index=index)}\n{body}\n{PACK_END_MARKER.format(index=index)}"
+
+    ok = split_packed_response("前言\n" + section(1, "甲") + "\n\n" + section(2, "乙"), 2)
+    _assert(ok == ["甲", "乙"], f"完整标记应按顺序拆出各章，实际: {ok}")
+    spaced = split_packed_response("<<< 章节1 >>>\n甲\n<<< 章节 1 结束 >>>", 1)
+    _assert(spaced == ["甲"], f"标记内多余的空格应被容忍，实际: {spaced}")
+
+    bad_cases = {
+        "缺少第2章": section(1, "甲"),
+        "重复第1章": section(1, "甲") + section(1, "甲2") + section(2, "乙"),
+        "结束标记序号不匹配": section(1, "甲") + f"{PACK_START_MARKER.format(index=2)}\n乙\n{PACK_END_MARKER.format(index=3)}",
+        "缺少结束标记": section(1, "甲") + f"{PACK_START_MARKER.format(index=2)}\n乙",
+        "某章为空": section(1, "甲") + section(2, "  "),
+        "多出第3章": section(1, "甲") + section(2, "乙") + section(3, "丙"),
+        "没有标记": "甲\n\n乙",
+    }
+    for name, text in bad_cases.items():
+        result = split_packed_response(text, 2)
+        _assert(result is None, f"{name}时应返回None以改为逐章请求，实际: {result}")
+
+
+def smoke_coordinator_lease() -> None:
+    from src.core.distributed import Coordinator, LeaseLost
+    from src.core.novel_condenser.file_utils import get_output_file_path
+
+    project_root = Path(__file__).resolve().parents[1]
+    root = project_root / "tmp" / f"ainovellab-smoke-{uuid.uuid4().hex}"
+    try:
+        in_dir = root / "input"
+        out_dir = root / "output"
+        in_dir.mkdir(parents=True, exist_ok=True)
+        files = []
+        for index in (1, 2):
+            path = in_dir / f"示例小说_[{index}]_第{index}章.txt"
+            path.write_text(f"第{index}章\n\n这是第{index}章内容。", encoding="utf-8")
+            files.append(str(path))
+
+        coordinator = Coordinator(files, str(out_dir), lease_timeout=0.2, max_attempts=3)
+        first = coordinator.lease("worker-a")["task"]
+        _assert(first is not None and first["id"] == 0, f"第一次领取应得到第1章，实际: {first}")
+        time.sleep(0.3)
+
+        # 租约过期：第1章重新排队并优先被其他工作端领取
+        second = coordinator.lease("worker-b")["task"]
+        _assert(second is not None and second["id"] == 0 and second["lease"] != first["lease"],
+                f"过期的第1章应被重新领取，实际: {second}")
+        _assert(coordinator.tasks[0]["attempts"] == 2, f"重新领取应计入尝试次数，实际: {coordinator.tasks[0]['attempts']}")
+        try:
+            coordinator.heartbeat(first["id"], first["lease"])
+            _assert(False, "过期租约续租应抛出 LeaseLost")
+        except LeaseLost:
+            pass
+
+        # 原工作端迟到的结果仍然有效，重新领取者随后的提交不再被采用
+        late = coordinator.complete(first["id"], first["lease"], "迟到的第1章结果")
+        _assert(late["accepted"], "过期租约的迟到结果应被采用")
+        _assert(not coordinator.complete(second["id"], second["lease"], "重复的第1章结果")["accepted"],
+                "章节已完成后的重复提交不应被采用")
+        output_file = get_output_file_path(files[0], output_dir=str(out_dir))
+        _assert(Path(output_file).read_text(encoding="utf-8") == "迟到的第1章结果", "应保存迟到的结果")
+
+        third = coordinator.lease("worker-b")["task"]
+        _assert(third is not None and third["id"] == 1, f"第1章完成后应领取第2章，实际: {third}")
+        coordinator.complete(third["id"], third["lease"], "第2章结果")
+        status = coordinator.status()
+        _assert(status["done"] and status["completed"] == 2 and not status["failed"], f"两章都应完成，实际: {status}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def smoke_fair_share_order() -> None:
+    from src.core.novel_condenser.scheduler import BookJob, FairShareScheduler
+
+    project_root = Path(__file__).resolve().parents[1]
+    root = project_root / "tmp" / f"ainovellab-smoke-{uuid.uuid4().hex}"
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+
+        def make_files(prefix: str, count: int) -> list:
+            files = []
+            for index in range(count):
+                path = root / f"{prefix}_{index}.txt"
+                path.write_bytes(b"x" * 1000)  # 每章费用相同，便于按权重计数
+                files.append(str(path))
+            return files
+
+        scheduler = FairShareScheduler(quantum=1000)
+        heavy = BookJob("权重2", make_files("heavy", 8), str(root), weight=2)
+        light = BookJob("权重1", make_files("light", 8), str(root), weight=1)
+        scheduler.add_book(heavy)
+        scheduler.add_book(light)
+        stop_event = threading.Event()
+
+        order = [scheduler.next_chapter(stop_event)[0].name for _ in range(6)]
+        _assert(order == ["权重2", "权重2", "权重1", "权重2", "权重2", "权重1"],
+                f"权重2的书应获得约两倍的章节，实际顺序: {order}")
+
+        # 运行中加入的高优先级书立即插队，处理完后回到原来的轮转
+        urgent = BookJob("加急", make_files("urgent", 2), str(root), priority=1)
+        scheduler.add_book(urgent)
+        order = [scheduler.next_chapter(stop_event)[0].name for _ in range(3)]
+        _assert(order[:2] == ["加急", "加急"] and order[2] != "加急", f"高优先级的书应先处理完，实际顺序: {order}")
+
+        scheduler.skip_remaining()
+        scheduler.close()
+        _assert(scheduler.next_chapter(stop_event) is None, "全部分发且关闭后 next_chapter 应返回None")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def smoke_openai_batch() -> None:
+    from http.server import ThreadingHTTPServer
+
+    from batch_api_stub import StubHandler  # 与本脚本同在 scripts/ 目录
+    from src.core.novel_condenser.batch_api import BATCH_STATE_FILE, run_batch_condense
+    from src.core.novel_condenser.file_utils import get_output_file_path
+    from src.core.novel_condenser.key_manager import APIKeyManager
+    from src.core.novel_condenser.main import NovelCondenser
+
+    project_root = Path(__file__).resolve().parents[1]
+    root = project_root / "tmp" / f"ainovellab-smoke-{uuid.uuid4().hex}"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    original_delay = StubHandler.delay
+    StubHandler.delay = 0.5
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        in_dir = root / "input"
+        out_dir = root / "output"
+        in_dir.mkdir(parents=True, exist_ok=True)
+        files = []
+        for index in (1, 2, 3):
+            path = in_dir / f"示例小说_[{index}]_第{index}章.txt"
+            path.write_text(f"第{index}章\n\n" + "清晨的雾气还没有散去，少年背着竹篓走进了山里。" * 60, encoding="utf-8")
+            files.append(str(path))
+
+        condenser = NovelCondenser(api_type="openai", force_regenerate=True, output_dir=str(out_dir))
+        # 不读取 api_keys.json：直接指向替身服务
+        condenser.openai_key_manager = APIKeyManager([{
+            "name": "stub", "key": "smoke", "model": "stub-model",
+            "redirect_url": f"http://127.0.0.1:{server.server_address[1]}/v1",
+        }])
+
+        success_count, failed_files = run_batch_condense(files, output_dir=str(out_dir), poll_interval=0.2,
+                                                         condenser=condenser)
+        _assert(success_count == len(files) and not failed_files,
+                f"批处理应全部成功，实际: 成功 {success_count}，失败 {failed_files}")
+        for file_path in files:
+            original = Path(file_path).read_text(encoding="utf-8")
+            output = Path(get_output_file_path(file_path, output_dir=str(out_dir))).read_text(encoding="utf-8")
+            _assert(output and len(output) < len(original), f"应写回脱水结果: {file_path}")
+        _assert(not (out_dir / BATCH_STATE_FILE).exists() or
+                not json.loads((out_dir / BATCH_STATE_FILE).read_text(encoding="utf-8")).get("batches"),
+                "全部任务完成后状态文件中不应留有未完成的任务")
+    finally:
+        StubHandler.delay = original_delay
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(root, ignore_errors=True)
+
+
 def main() -> int:
     # 让 src/ 可被直接导入（与 run.py 保持一致）
     project_root = Path(__file__).resolve().parents[1]
@@ -67,6 +261,11 @@ def main() -> int:
 
     smoke_config_paths()
     smoke_txt_to_epub()
+    smoke_directory_encoding()
+    smoke_pack_markers()
+    smoke_coordinator_lease()
+    smoke_fair_share_order()
+    smoke_openai_batch()
 
     print("smoke: OK")
     return 0
@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分布式脱水 - 协调端分发章节，多台机器上的工作端各自调用API
+
+单机的出口带宽与密钥额度有限时，可以把一本书的章节分给多台机器脱水：
+
+    协调端 (coordinator)                         工作端 (worker) x N
+    分割书籍 -> 章节任务 --HTTP租约--> 领取章节 -> NovelCondenser 脱水（本机密钥）
+    写出脱水结果 <---------提交结果---------
+
+租约协议（JSON over HTTP）:
+    POST /lease                      领取一个章节，返回章节内容与租约ID；暂无可领任务时 task 为 null，
+                                     全部完成时 done 为 true
+    POST /tasks/<id>/heartbeat       续租（处理时间较长的章节）
+    POST /tasks/<id>/complete        提交脱水结果
+    POST /tasks/<id>/fail            报告失败，章节重新排队（超过最大尝试次数后记为失败）
+    GET  /status                     进度统计
+
+- 租约超时（visibility timeout）后章节重新可领，工作端崩溃或断网不会丢失章节
+- 同一章节只接受第一份结果，租约过期后迟到的结果在章节尚未完成时仍然有效
+- 协调端只负责分发和写出，不需要API密钥；工作端使用各自的 api_keys.json 与缓存
+- 已有有效脱水结果的章节不会再次分发，中断后重新运行只处理剩余章节
+
+命令行用法:
+    python -m src.core.distributed coordinator 书.epub --host 0.0.0.0 --epub
+    python -m src.core.distributed worker http://协调端地址:8766 --api gemini --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import shutil
+import tempfile
+import argparse
+import logging
+import threading
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse
+
+from .utils import setup_logger
+from .epub_splitter import split_book
+from .txt_to_epub import merge_txt_to_epub
+from .novel_condenser.main import NovelCondenser
+from .novel_condenser.file_utils import (
+    read_file, save_condensed_novel, get_output_file_path, is_valid_condensed_content
+)
+from .novel_condenser.output_writer import start_output_writer, stop_output_writer
+from .novel_condenser.cache import flush_all as flush_cache
+from .novel_condenser.stats import print_processing_summary
+
+# 设置日志记录器
+logger = setup_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+DEFAULT_LEASE_TIMEOUT = 300        # 租约超时（秒），超时未续租的章节重新排队
+DEFAULT_MAX_ATTEMPTS = 3           # 每个章节的最大尝试次数
+DEFAULT_LINGER = 10                # 全部完成后继续服务的时间（秒），让空闲的工作端收到完成通知
+POLL_INTERVAL = 2.0                # 暂无可领任务时工作端的等待时间（秒）
+MAX_CONNECT_ERRORS = 5             # 工作端连续连接失败的次数上限
+TOKEN_HEADER = "X-Worker-Token"
+
+
+class LeaseLost(Exception):
+    """租约已失效（已过期并被其他工作端领取，或章节已完成）"""
+
+
+# =========================================================
+# 协调端
+# =========================================================
+
+class Coordinator:
+    """章节任务表与租约管理（线程安全，供HTTP线程并发调用）"""
+
+    def __init__(self, files, output_dir, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, force_regenerate=False, update_progress_func=None):
+        """
+        Args:
+            files: 章节TXT文件列表（按章节顺序）
+            output_dir: 脱水结果输出目录
+            lease_timeout: 租约超时（秒）
+            max_attempts: 每个章节的最大尝试次数
+            force_regenerate: 是否重新处理已有有效结果的章节
+            update_progress_func: 可选的进度回调 (已完成章节数, 章节总数, 状态)
+        """
+        self.output_dir = str(output_dir)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.update_progress_func = update_progress_func
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = deque()        # 待领取的任务ID
+        self._leases = {}              # 任务ID -> (租约ID, 工作端, 到期时间)
+        self.tasks = []
+        self.failed = []
+        self.workers = {}              # 工作端 -> 最近一次请求时间
+        self.skipped = 0
+        self.completed = 0
+
+        for index, path in enumerate(files):
+            task = {"id": index, "path": str(path), "file_name": os.path.basename(path), "attempts": 0,
+                    "status": "pending", "error": None}
+            self.tasks.append(task)
+            if not force_regenerate and self._has_valid_output(task):
+                task["status"] = "done"
+                self.skipped += 1
+            else:
+                self._pending.append(index)
+        self.completed = self.skipped
+        if not self._pending:
+            self.finished.set()
+
+    def _has_valid_output(self, task):
+        output_file = get_output_file_path(task["path"], output_dir=self.output_dir)
+        try:
+            return bool(output_file) and os.path.exists(output_file) and is_valid_condensed_content(
+                read_file(output_file))
+        except Exception:
+            return False
+
+    def _requeue_expired(self, now):
+        """租约到期的章节重新排队"""
+        for task_id, (_, worker, expires) in list(self._leases.items()):
+            if expires <= now:
+                del self._leases[task_id]
+                logger.warning(f"章节 {self.tasks[task_id]['file_name']} 的租约已过期（工作端 {worker}），重新排队")
+                self._retry(self.tasks[task_id], "租约超时")
+
+    def _retry(self, task, error):
+        task["error"] = error
+        if task["attempts"] >= self.max_attempts:
+            task["status"] = "failed"
+            self.failed.append(task["file_name"])
+            logger.error(f"章节 {task['file_name']} 已尝试 {task['attempts']} 次，放弃: {error}")
+            self._check_finished()
+        else:
+            task["status"] = "pending"
+            self._pending.appendleft(task["id"])
+
+    def _check_finished(self):
+        if self.completed + len(self.failed) >= len(self.tasks):
+            self.finished.set()
+
+    def _check_lease(self, task_id, lease_id):
+        lease = self._leases.get(task_id)
+        if lease is None or lease[0] != lease_id:
+            raise LeaseLost()
+        return lease
+
+    def lease(self, worker):
+        """领取一个章节
+
+        Returns:
+            dict: {"task": 任务或None, "done": 是否全部完成, "lease_timeout": 租约超时}
+        """
+        now = time.time()
+        with self._lock:
+            self.workers[worker] = now
+            self._requeue_expired(now)
+            if self.finished.is_set():
+                return {"task": None, "done": True}
+            if not self._pending:
+                return {"task": None, "done": False, "retry_after": POLL_INTERVAL}
+            task = self.tasks[self._pending.popleft()]
+            task["attempts"] += 1
+            task["status"] = "leased"
+            lease_id = uuid.uuid4().hex
+            self._leases[task["id"]] = (lease_id, worker, now + self.lease_timeout)
+        try:
+            content = read_file(task["path"])
+        except Exception as e:
+            with self._lock:
+                self._leases.pop(task["id"], None)
+                task["attempts"] = self.max_attempts
+                self._retry(task, f"无法读取章节: {e}")
+            return self.lease(worker)
+        logger.info(f"章节 {task['file_name']} -> {worker}（第 {task['attempts']} 次）")
+        return {
+            "task": {"id": task["id"], "lease": lease_id, "file_name": task["file_name"],
+                     "index": task["id"] + 1, "total": len(self.tasks), "content": content},
+            "done": False,
+            "lease_timeout": self.lease_timeout,
+        }
+
+    def heartbeat(self, task_id, lease_id):
+        """续租
+
+        Raises:
+            LeaseLost: 租约已失效
+        """
+        with self._lock:
+            _, worker, _ = self._check_lease(task_id, lease_id)
+            self._leases[task_id] = (lease_id, worker, time.time() + self.lease_timeout)
+        return {"lease_timeout": self.lease_timeout}
+
+    def complete(self, task_id, lease_id, content):
+        """提交脱水结果；章节尚未完成时接受（即使租约已过期），返回是否被接受"""
+        with self._lock:
+            task = self.tasks[task_id]
+            if task["status"] in ("done", "failed"):
+                return {"accepted": False}
+            lease = self._leases.get(task_id)
+            if lease is not None and lease[0] != lease_id:
+                # 迟到的结果：章节已被重新领取，但结果仍然有效
+                logger.info(f"章节 {task['file_name']} 收到过期租约的结果，直接采用")
+            self._leases.pop(task_id, None)
+            if task["id"] in self._pending:
+                self._pending.remove(task["id"])
+            task["status"] = "done"
+            task["error"] = None
+            self.completed += 1
+            completed = self.completed
+        save_condensed_novel(task["path"], content, output_dir=self.output_dir)
+        logger.info(f"[{completed}/{len(self.tasks)}] 章节完成: {task['file_name']}")
+        if self.update_progress_func:
+            self.update_progress_func(completed, len(self.tasks), task["file_name"])
+        with self._lock:
+            self._check_finished()
+        return {"accepted": True}
+
+    def fail(self, task_id, lease_id, error):
+        """工作端报告失败，章节重新排队"""
+        with self._lock:
+            self._check_lease(task_id, lease_id)
+            del self._leases[task_id]
+            logger.warning(f"章节 {self.tasks[task_id]['file_name']} 处理失败: {error}")
+            self._retry(self.tasks[task_id], error)
+        return {"requeued": self.tasks[task_id]["status"] == "pending"}
+
+    def status(self):
+        with self._lock:
+            self._requeue_expired(time.time())
+            return {
+                "total": len(self.tasks),
+                "completed": self.completed,
+                "skipped": self.skipped,
+                "leased": len(self._leases),
+                "pending": len(self._pending),
+                "failed": list(self.failed),
+                "workers": sorted(self.workers),
+                "done": self.finished.is_set(),
+            }
+
+
+class CoordinatorRequestHandler(BaseHTTPRequestHandler):
+    """租约协议的HTTP接口"""
+
+    coordinator = None              # 由 create_coordinator_server 设置
+    token = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        if self.token and self.headers.get(TOKEN_HEADER) != self.token:
+            self._send_json({"error": "令牌无效"}, 401)
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if urlparse(self.path).path == "/status":
+            return self._send_json(self.coordinator.status())
+        self._send_json({"error": "接口不存在"}, 404)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+            if parts == ["lease"]:
+                return self._send_json(self.coordinator.lease(body.get("worker") or self.address_string()))
+            if len(parts) == 3 and parts[0] == "tasks":
+                task_id = int(parts[1])
+                if not 0 <= task_id < len(self.coordinator.tasks):
+                    return self._send_json({"error": "任务不存在"}, 404)
+                if parts[2] == "heartbeat":
+                    return self._send_json(self.coordinator.heartbeat(task_id, body.get("lease")))
+                if parts[2] == "complete":
+                    content = body.get("content")
+                    if not isinstance(content, str) or not content:
+                        return self._send_json({"error": "缺少脱水内容"}, 400)
+                    return self._send_json(self.coordinator.complete(task_id, body.get("lease"), content))
+                if parts[2] == "fail":
+                    return self._send_json(self.coordinator.fail(task_id, body.get("lease"), body.get("error")))
+            self._send_json({"error": "接口不存在"}, 404)
+        except LeaseLost:
+            self._send_json({"error": "租约已失效"}, 409)
+        except ValueError as e:
+            self._send_json({"error": f"请求无效: {e}"}, 400)
+
+
+def create_coordinator_server(coordinator, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None):
+    """创建协调端HTTP服务"""
+    handler = type("BoundCoordinatorRequestHandler", (CoordinatorRequestHandler,),
+                   {"coordinator": coordinator, "token": token})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def run_coordinator(input_path, output_dir=None, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None,
+                    lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS, force_regenerate=False,
+                    epub_output=None, author=None, language='zh-CN', linger=DEFAULT_LINGER, stop_event=None,
+                    update_progress_func=None):
+    """
+    运行协调端：准备章节任务，等待工作端处理完全部章节后写出结果
+
+    Args:
+        input_path: EPUB文件（先按每章一个文件分割）或章节TXT目录
+        output_dir: 脱水结果目录，默认与脱水命令行一致（章节目录下的 目录名_脱水）
+        host: 监听地址（供其他机器访问时使用 0.0.0.0）
+        port: 端口
+        token: 可选的共享令牌，工作端需在请求头中携带
+        lease_timeout: 租约超时（秒）
+        max_attempts: 每个章节的最大尝试次数
+        force_regenerate: 重新处理已有有效结果的章节
+        epub_output: 全部成功后合并为EPUB；为空字符串时使用默认路径，为None时不合并
+        author: 作者（合并EPUB时使用）
+        language: 语言代码
+        linger: 全部完成后继续服务的秒数，让空闲的工作端收到完成通知后退出
+        stop_event: 可选的停止事件
+        update_progress_func: 可选的进度回调 (已完成章节数, 章节总数, 状态)
+
+    Returns:
+        dict: {"success", "output_dir", "total", "completed", "failed", "epub"}
+    """
+    input_path = Path(input_path)
+    if input_path.is_file() and input_path.suffix.lower() == ".epub":
+        chapter_dir = input_path.parent / input_path.stem / "splitted"
+        logger.info(f"分割EPUB（每章一个文件）: {input_path} -> {chapter_dir}")
+        split_result = split_book(str(input_path), str(chapter_dir), chapters_per_file=1, incremental=True)
+        if not split_result["success"]:
+            return {"success": False, "error": split_result["error"] or "EPUB分割失败"}
+    elif input_path.is_dir():
+        chapter_dir = input_path
+    else:
+        return {"success": False, "error": f"输入路径不是EPUB文件或目录: {input_path}"}
+
+    files = sorted(str(p) for p in chapter_dir.glob("*.txt"))
+    if not files:
+        return {"success": False, "error": f"在 {chapter_dir} 中没有找到TXT文件"}
+    output_dir = output_dir or str(chapter_dir / f"{chapter_dir.name}_脱水")
+
+    start_output_writer()
+    server = None
+    try:
+        coordinator = Coordinator(files, output_dir, lease_timeout, max_attempts, force_regenerate,
+                                  update_progress_func)
+        logger.info(f"共 {len(files)} 个章节，已有结果 {coordinator.skipped} 个，待分发 {len(coordinator._pending)} 个")
+        if not coordinator.finished.is_set():
+            server = create_coordinator_server(coordinator, host, port, token)
+            threading.Thread(target=server.serve_forever, name="coordinator-http", daemon=True).start()
+            logger.info(f"协调端已启动: http://{host}:{port}，等待工作端领取章节（租约超时 {lease_timeout} 秒）")
+            while not coordinator.finished.wait(1.0):
+                if stop_event is not None and stop_event.is_set():
+                    logger.warning("协调端已停止，未完成的章节可在下次运行时继续")
+                    break
+            else:
+                # 让仍在轮询的工作端收到完成通知
+                deadline = time.time() + linger
+                while time.time() < deadline:
+                    last_seen = max(coordinator.workers.values(), default=0)
+                    if time.time() - last_seen > POLL_INTERVAL * 2:
+                        break
+                    time.sleep(0.5)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        stop_output_writer()
+
+    status = coordinator.status()
+    result = {"success": status["done"] and not status["failed"], "output_dir": output_dir,
+              "total": status["total"], "completed": status["completed"], "failed": status["failed"], "epub": None}
+    logger.info(f"协调端结束: 完成 {status['completed']}/{status['total']} 章，失败 {len(status['failed'])} 章")
+    if epub_output is not None:
+        if result["success"]:
+            result["epub"] = merge_txt_to_epub(output_dir, output_path=epub_output or None, author=author,
+                                               language=language)
+            result["success"] = bool(result["epub"])
+        else:
+            logger.error("仍有章节未完成，暂不合并EPUB；重新运行协调端即可只处理剩余章节")
+    return result
+
+
+# =========================================================
+# 工作端
+# =========================================================
+
+class CoordinatorClient:
+    """工作端使用的租约协议客户端"""
+
+    def __init__(self, base_url, token=None, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method, path, data=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8") if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            if e.code == 409:
+                raise LeaseLost()
+            raise RuntimeError(f"HTTP {e.code}: {e.read().decode('utf-8', 'replace')}")
+
+    def lease(self, worker):
+        return self._request("POST", "/lease", {"worker": worker})
+
+    def heartbeat(self, task_id, lease_id):
+        return self._request("POST", f"/tasks/{task_id}/heartbeat", {"lease": lease_id})
+
+    def complete(self, task_id, lease_id, content):
+        return self._request("POST", f"/tasks/{task_id}/complete", {"lease": lease_id, "content": content})
+
+    def fail(self, task_id, lease_id, error):
+        return self._request("POST", f"/tasks/{task_id}/fail", {"lease": lease_id, "error": error})
+
+    def status(self):
+        return self._request("GET", "/status")
+
+
+def run_worker(coordinator_url, api_type="gemini", workers=None, token=None, name=None, stop_event=None):
+    """
+    运行工作端：领取章节、用本机的密钥脱水并提交结果，直到协调端通知全部完成
+
+    Args:
+        coordinator_url: 协调端地址，如 http://192.168.1.10:8766
+        api_type: API类型（gemini/openai/mixed）
+        workers: 并发处理的章节数，默认按API配置的并发额度
+        token: 协调端的共享令牌
+        name: 工作端名称，默认为 主机名-进程号
+        stop_event: 可选的停止事件
+
+    Returns:
+        int: 本工作端完成的章节数
+    """
+    client = CoordinatorClient(coordinator_url, token)
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    work_dir = tempfile.mkdtemp(prefix="ainovellab-worker-")
+    condenser = NovelCondenser(api_type=api_type, output_dir=os.path.join(work_dir, "out"))
+    if not workers:
+        key_managers = (condenser.gemini_key_manager, condenser.openai_key_manager)
+        workers = sum(km.get_max_concurrency() for km in key_managers if km) or 1
+    condenser.workers = workers
+    workers = condenser.get_effective_workers()
+
+    active = {}                    # 任务ID -> 租约ID（由心跳线程续租）
+    active_lock = threading.Lock()
+    heartbeat_interval = [DEFAULT_LEASE_TIMEOUT / 3]
+    completed = [0]
+
+    def heartbeat():
+        last_sent = time.time()
+        while not stop_event.wait(1.0):
+            if time.time() - last_sent < heartbeat_interval[0]:
+                continue
+            last_sent = time.time()
+            with active_lock:
+                leases = list(active.items())
+            for task_id, lease_id in leases:
+                try:
+                    client.heartbeat(task_id, lease_id)
+                except LeaseLost:
+                    logger.warning(f"章节 #{task_id + 1} 的租约已失效，完成后仍会尝试提交结果")
+                except (RuntimeError, OSError) as e:
+                    logger.warning(f"续租失败: {e}")
+
+    def process(thread_name):
+        connect_errors = 0
+        while not stop_event.is_set():
+            try:
+                response = client.lease(thread_name)
+                connect_errors = 0
+            except (RuntimeError, OSError) as e:
+                connect_errors += 1
+                if connect_errors >= MAX_CONNECT_ERRORS:
+                    logger.error(f"无法连接协调端，停止领取章节: {e}")
+                    return
+                stop_event.wait(POLL_INTERVAL * connect_errors)
+                continue
+            if response.get("done"):
+                return
+            task = response.get("task")
+            if task is None:
+                stop_event.wait(response.get("retry_after", POLL_INTERVAL))
+                continue
+            heartbeat_interval[0] = max(1.0, response.get("lease_timeout", DEFAULT_LEASE_TIMEOUT) / 3)
+
+            task_id, lease_id = task["id"], task["lease"]
+            path = os.path.join(work_dir, task["file_name"])
+            with active_lock:
+                active[task_id] = lease_id
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(task["content"])
+                success, content = condenser.condense_file(path, task["index"], task["total"])
+                if success and content:
+                    if client.complete(task_id, lease_id, content).get("accepted"):
+                        completed[0] += 1
+                else:
+                    client.fail(task_id, lease_id, "脱水失败")
+            except LeaseLost:
+                logger.warning(f"章节 {task['file_name']} 的租约已失效")
+            except Exception as e:
+                logger.error(f"处理章节 {task['file_name']} 时出错: {e}")
+                try:
+                    client.fail(task_id, lease_id, str(e))
+                except Exception:
+                    pass
+            finally:
+                with active_lock:
+                    active.pop(task_id, None)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    logger.info(f"工作端 {name} 连接 {coordinator_url}，并发 {workers}")
+    start_output_writer()
+    heartbeat_thread = threading.Thread(target=heartbeat, name="worker-heartbeat", daemon=True)
+    heartbeat_thread.start()
+    threads = [threading.Thread(target=process, args=(f"{name}/{i + 1}",), name=f"worker-{i + 1}", daemon=True)
+               for i in range(workers)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        logger.warning("工作端停止，未完成的章节将在租约超时后由其他工作端处理")
+    finally:
+        stop_event.set()
+        stop_output_writer()
+        flush_cache()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    logger.info(f"工作端 {name} 结束，共完成 {completed[0]} 个章节")
+    return completed[0]
+
+
+# =========================================================
+# 命令行
+# =========================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='分布式脱水：协调端分发章节，多台机器上的工作端各自调用API')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示详细日志')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator', help='运行协调端')
+    coordinator_parser.add_argument('input', help='EPUB文件或章节TXT目录')
+    coordinator_parser.add_argument('-o', '--output-dir', default=None, help='脱水结果目录 (默认: 章节目录下的 目录名_脱水)')
+    coordinator_parser.add_argument('--host', default=DEFAULT_HOST, help=f'监听地址，供其他机器访问时使用 0.0.0.0 (默认: {DEFAULT_HOST})')
+    coordinator_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'端口 (默认: {DEFAULT_PORT})')
+    coordinator_parser.add_argument('--token', default=None, help='共享令牌，工作端需使用相同的令牌')
+    coordinator_parser.add_argument('--lease-timeout', type=float, default=DEFAULT_LEASE_TIMEOUT,
+                                    help=f'租约超时秒数 (默认: {DEFAULT_LEASE_TIMEOUT})')
+    coordinator_parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                                    help=f'每个章节的最大尝试次数 (默认: {DEFAULT_MAX_ATTEMPTS})')
+    coordinator_parser.add_argument('--force', action='store_true', help='重新处理已有脱水结果的章节')
+    coordinator_parser.add_argument('--epub', nargs='?', const='', default=None,
+                                    help='全部完成后合并为EPUB，可指定输出路径')
+    coordinator_parser.add_argument('-a', '--author', default=None, help='作者名称')
+    coordinator_parser.add_argument('-l', '--language', default='zh-CN', help='语言代码 (默认: zh-CN)')
+
+    worker_parser = subparsers.add_parser('worker', help='运行工作端')
+    worker_parser.add_argument('url', help='协调端地址，如 http://192.168.1.10:8766')
+    worker_parser.add_argument('--api', choices=['gemini', 'openai', 'mixed'], default='gemini', help='使用的API类型')
+    worker_parser.add_argument('--workers', type=int, default=None, help='并发处理的章节数 (默认: API配置的并发额度)')
+    worker_parser.add_argument('--token', default=None, help='协调端的共享令牌')
+    worker_parser.add_argument('--name', default=None, help='工作端名称 (默认: 主机名-进程号)')
+
+    args = parser.parse_args()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    if args.command == 'worker':
+        run_worker(args.url, args.api, args.workers, args.token, args.name)
+        try:
+            print_processing_summary()
+        except Exception:
+            pass
+        return 0
+
+    try:
+        result = run_coordinator(args.input, args.output_dir, args.host, args.port, args.token, args.lease_timeout,
+                                 args.max_attempts, args.force, args.epub, args.author, args.language)
+    except KeyboardInterrupt:
+        logger.warning("协调端已停止，未完成的章节可在下次运行时继续")
+        return 1
+    if result.get("error"):
+        logger.error(result["error"])
+    return 0 if result["success"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EPUB流式读取器 - 基于 zipfile + lxml 的轻量级EPUB读取
+
+与 ebooklib.read_epub 一次性读取并解析全部清单项（包括图片）不同，
+这里只解析 container.xml、OPF（清单与spine）以及 NCX/nav 目录，
+章节文档在迭代时才逐个从压缩包中读取，峰值内存只与单个章节大小相关。
+
+返回的文档对象提供与 ebooklib 条目相同的 get_id()/get_name()/get_content() 接口，
+可以直接交给 epub_splitter 的章节提取函数使用。
+"""
+
+import posixpath
+import zipfile
+from urllib.parse import unquote
+
+from lxml import etree
+
+from .utils import setup_logger
+
+# 设置日志记录器
+logger = setup_logger(__name__)
+
+CONTAINER_PATH = "META-INF/container.xml"
+DOCUMENT_MEDIA_TYPES = ("application/xhtml+xml",)
+NCX_MEDIA_TYPE = "application/x-dtbncx+xml"
+
+# 解析时不加载外部实体、不联网，容忍少量格式错误
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, recover=True, huge_tree=True)
+
+
+class EpubFormatError(ValueError):
+    """EPUB结构无法解析（缺少 container.xml、OPF 等）"""
+
+
+def _local_name(element):
+    """返回去掉命名空间的标签名"""
+    tag = element.tag
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _iter_children(element, name):
+    """按本地标签名遍历直接子元素（忽略命名空间）"""
+    for child in element:
+        if _local_name(child) == name:
+            yield child
+
+
+def _find_child(element, name):
+    return next(_iter_children(element, name), None)
+
+
+def _element_text(element):
+    return "".join(element.itertext()).strip() if element is not None else ""
+
+
+class EpubDocument:
+    """EPUB中的单个文档，内容在调用 get_content() 时才从压缩包读取"""
+
+    def __init__(self, reader, item_id, href, media_type, properties=()):
+        self._reader = reader
+        self.id = item_id
+        self.file_name = href            # 相对OPF目录的路径，与 ebooklib 的 get_name() 一致
+        self.media_type = media_type
+        self.properties = list(properties)
+
+    def get_id(self):
+        return self.id
+
+    def get_name(self):
+        return self.file_name
+
+    def get_content(self):
+        return self._reader.read_item(self.file_name)
+
+    def __repr__(self):
+        return f"<EpubDocument {self.id}: {self.file_name}>"
+
+
+class EpubReader:
+    """流式EPUB读取器
+
+    用法:
+        with EpubReader(path) as reader:
+            toc_map = reader.toc_map()
+            for document in reader.iter_documents():
+                html = document.get_content()
+    """
+
+    def __init__(self, epub_path):
+        self.path = str(epub_path)
+        try:
+            self._zip = zipfile.ZipFile(self.path, "r")
+        except (zipfile.BadZipFile, OSError) as e:
+            raise EpubFormatError(f"无法打开EPUB压缩包: {e}")
+
+        try:
+            self.opf_path = self._find_opf_path()
+            self.opf_dir = posixpath.dirname(self.opf_path)
+            self._load_opf()
+        except Exception:
+            self._zip.close()
+            raise
+
+    # ---------------------------------------------------------
+    # 基础读取
+    # ---------------------------------------------------------
+
+    def _read_xml(self, path):
+        try:
+            data = self._zip.read(path)
+        except KeyError:
+            raise EpubFormatError(f"EPUB中缺少文件: {path}")
+        root = etree.fromstring(data, _XML_PARSER)
+        if root is None:
+            raise EpubFormatError(f"无法解析XML: {path}")
+        return root
+
+    def _zip_path(self, href):
+        """将相对OPF目录的路径转换为压缩包内路径"""
+        return posixpath.normpath(posixpath.join(self.opf_dir, href)) if self.opf_dir else posixpath.normpath(href)
+
+    def read_item(self, href):
+        """读取相对OPF目录的文件内容（bytes）"""
+        return self._zip.read(self._zip_path(href))
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------------------------------------------------------
+    # container.xml 与 OPF
+    # ---------------------------------------------------------
+
+    def _find_opf_path(self):
+        root = self._read_xml(CONTAINER_PATH)
+        for element in root.iter():
+            if _local_name(element) == "rootfile" and element.get("full-path"):
+                return unquote(element.get("full-path"))
+        raise EpubFormatError("container.xml 中没有找到 OPF 文件路径")
+
+    def _load_opf(self):
+        root = self._read_xml(self.opf_path)
+
+        metadata = _find_child(root, "metadata")
+        title = None
+        if metadata is not None:
+            title = next((_element_text(e) for e in _iter_children(metadata, "title")), None)
+        self.title = title or None
+
+        # 清单：id -> (href, media-type, properties)
+        self.manifest = {}
+        self._nav_href = None
+        manifest = _find_child(root, "manifest")
+        if manifest is None:
+            raise EpubFormatError("OPF 中缺少 manifest")
+        for item in _iter_children(manifest, "item"):
+            item_id = item.get("id")
+            href = item.get("href")
+            if not item_id or not href:
+                continue
+            properties = (item.get("properties") or "").split()
+            media_type = item.get("media-type", "")
+            self.manifest[item_id] = (unquote(href), media_type, properties)
+            if "nav" in properties:
+                self._nav_href = unquote(href)
+
+        # spine 阅读顺序
+        self.spine = []
+        self._ncx_href = None
+        spine = _find_child(root, "spine")
+        if spine is not None:
+            self.spine = [ref.get("idref") for ref in _iter_children(spine, "itemref") if ref.get("idref")]
+            toc_id = spine.get("toc")
+            if toc_id and toc_id in self.manifest:
+                self._ncx_href = self.manifest[toc_id][0]
+        if self._ncx_href is None:
+            self._ncx_href = next(
+                (href for href, media_type, _ in self.manifest.values() if media_type == NCX_MEDIA_TYPE),
+                None,
+            )
+
+    # ---------------------------------------------------------
+    # 文档与目录
+    # ---------------------------------------------------------
+
+    def _is_document(self, item_id):
+        # 与 ebooklib 的 ITEM_DOCUMENT 一致：nav 目录页也算作文档
+        return self.manifest[item_id][1] in DOCUMENT_MEDIA_TYPES
+
+    def get_spine_order(self):
+        """返回文档ID到spine序号的映射"""
+        return {item_id: index for index, item_id in enumerate(self.spine)}
+
+    def iter_documents(self):
+        """按spine顺序逐个返回文档；不在spine中的文档按ID中的数字排在最后
+
+        Yields:
+            EpubDocument: 文档对象（内容按需读取）
+        """
+        seen = set()
+        for item_id in self.spine:
+            if item_id in seen or item_id not in self.manifest or not self._is_document(item_id):
+                continue
+            seen.add(item_id)
+            href, media_type, properties = self.manifest[item_id]
+            yield EpubDocument(self, item_id, href, media_type, properties)
+
+        def digits_key(item_id):
+            digits = "".join(filter(str.isdigit, item_id))
+            return int(digits) if digits else float("inf")
+
+        rest = [item_id for item_id in self.manifest if item_id not in seen and self._is_document(item_id)]
+        for item_id in sorted(rest, key=digits_key):
+            href, media_type, properties = self.manifest[item_id]
+            yield EpubDocument(self, item_id, href, media_type, properties)
+
+    def toc_map(self):
+        """从 NCX（优先）或 EPUB3 nav 文档中提取 文件名 -> 章节标题 的映射
+
+        Returns:
+            dict: 与 epub_splitter.extract_toc_titles 相同格式的映射
+        """
+        toc_map = {}
+        try:
+            if self._ncx_href:
+                self._parse_ncx(toc_map)
+            if not toc_map and self._nav_href:
+                self._parse_nav(toc_map)
+        except Exception as e:
+            logger.warning(f"提取TOC标题时出错: {e}")
+        return toc_map
+
+    @staticmethod
+    def _add_toc_entry(toc_map, href, title):
+        if not href or not title:
+            return
+        filename = href.split("#")[0].split("/")[-1]
+        toc_map[unquote(filename)] = title.strip()
+
+    def _parse_ncx(self, toc_map):
+        root = self._read_xml(self._zip_path(self._ncx_href))
+        for nav_point in root.iter():
+            if _local_name(nav_point) != "navPoint":
+                continue
+            label = _find_child(nav_point, "navLabel")
+            content = _find_child(nav_point, "content")
+            title = _element_text(_find_child(label, "text")) if label is not None else ""
+            self._add_toc_entry(toc_map, content.get("src") if content is not None else None, title)
+
+    def _parse_nav(self, toc_map):
+        root = self._read_xml(self._zip_path(self._nav_href))
+        navs = [e for e in root.iter() if _local_name(e) == "nav"]
+        toc_nav = next(
+            (e for e in navs if any(v == "toc" for k, v in e.attrib.items() if k.endswith("type"))),
+            navs[0] if navs else None,
+        )
+        if toc_nav is None:
+            return
+        for link in toc_nav.iter():
+            if _local_name(link) == "a":
+                self._add_toc_entry(toc_map, link.get("href"), _element_text(link))
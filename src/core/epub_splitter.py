@@ -9,14 +9,23 @@ EPUB分割器 - 将EPUB电子书分割成多个TXT文件
 
 import os
 import re
+import glob
+import hashlib
+import time
 import argparse
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 import ebooklib
 from ebooklib import epub
-from bs4 import BeautifulSoup
+from lxml import etree
+import lxml.html
 
 from .utils import get_safe_filename
+from .epub_reader import EpubReader, EpubFormatError
 
 # 配置日志系统
 def setup_logger(log_level=logging.INFO):
@@ -33,87 +42,134 @@ def setup_logger(log_level=logging.INFO):
 logger = setup_logger()
 
 
-def html_to_text(html_content):
+# 章节XHTML解析器：容忍格式错误，不解析外部实体、不联网
+_XHTML_PARSER = etree.XMLParser(recover=True, resolve_entities=False, no_network=True, huge_tree=True)
+_XHTML_PARSER_UTF8 = etree.XMLParser(recover=True, resolve_entities=False, no_network=True, huge_tree=True,
+                                     encoding='utf-8')
+
+TEXT_SKIPPED_TAGS = frozenset(['script', 'style', 'head'])   # 不属于正文的元素
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+TITLE_ATTR_PATTERN = re.compile(r'(chapter|title|heading)', re.IGNORECASE)
+CHAPTER_TEXT_PATTERN = re.compile(r'(第\s*[0-9一二三四五六七八九十百千万]+\s*[章节]|Chapter\s+\d+)', re.IGNORECASE)
+PARALLEL_BATCH_SIZE = 16      # 多进程提取时每个任务包含的文档数
+
+
+def _local_name(element):
+    """返回去掉命名空间的标签名；注释、实体等非元素节点返回空字符串"""
+    tag = element.tag
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_html(html_content):
     """
-    将HTML内容转换为纯文本
+    将章节HTML解析为lxml元素树
     
     Args:
-        html_content: HTML格式的内容字符串
-        
+        html_content: HTML内容（bytes 或 str）
+    
     Returns:
-        str: 提取并格式化后的纯文本
+        lxml元素: 根元素，内容为空时返回None
     """
-    try:
-        # 优先尝试使用XML解析器（适用于EPUB中的XML文档）
-        soup = BeautifulSoup(html_content, 'xml')
-    except Exception as e:
-        # 如果XML解析失败，回退到原来的lxml解析器
-        logger.debug(f"XML解析失败，回退到lxml: {e}")
-        soup = BeautifulSoup(html_content, 'lxml')
-    
-    # 移除脚本和样式元素
-    for script in soup(["script", "style"]):
-        script.extract()
-    
-    # 获取文本
-    text = soup.get_text()
+    if isinstance(html_content, str):
+        data, parser = html_content.encode('utf-8'), _XHTML_PARSER_UTF8
+    else:
+        data, parser = html_content, _XHTML_PARSER
+    if not data or not data.strip():
+        return None
     
-    # 处理多余的空行和空格
+    try:
+        root = etree.fromstring(data, parser)
+    except etree.XMLSyntaxError as e:
+        logger.debug(f"XML解析失败，回退到HTML解析: {e}")
+        root = None
+    if root is None:
+        # 不是合法的XML文档，按普通HTML解析
+        root = lxml.html.document_fromstring(data)
+    return root
+
+
+def _collect_text(element, parts, skipped_tags):
+    """按文档顺序收集元素内的文本（不含元素自身的tail），跳过注释、未解析的实体和指定元素"""
+    if element.text and isinstance(element.tag, str):
+        parts.append(element.text)
+    for child in element:
+        if isinstance(child.tag, str) and _local_name(child) not in skipped_tags:
+            _collect_text(child, parts, skipped_tags)
+        if child.tail:
+            parts.append(child.tail)
+
+
+def _element_text(element, skipped_tags=frozenset(['head'])):
+    parts = []
+    _collect_text(element, parts, skipped_tags)
+    return ''.join(parts)
+
+
+def _normalize_text(text):
+    """处理多余的空行和空格"""
     lines = (line.strip() for line in text.splitlines())
     chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    text = '\n'.join(chunk for chunk in chunks if chunk)
-    
-    return text
+    return '\n'.join(chunk for chunk in chunks if chunk)
 
 
-def extract_title_from_html(html_content):
+def _find_title(root):
     """
-    从HTML内容中提取章节标题
+    在已解析的元素树中查找章节标题（一次遍历收集全部候选）
     
     Args:
-        html_content: HTML格式的内容字符串
-        
+        root: 根元素
+    
     Returns:
-        str or None: 提取的章节标题，如果无法提取则返回None
+        str or None: 章节标题
     """
-    try:
-        # 优先尝试使用XML解析器（适用于EPUB中的XML文档）
-        soup = BeautifulSoup(html_content, 'xml')
-    except Exception as e:
-        # 如果XML解析失败，回退到原来的lxml解析器
-        logger.debug(f"XML解析失败，回退到lxml: {e}")
-        soup = BeautifulSoup(html_content, 'lxml')
+    first_headings = {}
+    class_matches = []
+    id_matches = []
+    string_parents = []
     
-    # 查找标题策略1: 标准HTML标题标签
-    for tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-        title_tag = soup.find(tag)
-        if title_tag and title_tag.get_text().strip():
-            return title_tag.get_text().strip()
+    def visit(element):
+        for child in element:
+            name = _local_name(child)
+            if name:
+                if name == 'head':
+                    # <head>中的内容不属于正文
+                    continue
+                if name in HEADING_TAGS and name not in first_headings:
+                    first_headings[name] = child
+                if TITLE_ATTR_PATTERN.search(child.get('class') or ''):
+                    class_matches.append(child)
+                if TITLE_ATTR_PATTERN.search(child.get('id') or ''):
+                    id_matches.append(child)
+                if child.text and CHAPTER_TEXT_PATTERN.search(child.text):
+                    string_parents.append(child)
+                visit(child)
+            elif child.text and child.tag is etree.Comment and CHAPTER_TEXT_PATTERN.search(child.text):
+                string_parents.append(element)
+            if child.tail and CHAPTER_TEXT_PATTERN.search(child.tail):
+                string_parents.append(element)
     
-    # 查找标题策略2: 特定class或id
-    title_candidates = []
-    title_pattern = re.compile(r'(chapter|title|heading)', re.IGNORECASE)
+    if root.text and CHAPTER_TEXT_PATTERN.search(root.text):
+        string_parents.append(root)
+    visit(root)
     
-    # 查找可能包含"chapter"、"title"、"heading"等关键词的class
-    for element in soup.find_all(class_=title_pattern):
-        text = element.get_text().strip()
-        if text:
-            title_candidates.append(text)
+    # 查找标题策略1: 标准HTML标题标签（每级只看第一个）
+    for tag in HEADING_TAGS:
+        heading = first_headings.get(tag)
+        if heading is not None:
+            text = _element_text(heading).strip()
+            if text:
+                return text
     
-    # 查找可能包含"chapter"、"title"、"heading"等关键词的id
-    for element in soup.find_all(id=title_pattern):
-        text = element.get_text().strip()
+    # 查找标题策略2: class或id中包含"chapter"、"title"、"heading"等关键词的元素
+    # 查找标题策略3: 包含章节模式文本的元素
+    title_candidates = []
+    for element in class_matches + id_matches + string_parents:
+        text = _element_text(element).strip()
         if text:
             title_candidates.append(text)
     
-    # 查找标题策略3: 章节模式文本
-    chapter_pattern = re.compile(r'(第\s*[0-9一二三四五六七八九十百千万]+\s*[章节]|Chapter\s+\d+)', re.IGNORECASE)
-    
-    for element in soup.find_all(string=chapter_pattern):
-        parent = element.parent
-        if parent and parent.get_text().strip():
-            title_candidates.append(parent.get_text().strip())
-    
     # 如果找到了候选标题，返回最长的一个(通常最完整)
     if title_candidates:
         return max(title_candidates, key=len)
@@ -122,6 +178,55 @@ def extract_title_from_html(html_content):
     return None
 
 
+def extract_chapter_from_html(html_content, find_title=True):
+    """
+    只解析一次HTML，同时提取章节标题和正文
+    
+    Args:
+        html_content: HTML内容（bytes 或 str）
+        find_title: 是否需要从内容中查找标题（已从TOC获得标题时可关闭）
+        
+    Returns:
+        tuple: (章节标题或None, 纯文本内容)
+    """
+    root = _parse_html(html_content)
+    if root is None:
+        return None, ''
+    
+    title = _find_title(root) if find_title else None
+    
+    # 移除脚本、样式以及<head>（其中的<title>不属于正文）
+    text = _normalize_text(_element_text(root, TEXT_SKIPPED_TAGS))
+    return title, text
+
+
+def html_to_text(html_content):
+    """
+    将HTML内容转换为纯文本
+    
+    Args:
+        html_content: HTML格式的内容字符串
+        
+    Returns:
+        str: 提取并格式化后的纯文本
+    """
+    return extract_chapter_from_html(html_content, find_title=False)[1]
+
+
+def extract_title_from_html(html_content):
+    """
+    从HTML内容中提取章节标题
+    
+    Args:
+        html_content: HTML格式的内容字符串
+        
+    Returns:
+        str or None: 提取的章节标题，如果无法提取则返回None
+    """
+    root = _parse_html(html_content)
+    return _find_title(root) if root is not None else None
+
+
 def get_spine_order(book):
     """
     获取EPUB书籍的spine顺序，这反映了阅读的正确顺序
@@ -244,58 +349,191 @@ def extract_toc_titles(book):
     return toc_map
 
 
-def extract_chapters(items, toc_map=None):
+def _extract_chapter(index, html_content, toc_title=None):
+    """
+    从单个文档中提取章节（串行和多进程共用，保证两者输出一致）
+    
+    Args:
+        index: 文档在阅读顺序中的序号（用于回退标题）
+        html_content: 文档原始内容（bytes）
+        toc_title: TOC中的章节标题
+    
+    Returns:
+        tuple: (章节标题, 章节内容)，内容可能为空
+    """
+    chapter_title = toc_title
+    
+    # 只解析一次HTML：TOC中没有标题时同时从内容中提取
+    html_title, chapter_text = extract_chapter_from_html(html_content, find_title=not chapter_title)
+    if not chapter_title:
+        chapter_title = html_title
+    
+    # 如果仍无法提取标题，使用简洁的回退格式
+    if not chapter_title:
+        chapter_title = f"Chapter_{index + 1}"
+    
+    # 清理章节内容，移除可能重复的标题
+    chapter_text = clean_content(chapter_text, chapter_title)
+    return chapter_title, chapter_text
+
+
+def _extract_chapter_batch(batch):
+    """
+    进程池任务：提取一批文档的章节
+    
+    Args:
+        batch: [(序号, 文档ID, 原始内容, TOC标题), ...]
+    
+    Returns:
+        list: 与输入顺序一致的 (文档ID, 章节标题, 章节内容, 错误信息) 列表
+    """
+    results = []
+    for index, item_id, html_content, toc_title in batch:
+        try:
+            chapter_title, chapter_text = _extract_chapter(index, html_content, toc_title)
+            results.append((item_id, chapter_title, chapter_text, None))
+        except Exception as e:
+            results.append((item_id, None, None, str(e)))
+    return results
+
+
+def _iter_documents(items, toc_map):
+    """按顺序读取文档内容，返回 (序号, 文档ID, 原始内容, TOC标题)"""
+    for index, item in enumerate(items):
+        item_id = item.get_id()
+        try:
+            html_content = item.get_content()
+        except Exception as e:
+            logger.warning(f"读取文档 {item_id} 时出错: {e}")
+            continue
+        
+        # 优先从TOC获取章节标题
+        toc_title = None
+        item_filename = item.get_name().split('#')[0].split('/')[-1]
+        if toc_map and item_filename in toc_map:
+            toc_title = toc_map[item_filename]
+            logger.debug(f"从TOC获取标题: {toc_title}")
+        
+        yield index, item_id, html_content, toc_title
+
+
+def _iter_extracted_parallel(documents, jobs, executor=None):
+    """
+    用进程池提取章节，按提交顺序返回结果
+    
+    主进程只负责读取原始内容；同时在途的批次数有上限，
+    不会为了排队把整本书的内容一次性读入内存。
+    
+    Args:
+        documents: _iter_documents 返回的文档迭代器
+        jobs: 进程数（决定在途批次上限）
+        executor: 共享的进程池；为None时为本次提取单独创建
+    """
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=jobs) as own_executor:
+            yield from _iter_extracted_parallel(documents, jobs, own_executor)
+        return
+    
+    in_flight = deque()
+    max_in_flight = jobs * 2
+    try:
+        while True:
+            batch = list(islice(documents, PARALLEL_BATCH_SIZE))
+            if batch:
+                in_flight.append(executor.submit(_extract_chapter_batch, batch))
+            if not in_flight:
+                break
+            if batch and len(in_flight) < max_in_flight:
+                continue
+            yield from in_flight.popleft().result()
+    finally:
+        # 提前结束（如写文件失败）时不再等待剩余批次
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_chapters(items, toc_map=None, jobs=1, executor=None, update_progress_func=None):
+    """
+    逐个从HTML文档中提取章节内容（生成器，按阅读顺序返回）
+    
+    Args:
+        items: 排序后的文档项（列表或按需读取内容的迭代器）
+        toc_map: 可选的TOC标题映射字典
+        jobs: 并行提取的进程数，1 表示在当前进程中串行处理
+        executor: 可选的共享进程池（批量分割多本书时使用）
+        update_progress_func: 可选的进度回调 (已处理文档数, 文档总数, 状态)，
+            每处理完一个文档调用一次；items 没有长度时文档总数为0
+    
+    Yields:
+        tuple: (章节标题, 章节内容)
+    """
+    total = len(items) if hasattr(items, '__len__') else 0
+    documents = _iter_documents(items, toc_map)
+    if jobs and jobs > 1:
+        results = _iter_extracted_parallel(documents, jobs, executor)
+    else:
+        results = (_extract_chapter_batch([document])[0] for document in documents)
+    
+    for processed, (item_id, chapter_title, chapter_text, error) in enumerate(results, 1):
+        if update_progress_func:
+            update_progress_func(processed, total, chapter_title or item_id)
+        if error is not None:
+            logger.warning(f"处理文档 {item_id} 时出错: {error}")
+        elif chapter_text.strip():
+            # 确保章节内容不为空
+            logger.info(f"已提取章节: {chapter_title}")
+            yield chapter_title, chapter_text
+        else:
+            logger.warning(f"跳过空章节: {chapter_title}")
+
+
+def extract_chapters(items, toc_map=None, jobs=1):
     """
     从HTML文档中提取章节内容
     
     Args:
         items: 排序后的文档项列表
         toc_map: 可选的TOC标题映射字典
+        jobs: 并行提取的进程数
     
     Returns:
         list: 包含(章节标题, 章节内容)元组的列表
     """
-    chapters = []
+    return list(iter_chapters(items, toc_map, jobs))
+
+
+def open_epub_documents(epub_path):
+    """
+    打开EPUB并返回按阅读顺序排列的文档和TOC标题映射
     
-    for index, item in enumerate(items):
-        try:
-            # 解码HTML内容
-            html_content = item.get_content().decode('utf-8')
-            
-            # 优先从TOC获取章节标题
-            chapter_title = None
-            item_name = item.get_name()
-            item_filename = item_name.split('#')[0].split('/')[-1]
-            
-            if toc_map and item_filename in toc_map:
-                chapter_title = toc_map[item_filename]
-                logger.debug(f"从TOC获取标题: {chapter_title}")
-            
-            # 如果TOC中没有，尝试从HTML内容提取
-            if not chapter_title:
-                chapter_title = extract_title_from_html(html_content)
-            
-            # 如果仍无法提取标题，使用简洁的回退格式
-            if not chapter_title:
-                chapter_title = f"Chapter_{index + 1}"
-                logger.debug(f"使用回退标题: {chapter_title}")
-            
-            # 提取章节文本
-            chapter_text = html_to_text(html_content)
-            
-            # 清理章节内容，移除可能重复的标题
-            chapter_text = clean_content(chapter_text, chapter_title)
-            
-            # 确保章节内容不为空
-            if chapter_text.strip():
-                chapters.append((chapter_title, chapter_text))
-                logger.info(f"已提取章节: {chapter_title}")
-            else:
-                logger.warning(f"跳过空章节: {chapter_title}")
-        except Exception as e:
-            logger.warning(f"处理文档 {item.get_id()} 时出错: {e}")
+    优先使用流式读取器（只解析 container.xml、OPF 和 NCX/nav，文档按需读取）；
+    EPUB结构不规范时回退到 ebooklib 完整读取。
     
-    return chapters
+    Args:
+        epub_path: EPUB文件路径
+    
+    Returns:
+        tuple: (文档列表, TOC标题映射, 关闭函数)
+    """
+    try:
+        reader = EpubReader(epub_path)
+    except EpubFormatError as e:
+        logger.warning(f"流式读取EPUB失败 ({e})，改用 ebooklib 完整读取")
+    else:
+        # 文档对象只记录路径，内容仍按需读取；转为列表以便得知文档总数
+        return list(reader.iter_documents()), reader.toc_map(), reader.close
+    
+    book = epub.read_epub(epub_path)
+    items = list(book.get_items_of_type(ebooklib.ITEM_DOCUMENT))
+    logger.info(f"总共找到 {len(items)} 个文档")
+    
+    # 获取spine顺序并排序文档
+    spine_order = get_spine_order(book)
+    items = sort_items_by_spine(items, spine_order)
+    
+    # 从TOC提取章节标题映射
+    toc_map = extract_toc_titles(book)
+    return items, toc_map, lambda: None
 
 
 def generate_output_filename(output_dir, book_title, file_index, chunk_chapters, 
@@ -327,6 +565,108 @@ def generate_output_filename(output_dir, book_title, file_index, chunk_chapters,
         return os.path.join(output_dir, f"{book_title}_[{file_index}].txt")
 
 
+def format_chapters(chunk_chapters):
+    """
+    生成输出文件的文本内容
+    
+    Args:
+        chunk_chapters: 要写入的章节列表
+    
+    Returns:
+        str: 文件内容
+    """
+    parts = []
+    for idx, (title, content) in enumerate(chunk_chapters):
+        # 直接写入章节内容
+        parts.append(content)
+        
+        # 只在章节之间添加分隔符，最后一个章节不添加
+        if idx < len(chunk_chapters) - 1:
+            parts.append("\n\n" + "-" * 50 + "\n\n")
+        else:
+            parts.append("\n")
+    return ''.join(parts)
+
+
+def _file_matches(path, data):
+    """判断磁盘上的文件内容是否与给定字节完全相同（先比较大小，再比较哈希）"""
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    except OSError:
+        return False
+    return digest.digest() == hashlib.sha256(data).digest()
+
+
+def update_chapters_file(output_filename, chunk_chapters):
+    """
+    增量写入：只有内容与磁盘上的文件不同时才重写，保持未变化文件的修改时间
+    
+    Args:
+        output_filename: 输出文件名
+        chunk_chapters: 要写入的章节列表
+    
+    Returns:
+        str or None: "written"（新建或内容有变化）、"unchanged"，写入失败时为None
+    """
+    text = format_chapters(chunk_chapters)
+    # 与文本模式写入时的换行转换保持一致
+    data = (text.replace('\n', os.linesep) if os.linesep != '\n' else text).encode('utf-8')
+    if _file_matches(output_filename, data):
+        logger.debug(f"文件未变化: {output_filename}")
+        return "unchanged"
+    
+    tmp_filename = f"{output_filename}.part"
+    try:
+        with open(tmp_filename, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_filename, output_filename)
+    except Exception as e:
+        logger.error(f"写入文件 {output_filename} 失败: {e}")
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        return None
+    
+    logger.info(f"已更新文件: {output_filename} (包含 {len(chunk_chapters)} 章节)")
+    return "written"
+
+
+def remove_orphan_files(output_dir, book_title, keep_files):
+    """
+    删除本次分割没有生成、但属于同一本书的旧输出文件
+    
+    Args:
+        output_dir: 输出目录
+        book_title: 书名（只处理 "书名_[" 开头的 .txt 文件）
+        keep_files: 本次生成的文件路径集合
+    
+    Returns:
+        int: 删除的文件数
+    """
+    keep_names = {os.path.basename(path) for path in keep_files}
+    prefix = f"{book_title}_["
+    removed = 0
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if (not entry.is_file() or name in keep_names
+                    or not name.startswith(prefix) or not name.endswith('.txt')):
+                continue
+            try:
+                os.remove(entry.path)
+                removed += 1
+                logger.info(f"已删除过期文件: {name}")
+            except OSError as e:
+                logger.warning(f"无法删除文件 {name}: {e}")
+    return removed
+
+
 def write_chapters_to_file(output_filename, chunk_chapters):
     """
     将章节内容写入文件
@@ -337,15 +677,7 @@ def write_chapters_to_file(output_filename, chunk_chapters):
     """
     try:
         with open(output_filename, 'w', encoding='utf-8') as f:
-            for idx, (title, content) in enumerate(chunk_chapters):
-                # 直接写入章节内容
-                f.write(content)
-                
-                # 只在章节之间添加分隔符，最后一个章节不添加
-                if idx < len(chunk_chapters) - 1:
-                    f.write("\n\n" + "-" * 50 + "\n\n")
-                else:
-                    f.write("\n")
+            f.write(format_chapters(chunk_chapters))
         
         logger.info(f"已创建文件: {output_filename} (包含 {len(chunk_chapters)} 章节)")
         return True
@@ -354,7 +686,8 @@ def write_chapters_to_file(output_filename, chunk_chapters):
         return False
 
 
-def split_epub(epub_path, output_dir, chapters_per_file=100, use_range_in_filename=True):
+def split_epub(epub_path, output_dir, chapters_per_file=100, use_range_in_filename=True, jobs=1,
+               incremental=False, update_progress_func=None):
     """
     分割EPUB文件，每个输出文件包含指定数量的章节
     
@@ -363,76 +696,223 @@ def split_epub(epub_path, output_dir, chapters_per_file=100, use_range_in_filena
         output_dir: 输出目录
         chapters_per_file: 每个txt文件中包含的章节数，默认为100
         use_range_in_filename: 是否在文件名中使用章节范围，默认为True
+        jobs: 并行提取章节的进程数，默认为1（串行）
+        incremental: 增量模式，只写入内容有变化的文件并删除过期文件，默认为False
+        update_progress_func: 可选的进度回调 (已处理文档数, 文档总数, 状态)
         
     Returns:
         bool: 操作是否成功
     """
+    return split_book(epub_path, output_dir, chapters_per_file, use_range_in_filename, jobs,
+                      incremental=incremental, update_progress_func=update_progress_func)["success"]
+
+
+def _book_result(epub_path, output_dir, error=None):
+    """创建单本书的统计结果，所有字段都有初始值"""
+    return {"epub": str(epub_path), "output_dir": str(output_dir), "success": False,
+            "chapters": 0, "files": 0, "error": error, "written": 0, "unchanged": 0, "removed": 0}
+
+
+def split_book(epub_path, output_dir, chapters_per_file=100, use_range_in_filename=True, jobs=1, executor=None,
+               incremental=False, update_progress_func=None):
+    """
+    分割单本EPUB并返回统计结果
+    
+    Args:
+        epub_path: EPUB文件路径
+        output_dir: 输出目录
+        chapters_per_file: 每个txt文件中包含的章节数
+        use_range_in_filename: 是否在文件名中使用章节范围
+        jobs: 并行提取章节的进程数
+        executor: 可选的共享进程池
+        incremental: 增量模式，只写入内容有变化的文件并删除过期文件
+        update_progress_func: 可选的进度回调 (已处理文档数, 文档总数, 状态)，每处理完一个文档调用一次
+        
+    Returns:
+        dict: {"epub": 路径, "output_dir": 输出目录, "success": 是否成功,
+               "chapters": 章节数, "files": 成功生成的文件数, "error": 错误信息,
+               "written": 写入的文件数, "unchanged": 未变化的文件数, "removed": 删除的过期文件数}
+    """
+    result = _book_result(epub_path, output_dir)
     try:
         # 创建输出目录（如果不存在）
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        # 读取EPUB文件
-        logger.info(f"正在读取EPUB文件: {epub_path}")
-        book = epub.read_epub(epub_path)
-        
         # 使用EPUB文件名作为书名
         book_title = Path(epub_path).stem
         book_title = get_safe_filename(book_title)
         
         logger.info(f"处理书籍: {book_title}")
         
-        # 获取所有HTML文档
-        items = list(book.get_items_of_type(ebooklib.ITEM_DOCUMENT))
-        logger.info(f"总共找到 {len(items)} 个文档")
-        
-        if not items:
-            logger.error("EPUB文件不包含任何文档")
-            return False
-        
-        # 获取spine顺序并排序文档
-        spine_order = get_spine_order(book)
-        items = sort_items_by_spine(items, spine_order)
-        
-        # 从TOC提取章节标题映射
-        toc_map = extract_toc_titles(book)
-        
-        # 提取章节
-        chapters = extract_chapters(items, toc_map)
-        
-        logger.info(f"成功提取 {len(chapters)} 个章节")
-        
-        if not chapters:
-            logger.error("未能提取任何章节。请检查EPUB文件是否有效。")
-            return False
+        # 读取EPUB文件（文档按需读取，逐章提取并写出）
+        logger.info(f"正在读取EPUB文件: {epub_path}")
+        items, toc_map, close_epub = open_epub_documents(epub_path)
         
-        # 按指定数量分割章节并写入txt文件
         successful_files = 0
-        total_files = (len(chapters) + chapters_per_file - 1) // chapters_per_file
+        total_files = 0
+        chapter_count = 0
+        chunk_chapters = []
+        generated_files = set()
         
-        for i in range(0, len(chapters), chapters_per_file):
-            chunk_chapters = chapters[i:i+chapters_per_file]
-            file_index = i // chapters_per_file + 1
-            
-            start_chapter = i + 1
-            end_chapter = min(i + chapters_per_file, len(chapters))
+        def flush_chunk():
+            nonlocal successful_files, total_files
+            total_files += 1
+            start_chapter = chapter_count - len(chunk_chapters) + 1
             
             # 生成输出文件名
             output_filename = generate_output_filename(
-                output_dir, book_title, file_index, chunk_chapters, 
-                use_range_in_filename, start_chapter, end_chapter
+                output_dir, book_title, total_files, chunk_chapters, 
+                use_range_in_filename, start_chapter, chapter_count
             )
             
+            generated_files.add(output_filename)
+            
             # 写入章节到文件
-            if write_chapters_to_file(output_filename, chunk_chapters):
+            if not incremental:
+                status = "written" if write_chapters_to_file(output_filename, chunk_chapters) else None
+            else:
+                status = update_chapters_file(output_filename, chunk_chapters)
+            if status:
                 successful_files += 1
+                result[status] += 1
+        
+        def report_progress(processed, total, title):
+            update_progress_func(processed, total,
+                                 f"已提取 {chapter_count} 章，已写出 {total_files} 个文件 - {title}")
+        
+        try:
+            # 按指定数量分割章节并写入txt文件
+            for chapter in iter_chapters(items, toc_map, jobs, executor,
+                                         report_progress if update_progress_func else None):
+                chunk_chapters.append(chapter)
+                chapter_count += 1
+                if len(chunk_chapters) >= chapters_per_file:
+                    flush_chunk()
+                    chunk_chapters = []
+            if chunk_chapters:
+                flush_chunk()
+        finally:
+            close_epub()
+        
+        logger.info(f"成功提取 {chapter_count} 个章节")
+        result["chapters"] = chapter_count
+        result["files"] = successful_files
+        
+        if not chapter_count:
+            logger.error("未能提取任何章节。请检查EPUB文件是否有效。")
+            result["error"] = "未能提取任何章节"
+            return result
         
         logger.info(f"总共分割为 {total_files} 个文件，成功生成 {successful_files} 个文件")
-        return successful_files == total_files
+        result["success"] = successful_files == total_files
+        if not result["success"]:
+            result["error"] = f"{total_files - successful_files} 个文件写入失败"
+        elif incremental:
+            # 只有全部写入成功时才清理过期文件，避免中途失败误删
+            result["removed"] = remove_orphan_files(output_dir, book_title, generated_files)
+        if incremental:
+            logger.info(f"增量更新: 写入 {result['written']} 个文件，未变化 {result['unchanged']} 个，"
+                        f"删除过期文件 {result['removed']} 个")
+        return result
         
     except Exception as e:
         logger.error(f"分割EPUB文件时出错: {e}")
-        return False
+        result["error"] = str(e)
+        return result
+
+
+def collect_epub_files(inputs):
+    """
+    将命令行输入（文件、目录或通配符）展开为EPUB文件列表
+    
+    Args:
+        inputs: 路径字符串列表
+    
+    Returns:
+        list: 去重并排序后的EPUB文件路径
+    """
+    found = []
+    for value in inputs:
+        path = Path(value)
+        if path.is_dir():
+            candidates = path.glob('*.epub')
+        elif path.is_file():
+            candidates = [path]
+        else:
+            candidates = (Path(p) for p in glob.glob(value))
+        found.extend(p for p in candidates if p.is_file() and p.suffix.lower() == '.epub')
+    return sorted(set(found), key=lambda p: str(p))
+
+
+def split_epubs(epub_paths, output_root=None, chapters_per_file=100, use_range_in_filename=True,
+                jobs=1, clean=True, fail_fast=False, incremental=False):
+    """
+    批量分割多本EPUB，所有书共用一个进程池
+    
+    每本书输出到 <输出根目录>/<书名>/splitted；单本书失败只记录在汇总中，
+    不影响其余书籍（fail_fast 为True时不再开始新的书）。
+    
+    Args:
+        epub_paths: EPUB文件路径列表
+        output_root: 输出根目录，默认为当前目录
+        chapters_per_file: 每个txt文件中包含的章节数
+        use_range_in_filename: 是否在文件名中使用章节范围
+        jobs: 进程池大小，同时也是同时处理的书籍数上限
+        clean: 是否清空每本书已有的输出文件
+        fail_fast: 出现失败后是否停止处理尚未开始的书
+        incremental: 增量模式（不清空输出目录，只写入有变化的文件）
+    
+    Returns:
+        list: 每本书的 split_book 统计结果（与输入顺序一致）
+    """
+    output_root = Path(output_root) if output_root else Path.cwd()
+    jobs = max(1, int(jobs or 1))
+    stop_event = threading.Event()
+    
+    def run_one(epub_path, executor):
+        output_dir = output_root / Path(epub_path).stem / "splitted"
+        if stop_event.is_set():
+            return _book_result(epub_path, output_dir, "已跳过（前面的书分割失败）")
+        try:
+            clean_output_directory(output_dir, clean and not incremental)
+            result = split_book(epub_path, output_dir, chapters_per_file, use_range_in_filename,
+                                jobs, executor, incremental)
+        except Exception as e:
+            result = _book_result(epub_path, output_dir, str(e))
+        if not result["success"]:
+            logger.error(f"分割失败: {epub_path} ({result['error']})")
+            if fail_fast:
+                stop_event.set()
+        return result
+    
+    if jobs == 1:
+        return [run_one(path, None) for path in epub_paths]
+    
+    # 书籍线程只负责读取压缩包和写文件，章节解析都在共享进程池中完成
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        with ThreadPoolExecutor(max_workers=min(jobs, len(epub_paths) or 1)) as book_executor:
+            futures = [book_executor.submit(run_one, path, executor) for path in epub_paths]
+            return [future.result() for future in futures]
+
+
+def log_batch_summary(results, elapsed):
+    """输出批量分割的汇总信息"""
+    succeeded = [r for r in results if r["success"]]
+    failed = [r for r in results if not r["success"]]
+    logger.info("=" * 50)
+    logger.info(f"批量分割完成: 共 {len(results)} 本，成功 {len(succeeded)} 本，失败 {len(failed)} 本，"
+                f"耗时 {elapsed:.1f} 秒")
+    logger.info(f"共提取 {sum(r['chapters'] for r in results)} 个章节，"
+                f"生成 {sum(r['files'] for r in results)} 个文件")
+    if any(r['unchanged'] or r['removed'] for r in results):
+        logger.info(f"增量更新: 写入 {sum(r['written'] for r in results)} 个，"
+                    f"未变化 {sum(r['unchanged'] for r in results)} 个，"
+                    f"删除过期文件 {sum(r['removed'] for r in results)} 个")
+    for r in succeeded:
+        logger.info(f"  成功: {Path(r['epub']).name} -> {r['output_dir']} ({r['chapters']} 章)")
+    for r in failed:
+        logger.error(f"  失败: {Path(r['epub']).name} ({r['error']})")
 
 
 def prepare_output_directory(args):
@@ -458,10 +938,24 @@ def prepare_output_directory(args):
     else:
         output_dir = Path(args.output)
     
+    clean_output_directory(output_dir, not (args.no_clean or args.incremental))
+    return str(output_dir)
+
+
+def clean_output_directory(output_dir, clean=True):
+    """
+    清空输出目录中的已有文件并确保目录存在
+    
+    Args:
+        output_dir: 输出目录
+        clean: 是否清空目录中的文件
+    """
+    output_dir = Path(output_dir)
+    
     # 清空输出目录中的所有文件（如果目录存在）
     if output_dir.exists():
         files = [f for f in output_dir.iterdir() if f.is_file()]
-        if files and not args.no_clean:
+        if files and clean:
             logger.info(f"清空目录 {output_dir} 中的 {len(files)} 个文件...")
             for file in files:
                 try:
@@ -471,19 +965,22 @@ def prepare_output_directory(args):
     
     # 确保输出目录存在
     output_dir.mkdir(parents=True, exist_ok=True)
-    
-    return str(output_dir)
 
 
 def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='将EPUB文件按章节分割成多个TXT文件')
-    parser.add_argument('epub_file', help='EPUB文件路径')
-    parser.add_argument('-o', '--output', default=None, help='输出目录 (默认: 自动创建与EPUB文件同名的目录下的splitted目录)')
+    parser.add_argument('epub_file', nargs='+', help='EPUB文件路径；也可以是目录或通配符（如 books/*.epub），此时批量分割')
+    parser.add_argument('-o', '--output', default=None, help='输出目录 (默认: 自动创建与EPUB文件同名的目录下的splitted目录；'
+                                                             '批量模式下为输出根目录，每本书输出到 <根目录>/<书名>/splitted)')
     parser.add_argument('-c', '--chapters', type=int, default=100, help='每个TXT文件包含的章节数 (默认: 100)')
     parser.add_argument('-r', '--use-range', action='store_true', help='在文件名中使用章节范围 (如: 书名_[1-100].txt)')
     parser.add_argument('-s', '--simple', action='store_true', help='使用简单文件名格式 (如: 书名_[1].txt)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='并行提取章节的进程数，批量模式下所有书共用 (默认: 1)')
+    parser.add_argument('--fail-fast', action='store_true', help='批量模式下出现失败后不再开始新的书 (默认: 跳过失败的书继续处理)')
     parser.add_argument('-n', '--no-clean', action='store_true', help='不清空输出目录')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help='增量分割：不清空输出目录，只写入内容有变化的文件并删除过期文件')
     parser.add_argument('-v', '--verbose', action='store_true', help='显示详细日志')
     parser.add_argument('-q', '--quiet', action='store_true', help='仅显示错误信息')
     
@@ -495,24 +992,27 @@ def main():
     elif args.quiet:
         setup_logger(logging.ERROR)
     
-    # 检查EPUB文件是否存在
-    if not Path(args.epub_file).is_file():
-        logger.error(f"错误: 找不到EPUB文件 '{args.epub_file}'")
-        return 1
+    # 确定是否在文件名中使用章节范围
+    use_range_in_filename = args.use_range and not args.simple
+    
+    # 多个输入、目录或通配符：批量分割
+    if len(args.epub_file) > 1 or not Path(args.epub_file[0]).is_file():
+        return run_batch(args, use_range_in_filename)
+    args.epub_file = args.epub_file[0]
     
     # 准备输出目录
     output_dir = prepare_output_directory(args)
     
-    # 确定是否在文件名中使用章节范围
-    use_range_in_filename = args.use_range and not args.simple
-    
     # 显示处理信息
     logger.info(f"开始处理EPUB文件: {args.epub_file}")
     logger.info(f"输出目录: {output_dir}")
     logger.info(f"每个文件的章节数: {args.chapters}")
+    if args.jobs > 1:
+        logger.info(f"并行进程数: {args.jobs}")
     
     # 分割EPUB文件
-    success = split_epub(args.epub_file, output_dir, args.chapters, use_range_in_filename)
+    success = split_epub(args.epub_file, output_dir, args.chapters, use_range_in_filename, args.jobs,
+                         incremental=args.incremental)
     
     if success:
         logger.info(f"分割完成! 文件已保存到 {output_dir} 目录")
@@ -522,6 +1022,33 @@ def main():
         return 1
 
 
+def run_batch(args, use_range_in_filename):
+    """
+    执行批量分割命令
+    
+    Args:
+        args: 命令行参数
+        use_range_in_filename: 是否在文件名中使用章节范围
+    
+    Returns:
+        int: 退出码，全部成功时为0
+    """
+    epub_paths = collect_epub_files(args.epub_file)
+    if not epub_paths:
+        logger.error(f"错误: 找不到EPUB文件 '{' '.join(args.epub_file)}'")
+        return 1
+    
+    logger.info(f"批量分割 {len(epub_paths)} 本EPUB，并行进程数: {max(1, args.jobs)}")
+    logger.info(f"输出根目录: {args.output or Path.cwd()}")
+    
+    start_time = time.time()
+    results = split_epubs(epub_paths, args.output, args.chapters, use_range_in_filename,
+                          args.jobs, clean=not args.no_clean, fail_fast=args.fail_fast,
+                          incremental=args.incremental)
+    log_batch_summary(results, time.time() - start_time)
+    return 0 if all(r["success"] for r in results) else 1
+
+
 if __name__ == '__main__':
     exit_code = main()
     exit(exit_code) 
@@ -4,8 +4,11 @@
 API服务模块 - 处理Gemini API和OpenAI API的调用和响应
 """
 
+import hashlib
 import json
 import requests
+import string
+import threading
 import time
 import traceback
 import re
@@ -13,7 +16,8 @@ from typing import Dict, Optional, List, Any, Union, Tuple, Callable
 
 # 导入配置和工具
 from . import config
-from .key_manager import APIKeyManager
+from .key_manager import APIKeyManager, PRIORITY_INTERACTIVE
+from .stats import record_token_usage
 from ..utils import setup_logger
 
 # 设置日志记录器
@@ -27,10 +31,32 @@ logger = setup_logger(__name__)
 MAX_API_INPUT_LENGTH = 32000  # 单个API请求的最大输入字符数
 MAX_CHUNK_LENGTH = 20000      # 分块处理时的单个块最大字符数
 
+# 多章打包请求的分隔标记（{index} 为包内章节序号，从1开始）
+PACK_START_MARKER = "<<<章节{index}>>>"
+PACK_END_MARKER = "<<<章节{index}结束>>>"
+_PACK_SECTION_PATTERN = re.compile(r"<<<\s*章节\s*(\d+)\s*>>>(.*?)<<<\s*章节\s*\1\s*结束\s*>>>", re.S)
+
+# 提示词模板中随章节变化的字数占位符；静态系统提示词中替换为固定名称，数值写在用户消息开头
+_PROMPT_COUNT_LABELS = {
+    "original_count": "〔原文字数〕",
+    "min_count": "〔目标下限〕",
+    "max_count": "〔目标上限〕",
+}
+_DEFAULT_CONDENSER_PROMPT = "你是一个小说内容压缩工具。请将下面的小说内容精简到原来的{min_ratio}%-{max_ratio}%左右，同时保留所有重要情节、对话和描写，不要遗漏关键情节和人物。不要添加任何解释或总结，直接输出压缩后的内容。"
+
+# Gemini显式缓存：(密钥, 地址, 模型, 提示词哈希) -> (缓存名称或None（不可用）, 过期/重试时间)
+_gemini_cached_contents: Dict[Tuple[str, str, str, str], Tuple[Optional[str], float]] = {}
+_gemini_cache_lock = threading.Lock()
+_gemini_cache_creating: Dict[Tuple[str, str, str, str], threading.Event] = {}  # 正在创建中的显式缓存
+_GEMINI_CACHE_RETRY_SECONDS = 300  # 显式缓存创建遇到临时错误后，隔多久再尝试
+
 # 全局密钥管理器实例
 global_key_manager = None
 global_openai_key_manager = None
 
+# 每个线程复用一个HTTP会话，保持与API服务器的连接
+_session_local = threading.local()
+
 # =========================================================
 
 def _get_api_key_config(api_type: str, api_key_config: Optional[Dict] = None, key_manager: Optional[APIKeyManager] = None) -> Optional[Dict]:
@@ -92,7 +118,7 @@ def _try_get_key_manager_from_modules(api_type: str) -> Optional[APIKeyManager]:
     """
     try:
         import sys
-        for module_name in ['main', f'novel_condenser.main']:
+        for module_name in ['src.core.novel_condenser.main', 'main', 'novel_condenser.main']:
             if module_name in sys.modules:
                 main_module = sys.modules[module_name]
                 manager_name = f"{api_type}_key_manager"
@@ -235,14 +261,20 @@ def _build_request_headers(api_type: str, api_key: str, redirect_url: str) -> Di
         
     return headers
 
-def _build_request_data(api_type: str, model: str, system_prompt: str, content: str) -> Dict:
+def _build_request_data(api_type: str, model: str, system_prompt: str, content: str, request_note: str = "",
+                        cached_content: Optional[str] = None, prompt_cache_key: Optional[str] = None) -> Dict:
     """构建API请求数据
     
+    系统提示词总在请求最前面，其后才是随请求变化的说明与内容，使相同的提示词构成可缓存的前缀。
+    
     Args:
         api_type: API类型，"gemini"或"openai"
         model: 模型名称
         system_prompt: 系统提示词
         content: 内容文本
+        request_note: 本次请求的说明（字数要求等），放在内容之前
+        cached_content: Gemini显式缓存名称，提供时系统提示词由缓存提供，不再随请求发送
+        prompt_cache_key: OpenAI的 prompt_cache_key，用于把相同前缀的请求路由到同一缓存
     
     Returns:
         Dict: 请求数据字典
@@ -256,13 +288,16 @@ def _build_request_data(api_type: str, model: str, system_prompt: str, content:
         # Gemini格式的请求数据
         top_k = config.LLM_GENERATION_PARAMS.get("top_k", 40)
         
-        return {
+        parts = [] if cached_content else [{"text": system_prompt}]
+        if request_note:
+            parts.append({"text": request_note})
+        parts.append({"text": content})
+        
+        data = {
             "contents": [
                 {
-                    "parts": [
-                        {"text": system_prompt},
-                        {"text": content}
-                    ]
+                    "role": "user",
+                    "parts": parts
                 }
             ],
             "generationConfig": {
@@ -280,9 +315,12 @@ def _build_request_data(api_type: str, model: str, system_prompt: str, content:
                 }
             ]
         }
+        if cached_content:
+            data["cachedContent"] = cached_content
+        return data
     else:
         # OpenAI格式的请求数据
-        return {
+        data = {
             "model": model,
             "messages": [
                 {
@@ -291,7 +329,7 @@ def _build_request_data(api_type: str, model: str, system_prompt: str, content:
                 },
                 {
                     "role": "user",
-                    "content": content
+                    "content": f"{request_note}\n\n{content}" if request_note else content
                 }
             ],
             "temperature": temperature,
@@ -300,6 +338,60 @@ def _build_request_data(api_type: str, model: str, system_prompt: str, content:
             "frequency_penalty": 0,
             "presence_penalty": 0
         }
+        if prompt_cache_key:
+            data["prompt_cache_key"] = prompt_cache_key
+        return data
+
+def split_content_into_chunks(content: str) -> List[str]:
+    """按句子把超长内容切分为不超过 MAX_CHUNK_LENGTH 的块
+    
+    Args:
+        content: 要切分的内容
+    
+    Returns:
+        List[str]: 切分后的块列表
+    """
+    chunks = []
+    current_chunk = ""
+    current_chunk_length = 0
+    sentences = re.split(r'([。！？\.!?])', content)
+    
+    # 处理切分后的句子并重组
+    for i in range(0, len(sentences), 2):
+        sentence = sentences[i]
+        # 如果有标点，加上标点
+        if i + 1 < len(sentences):
+            sentence += sentences[i + 1]
+            
+        sentence_length = len(sentence)
+        
+        # 如果当前块加上这个句子超过了最大长度限制，或者这是一个超长句子
+        if current_chunk_length + sentence_length > MAX_CHUNK_LENGTH or sentence_length > MAX_CHUNK_LENGTH:
+            # 如果当前块不为空，添加到块列表
+            if current_chunk:
+                chunks.append(current_chunk)
+                current_chunk = ""
+                current_chunk_length = 0
+                
+            # 处理超长句子
+            if sentence_length > MAX_CHUNK_LENGTH:
+                # 直接按字符切分超长句子
+                sub_chunks = [sentence[i:i+MAX_CHUNK_LENGTH] for i in range(0, len(sentence), MAX_CHUNK_LENGTH)]
+                chunks.extend(sub_chunks)
+            else:
+                # 开始新的块
+                current_chunk = sentence
+                current_chunk_length = sentence_length
+        else:
+            # 添加句子到当前块
+            current_chunk += sentence
+            current_chunk_length += sentence_length
+    
+    # 添加最后一个块（如果有）
+    if current_chunk:
+        chunks.append(current_chunk)
+    
+    return chunks
 
 def _process_content_in_chunks(content: str, api_type: str, api_key: str, redirect_url: str, model: str, 
                               key_manager: Optional[APIKeyManager] = None, custom_prompt_template: Optional[str] = None) -> Optional[str]:
@@ -352,45 +444,7 @@ def _process_content_in_chunks(content: str, api_type: str, api_key: str, redire
     logger.info(f"内容长度({content_len}字)超过API限制，将分块处理")
     
     # 分块处理
-    chunks = []
-    current_chunk = ""
-    current_chunk_length = 0
-    sentences = re.split(r'([。！？\.!?])', content)
-    
-    # 处理切分后的句子并重组
-    for i in range(0, len(sentences), 2):
-        sentence = sentences[i]
-        # 如果有标点，加上标点
-        if i + 1 < len(sentences):
-            sentence += sentences[i + 1]
-            
-        sentence_length = len(sentence)
-        
-        # 如果当前块加上这个句子超过了最大长度限制，或者这是一个超长句子
-        if current_chunk_length + sentence_length > MAX_CHUNK_LENGTH or sentence_length > MAX_CHUNK_LENGTH:
-            # 如果当前块不为空，添加到块列表
-            if current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = ""
-                current_chunk_length = 0
-                
-            # 处理超长句子
-            if sentence_length > MAX_CHUNK_LENGTH:
-                # 直接按字符切分超长句子
-                sub_chunks = [sentence[i:i+MAX_CHUNK_LENGTH] for i in range(0, len(sentence), MAX_CHUNK_LENGTH)]
-                chunks.extend(sub_chunks)
-            else:
-                # 开始新的块
-                current_chunk = sentence
-                current_chunk_length = sentence_length
-        else:
-            # 添加句子到当前块
-            current_chunk += sentence
-            current_chunk_length += sentence_length
-    
-    # 添加最后一个块（如果有）
-    if current_chunk:
-        chunks.append(current_chunk)
+    chunks = split_content_into_chunks(content)
     
     # 处理每个块
     total_chunks = len(chunks)
@@ -512,7 +566,9 @@ def _process_chunk_with_retry(chunk: str, api_type: str, api_key: str, redirect_
 def _process_content_with_api(content: str, api_type: str, api_key: str, redirect_url: str, model: str, 
                              is_chunk: bool = False, chunk_index: int = 0, total_chunks: int = 0,
                              custom_prompt_template: Optional[str] = None,
-                             display_label: Optional[str] = None) -> Optional[str]:
+                             display_label: Optional[str] = None,
+                             system_prompt: Optional[str] = None,
+                             request_note: str = "") -> Optional[str]:
     """通用的API内容处理函数
     
     Args:
@@ -525,14 +581,26 @@ def _process_content_with_api(content: str, api_type: str, api_key: str, redirec
         chunk_index: 分块索引
         total_chunks: 总分块数
         custom_prompt_template: 自定义提示词模板，如果提供则优先使用
+        system_prompt: 已构建好的系统提示词（如多章打包请求），提供时不再按模板生成
+        request_note: 与 system_prompt 一起提供的本次请求说明
     
     Returns:
         Optional[str]: 处理后的内容，处理失败则返回None
     """
-    # 构建提示词，并传递自定义提示词模板
-    system_prompt = generate_novel_condenser_prompt(
-        is_chunk, chunk_index, total_chunks, len(content), custom_prompt_template
-    )
+    # 构建提示词（静态系统提示词 + 本次请求的字数说明），并传递自定义提示词模板
+    if system_prompt is None:
+        system_prompt, request_note = build_condense_prompt_parts(
+            is_chunk, chunk_index, total_chunks, len(content), custom_prompt_template
+        )
+    
+    # 静态系统提示词可由供应商缓存
+    cached_content = None
+    prompt_cache_key = None
+    if config.PROMPT_CACHE_SETTINGS.get("split_static_prompt", True):
+        if api_type == "gemini":
+            cached_content = _get_gemini_cached_content(api_key, redirect_url, model, system_prompt)
+        else:
+            prompt_cache_key = _get_openai_prompt_cache_key(redirect_url, system_prompt)
     
     # 构建API URL
     final_api_url = _build_api_url(api_type, api_key, redirect_url, model)
@@ -541,7 +609,8 @@ def _process_content_with_api(content: str, api_type: str, api_key: str, redirec
     headers = _build_request_headers(api_type, api_key, redirect_url)
     
     # 构建请求数据
-    request_data = _build_request_data(api_type, model, system_prompt, content)
+    request_data = _build_request_data(api_type, model, system_prompt, content, request_note,
+                                       cached_content, prompt_cache_key)
     
     # 从配置获取重试相关参数
     max_retries = config.LLM_GENERATION_PARAMS.get("max_retries", 3)
@@ -564,6 +633,7 @@ def _process_content_with_api(content: str, api_type: str, api_key: str, redirec
     logger.debug(f"设置请求超时: {timeout}秒")
     
     # 使用通用API请求函数
+    error_info: Dict = {}
     response_json = _make_api_request(
         url=final_api_url, 
         headers=headers, 
@@ -573,9 +643,29 @@ def _process_content_with_api(content: str, api_type: str, api_key: str, redirec
         retry_delay=retry_delay,
         timeout=timeout,
         display_label=display_label,
+        error_info=error_info,
     )
     
+    if not response_json and cached_content and _is_cached_content_error(error_info):
+        # 显式缓存已过期或被删除：删除旧缓存，换用新缓存重发一次
+        _invalidate_gemini_cached_content(api_key, redirect_url, model, cached_content)
+        cached_content = _get_gemini_cached_content(api_key, redirect_url, model, system_prompt)
+        request_data = _build_request_data(api_type, model, system_prompt, content, request_note,
+                                           cached_content, prompt_cache_key)
+        response_json = _make_api_request(
+            url=final_api_url,
+            headers=headers,
+            data=request_data,
+            api_type=api_type,
+            max_retries=max_retries,
+            retry_delay=retry_delay,
+            timeout=timeout,
+            display_label=display_label,
+        )
+    
     if response_json:
+        _record_response_usage(response_json, api_type)
+        
         # 解析响应
         condensed_text = _parse_llm_response(response_json, api_type)
         if condensed_text:
@@ -584,15 +674,160 @@ def _process_content_with_api(content: str, api_type: str, api_key: str, redirec
             logger.warning(f"{api_type.capitalize()} API返回了空内容或无法识别的响应格式")
             # 尝试记录完整响应进行调试
             logger.debug(f"完整响应: {json.dumps(response_json)}")
-    else:
-        # 保持由调用方负责上报错误，避免重复计数
-        pass
+    # 失败时保持由调用方负责上报错误，避免重复计数
     
     # 请求失败
     return None
 
+def _prompt_hash(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+def _get_openai_prompt_cache_key(redirect_url: str, system_prompt: str) -> Optional[str]:
+    """按配置返回 prompt_cache_key（相同系统提示词的请求使用相同的键）
+    
+    OpenAI 对超过一定长度的相同前缀自动缓存，prompt_cache_key 帮助把这些请求路由到同一缓存；
+    部分兼容接口不接受未知参数，默认只对官方接口发送。
+    """
+    setting = config.PROMPT_CACHE_SETTINGS.get("openai_prompt_cache_key", "auto")
+    if setting == "auto":
+        setting = not redirect_url or "openai.com" in redirect_url
+    if not setting:
+        return None
+    return f"ainovellab-{_prompt_hash(system_prompt)}"
+
+def _get_gemini_cached_content(api_key: str, redirect_url: str, model: str, system_prompt: str) -> Optional[str]:
+    """返回系统提示词对应的Gemini显式缓存名称，必要时创建；不可用时返回None（退回隐式前缀缓存）
+    
+    每个 (密钥, 地址, 模型, 提示词) 只创建一次，到期前重建。永久性失败（HTTP 400/404，如提示词短于
+    缓存的最小token数、代理不支持 cachedContents）后本次运行不再尝试；超时、429、5xx 等临时错误
+    在 _GEMINI_CACHE_RETRY_SECONDS 秒后重试。
+    
+    锁只用于读取和发布条目；创建请求在锁外发出，同一缓存的其他线程等待创建完成，不同缓存互不阻塞。
+    """
+    if not config.PROMPT_CACHE_SETTINGS.get("gemini_cached_content", True):
+        return None
+    cache_id = (api_key, redirect_url or "", model, _prompt_hash(system_prompt))
+    while True:
+        with _gemini_cache_lock:
+            entry = _gemini_cached_contents.get(cache_id)
+            if entry and time.time() < entry[1]:
+                return entry[0]
+            creating = _gemini_cache_creating.get(cache_id)
+            if creating is None:
+                creating = _gemini_cache_creating[cache_id] = threading.Event()
+                break
+        # 其他线程正在创建同一缓存：等待其结果，超时则本次直接使用隐式前缀缓存
+        if not creating.wait(timeout=35):
+            return None
+    
+    name = None
+    permanent = True
+    ttl = int(config.PROMPT_CACHE_SETTINGS.get("gemini_cache_ttl_seconds", 3600))
+    try:
+        base_url = _gemini_api_base(redirect_url, model)
+        if base_url:
+            try:
+                response = _get_session().post(
+                    f"{base_url}/cachedContents",
+                    headers={"Content-Type": "application/json", "x-goog-api-key": api_key},
+                    json={
+                        "model": f"models/{model}",
+                        "systemInstruction": {"parts": [{"text": system_prompt}]},
+                        "ttl": f"{ttl}s",
+                    },
+                    timeout=30,
+                )
+                if response.status_code < 400:
+                    name = response.json().get("name")
+                else:
+                    permanent = response.status_code in (400, 404)
+                    logger.info(f"Gemini显式缓存不可用（HTTP {response.status_code}: {response.text[:200]}），使用隐式前缀缓存")
+            except Exception as e:
+                permanent = False
+                logger.info(f"Gemini显式缓存暂时不可用（{e}），使用隐式前缀缓存")
+        if name:
+            logger.info(f"已创建Gemini提示词缓存: {name}（有效期 {ttl} 秒）")
+    finally:
+        with _gemini_cache_lock:
+            if name:
+                # 提前重建，避免请求发出时缓存恰好过期
+                _gemini_cached_contents[cache_id] = (name, time.time() + ttl * 0.9)
+            elif permanent:
+                _gemini_cached_contents[cache_id] = (None, float("inf"))
+            else:
+                _gemini_cached_contents[cache_id] = (None, time.time() + _GEMINI_CACHE_RETRY_SECONDS)
+            _gemini_cache_creating.pop(cache_id).set()
+    return name
+
+def _gemini_api_base(redirect_url: str, model: str) -> Optional[str]:
+    """返回Gemini接口的版本根地址（/models/ 之前的部分），无法识别时返回None"""
+    url = _build_gemini_url(redirect_url, model).split("?")[0]
+    if "/models/" not in url:
+        return None
+    return url[:url.index("/models/")]
+
+def _is_cached_content_error(error_info: Dict) -> bool:
+    """判断请求失败是否因为引用的显式缓存已过期、被删除或无效"""
+    if error_info.get("status_code") not in (400, 403, 404):
+        return False
+    error_json = error_info.get("error")
+    error = error_json.get("error") if isinstance(error_json, dict) else None
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get("message", "")).lower()
+    return "cachedcontent" in message.replace(" ", "") or "cached content" in message
+
+def _invalidate_gemini_cached_content(api_key: str, redirect_url: str, model: str, name: str) -> None:
+    """丢弃失效的Gemini显式缓存并尽量删除服务端对象，下次请求时重新创建"""
+    with _gemini_cache_lock:
+        for cache_id, entry in list(_gemini_cached_contents.items()):
+            if entry[0] == name:
+                del _gemini_cached_contents[cache_id]
+    base_url = _gemini_api_base(redirect_url, model)
+    if not base_url:
+        return
+    try:
+        # 缓存已不存在时返回404，忽略即可；删除失败也只会在到期后自动释放
+        _get_session().delete(f"{base_url}/{name}", headers={"x-goog-api-key": api_key}, timeout=10)
+    except Exception as e:
+        logger.debug(f"删除Gemini提示词缓存 {name} 失败: {e}")
+
+def _extract_token_usage(response_json: Dict, api_type: str) -> Optional[Tuple[int, int]]:
+    """从响应的用量字段读取 (输入token数, 命中缓存的token数)，没有用量信息时返回None"""
+    if api_type == "gemini":
+        usage = response_json.get("usageMetadata")
+        if not isinstance(usage, dict):
+            return None
+        return int(usage.get("promptTokenCount") or 0), int(usage.get("cachedContentTokenCount") or 0)
+    
+    usage = response_json.get("usage")
+    if not isinstance(usage, dict):
+        return None
+    details = usage.get("prompt_tokens_details") or {}
+    # OpenAI: prompt_tokens_details.cached_tokens；DeepSeek等兼容接口: prompt_cache_hit_tokens
+    cached = details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0
+    return int(usage.get("prompt_tokens") or 0), int(cached)
+
+def _record_response_usage(response_json: Dict, api_type: str) -> None:
+    """把响应中的输入token与缓存命中数计入运行统计"""
+    try:
+        usage = _extract_token_usage(response_json, api_type)
+    except (TypeError, ValueError):
+        return
+    if usage:
+        record_token_usage(*usage)
+
+def _get_session() -> requests.Session:
+    """返回当前线程的HTTP会话（连接池复用，避免每个请求重新建立TCP/TLS连接）"""
+    session = getattr(_session_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        _session_local.session = session
+    return session
+
 def _make_api_request(url: str, headers: Dict, data: Dict, api_type: str, max_retries: int = 3, 
-                     retry_delay: int = 5, timeout: Union[int, Tuple[int, int]] = 120, display_label: Optional[str] = None) -> Optional[Dict]:
+                     retry_delay: int = 5, timeout: Union[int, Tuple[int, int]] = 120, display_label: Optional[str] = None,
+                     error_info: Optional[Dict] = None) -> Optional[Dict]:
     """通用的API请求处理函数
     
     Args:
@@ -603,10 +838,13 @@ def _make_api_request(url: str, headers: Dict, data: Dict, api_type: str, max_re
         max_retries: 最大重试次数
         retry_delay: 基础重试延迟（秒）
         timeout: 请求超时时间（秒），或(connect_timeout, read_timeout)
+        error_info: 可选，失败时写入最后一次错误的 status_code 与 error（错误响应JSON）
     
     Returns:
         Optional[Dict]: API响应数据，请求失败则返回None
     """
+    if error_info is None:
+        error_info = {}
     attempt = 0
     max_attempts = max_retries
     extra_retry_granted = False
@@ -618,7 +856,7 @@ def _make_api_request(url: str, headers: Dict, data: Dict, api_type: str, max_re
             label = f"[{display_label}]" if display_label else ""
             # 提升到info，以便默认日志级别可见所用密钥名称
             logger.info(f"发送{api_type.capitalize()} API请求{label} (尝试 {attempt}/{max_attempts})")
-            response = requests.post(url, headers=headers, json=data, timeout=timeout)
+            response = _get_session().post(url, headers=headers, json=data, timeout=timeout)
             
             # 检查响应状态码
             if response.status_code == 200:
@@ -634,6 +872,12 @@ def _make_api_request(url: str, headers: Dict, data: Dict, api_type: str, max_re
                 logger.error(f"错误详情{label}: {json.dumps(error_json)}")
             except:
                 logger.error(f"响应内容{label}: {response.text}")
+            error_info.update(status_code=response.status_code, error=error_json)
+            
+            # 引用的显式缓存已失效时重试没有意义，交给调用方换用新缓存
+            if "cachedContent" in data and _is_cached_content_error(error_info):
+                logger.warning(f"{api_type.capitalize()} 提示词缓存已失效{label}")
+                return None
                 
             # 处理配额超限错误，可能需要特殊等待
             if response.status_code == 429:
@@ -651,8 +895,10 @@ def _make_api_request(url: str, headers: Dict, data: Dict, api_type: str, max_re
         except requests.exceptions.Timeout:
             label = f"[{display_label}]" if display_label else ""
             logger.warning(f"{api_type.capitalize()} API请求超时{label}")
+            error_info.update(status_code=None, error=None)
             
         except Exception as e:
+            error_info.update(status_code=None, error=None)
             label = f"[{display_label}]" if display_label else ""
             logger.error(f"{api_type.capitalize()}请求处理过程中发生错误{label}: {e}")
             logger.debug(traceback.format_exc())
@@ -784,8 +1030,7 @@ def generate_novel_condenser_prompt(is_chunk: bool = False, chunk_index: int = 0
         prompt_template = custom_prompt_template
     else:
         # 否则从配置中获取
-        prompt_template = config.PROMPT_TEMPLATES.get("novel_condenser", 
-                         "你是一个小说内容压缩工具。请将下面的小说内容精简到原来的{min_ratio}%-{max_ratio}%左右，同时保留所有重要情节、对话和描写，不要遗漏关键情节和人物。不要添加任何解释或总结，直接输出压缩后的内容。")
+        prompt_template = config.PROMPT_TEMPLATES.get("novel_condenser", _DEFAULT_CONDENSER_PROMPT)
     
     # 基于原文字数计算目标字数范围
     if content_length > 0:
@@ -822,6 +1067,56 @@ def generate_novel_condenser_prompt(is_chunk: bool = False, chunk_index: int = 0
     
     return prompt
 
+def build_condense_prompt_parts(is_chunk: bool = False, chunk_index: int = 0, total_chunks: int = 0,
+                                content_length: int = 0, custom_prompt_template: Optional[str] = None) -> Tuple[str, str]:
+    """生成便于供应商缓存的提示词：(静态系统提示词, 本次请求的说明)
+    
+    模板中只有字数（original_count/min_count/max_count）与分块序号随请求变化。静态系统提示词
+    把字数占位符替换为固定名称（如〔目标下限〕），在所有请求间完全相同；具体数值与分块前缀
+    写在本次请求的说明中，和章节内容一起放在用户消息里。
+    关闭 prompt_cache.split_static_prompt 时返回 generate_novel_condenser_prompt 的完整提示词与空说明。
+    
+    Args:
+        is_chunk: 是否为分块处理的一部分
+        chunk_index: 分块索引
+        total_chunks: 总分块数
+        content_length: 原文内容长度（字数）
+        custom_prompt_template: 自定义提示词模板，如果提供则使用此模板
+    
+    Returns:
+        Tuple[str, str]: (静态系统提示词, 本次请求的说明)
+    """
+    if not config.PROMPT_CACHE_SETTINGS.get("split_static_prompt", True):
+        prompt = generate_novel_condenser_prompt(is_chunk, chunk_index, total_chunks, content_length, custom_prompt_template)
+        return prompt, ""
+    
+    prompt_template = custom_prompt_template or config.PROMPT_TEMPLATES.get("novel_condenser", _DEFAULT_CONDENSER_PROMPT)
+    system_prompt = prompt_template.format(
+        min_ratio=config.MIN_CONDENSATION_RATIO,
+        max_ratio=config.MAX_CONDENSATION_RATIO,
+        **_PROMPT_COUNT_LABELS
+    )
+    
+    notes = []
+    if is_chunk:
+        chunk_prefix_template = config.PROMPT_TEMPLATES.get("chunk_prefix", 
+                               "这是一个小说的第{chunk_index}段，共{total_chunks}段。")
+        notes.append(chunk_prefix_template.format(chunk_index=chunk_index, total_chunks=total_chunks))
+    
+    # 只列出模板中实际用到的字数
+    fields = {name for _, name, _, _ in string.Formatter().parse(prompt_template) if name}
+    if content_length > 0:
+        counts = {
+            "original_count": content_length,
+            "min_count": int(content_length * config.MIN_CONDENSATION_RATIO / 100),
+            "max_count": int(content_length * config.MAX_CONDENSATION_RATIO / 100),
+        }
+        count_notes = [f"{label}：{counts[name]}字" for name, label in _PROMPT_COUNT_LABELS.items() if name in fields]
+        if count_notes:
+            notes.append("，".join(count_notes))
+    
+    return system_prompt, "\n".join(notes)
+
 def condense_novel_gemini(content: str, api_key_config: Optional[Dict] = None, key_manager: Optional[APIKeyManager] = None, custom_prompt_template: Optional[str] = None) -> Optional[str]:
     """使用Gemini API对小说内容进行压缩处理
     
@@ -850,6 +1145,38 @@ def condense_novel_openai(content: str, api_key_config: Optional[Dict] = None, k
     """
     return _condense_novel_with_api("openai", content, api_key_config, key_manager, custom_prompt_template)
 
+def condense_novel_interactive(api_type: str, content: str, api_key_config: Dict,
+                               custom_prompt_template: Optional[str] = None) -> Optional[str]:
+    """交互式请求（如提示词测试）：使用指定的密钥配置，经由正在运行的密钥管理器的优先通道发出
+    
+    批量脱水正在使用同一密钥时，请求会占用为交互式请求保留的额度或排在批量请求之前，
+    并计入该密钥的并发与成功/失败统计；没有运行中的密钥管理器时直接发出请求。
+    
+    Args:
+        api_type: API类型，"gemini"或"openai"
+        content: 小说内容
+        api_key_config: 选定的API密钥配置
+        custom_prompt_template: 自定义提示词模板
+    
+    Returns:
+        Optional[str]: 压缩后的内容，处理失败则返回None
+    """
+    key_manager = global_key_manager if api_type == "gemini" else global_openai_key_manager
+    key_manager = key_manager or _try_get_key_manager_from_modules(api_type)
+    config_id = key_manager.find_config_id(api_key_config) if key_manager else None
+    if config_id is None:
+        return _condense_novel_with_api(api_type, content, api_key_config, None, custom_prompt_template)
+    
+    checked_out = key_manager.get_key_config(priority=PRIORITY_INTERACTIVE, config_id=config_id)
+    if checked_out is None:
+        return None
+    try:
+        # 保持调用方选定的密钥参数，额度与统计记在对应的配置实例上
+        request_config = dict(checked_out, **{k: v for k, v in api_key_config.items() if not k.startswith("_")})
+        return _condense_novel_with_api(api_type, content, request_config, key_manager, custom_prompt_template)
+    finally:
+        key_manager.release_key(checked_out)
+
 def _condense_novel_with_api(api_type: str, content: str, api_key_config: Optional[Dict] = None, 
                             key_manager: Optional[APIKeyManager] = None, custom_prompt_template: Optional[str] = None) -> Optional[str]:
     """通用API小说内容压缩处理函数
@@ -890,6 +1217,122 @@ def _condense_novel_with_api(api_type: str, content: str, api_key_config: Option
         if acquired_from_manager and key_manager is not None:
             key_manager.release_key(api_key_config)
 
+def generate_packed_chapters_prompt(chapter_lengths: List[int], custom_prompt_template: Optional[str] = None) -> Tuple[str, str]:
+    """生成多章打包请求的提示词：(系统提示词, 本次请求的说明)
+    
+    系统提示词与单章请求相同（可共用供应商缓存），分隔标记说明与各章目标字数放在本次请求的说明中。
+    
+    Args:
+        chapter_lengths: 包内各章的原文字数
+        custom_prompt_template: 自定义提示词模板，如果提供则作为基础压缩要求
+    
+    Returns:
+        Tuple[str, str]: (系统提示词, 本次请求的说明)
+    """
+    system_prompt, base_note = build_condense_prompt_parts(False, 0, 0, sum(chapter_lengths), custom_prompt_template)
+    chapter_targets = "\n".join(
+        f"第{i + 1}章：原文 {length} 字，调整为 {int(length * config.MIN_CONDENSATION_RATIO / 100)} 字到 "
+        f"{int(length * config.MAX_CONDENSATION_RATIO / 100)} 字"
+        for i, length in enumerate(chapter_lengths)
+    )
+    packed_template = config.PROMPT_TEMPLATES.get("packed_chapters",
+                      "下面的内容包含 {chapter_count} 个相互独立的章节，第N章以 {start_marker} 开始、以 {end_marker} 结束。"
+                      "请对每一章分别按上述要求调整，各章字数范围如下：\n{chapter_targets}\n"
+                      "按原顺序逐章输出，每章同样用 {start_marker} 和 {end_marker} 包围，不要合并、遗漏或增加章节，标记之外不要输出任何内容。")
+    packed_prompt = packed_template.format(
+        chapter_count=len(chapter_lengths),
+        start_marker=PACK_START_MARKER.format(index="N"),
+        end_marker=PACK_END_MARKER.format(index="N"),
+        chapter_targets=chapter_targets,
+    )
+    return system_prompt, f"{base_note}\n{packed_prompt}" if base_note else packed_prompt
+
+def split_packed_response(text: str, chapter_count: int) -> Optional[List[str]]:
+    """按分隔标记把打包请求的响应拆回各章；标记缺失、重复或某章为空时返回None
+    
+    Args:
+        text: 模型返回的内容
+        chapter_count: 包内章节数
+    
+    Returns:
+        Optional[List[str]]: 按顺序的各章结果，无法可靠拆分时返回None
+    """
+    sections = {}
+    for match in _PACK_SECTION_PATTERN.finditer(text or ""):
+        index = int(match.group(1))
+        if index in sections:
+            return None
+        sections[index] = match.group(2).strip()
+    if sorted(sections) != list(range(1, chapter_count + 1)) or not all(sections.values()):
+        return None
+    return [sections[index] for index in range(1, chapter_count + 1)]
+
+def condense_packed_chapters(api_type: str, contents: List[str], api_key_config: Optional[Dict] = None,
+                             key_manager: Optional[APIKeyManager] = None,
+                             custom_prompt_template: Optional[str] = None) -> Optional[List[str]]:
+    """把多个短章节打包为一个请求脱水，并按分隔标记拆回各章结果
+    
+    短章节的请求中系统提示词与HTTP开销占比很高，打包后多章共用一次请求。
+    响应中的分隔标记不完整时返回None，由调用方改为逐章请求。
+    
+    Args:
+        api_type: API类型，"gemini"或"openai"
+        contents: 各章内容（每章都不应超过单次请求的长度限制）
+        api_key_config: API密钥配置
+        key_manager: API密钥管理器实例
+        custom_prompt_template: 自定义提示词模板，如果提供则优先使用
+    
+    Returns:
+        Optional[List[str]]: 按顺序的各章脱水结果，请求失败或无法拆分时返回None
+    """
+    packed_content = "\n\n".join(
+        f"{PACK_START_MARKER.format(index=i + 1)}\n{content}\n{PACK_END_MARKER.format(index=i + 1)}"
+        for i, content in enumerate(contents)
+    )
+    system_prompt, request_note = generate_packed_chapters_prompt([len(content) for content in contents],
+                                                                  custom_prompt_template)
+    
+    acquired_from_manager = api_key_config is None and key_manager is not None
+    api_key_config = _get_api_key_config(api_type, api_key_config, key_manager)
+    if api_key_config is None:
+        return None
+    
+    try:
+        api_key = api_key_config.get('key', '')
+        redirect_url = api_key_config.get('redirect_url', '')
+        default_model = config.DEFAULT_GEMINI_MODEL if api_type == "gemini" else config.DEFAULT_OPENAI_MODEL
+        model = api_key_config.get('model', default_model)
+        
+        if not api_key:
+            logger.error(f"{api_type.capitalize()} API密钥为空")
+            return None
+        
+        result = _process_content_with_api(
+            packed_content, api_type, api_key, redirect_url, model,
+            display_label=_get_display_label_for_key(key_manager, api_key),
+            system_prompt=system_prompt,
+            request_note=request_note,
+        )
+        # 请求本身的成功/失败驱动密钥冷却；分隔标记不完整属于内容问题，不计入密钥失败
+        if key_manager:
+            try:
+                if result:
+                    key_manager.report_success(api_key)
+                else:
+                    key_manager.report_error(api_key)
+            except Exception:
+                pass
+        if not result:
+            return None
+        
+        sections = split_packed_response(result, len(contents))
+        if sections is None:
+            logger.warning(f"打包请求（{len(contents)} 章）的响应分隔标记不完整，无法拆分")
+        return sections
+    finally:
+        if acquired_from_manager and key_manager is not None:
+            key_manager.release_key(api_key_config)
+
 def _parse_llm_response(response_json: Dict, api_type: str = "gemini") -> Optional[str]:
     """解析LLM API响应，支持多种格式
     
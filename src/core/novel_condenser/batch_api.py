@@ -0,0 +1,544 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+供应商批处理接口 - 离线批量脱水（OpenAI Batch / Gemini Batch Mode）
+
+整本书离线脱水时并不需要即时返回，逐章同步请求既受并发额度限制，也按全价计费；
+供应商的异步批处理接口通常半价、额度独立，在完成时限内返回全部结果。这里把章节请求打包提交：
+
+    预处理（已有结果/缓存/目录页/短章节） -> 构建请求 -> 提交 -> 轮询 -> 下载 -> 写出结果
+
+- 请求与同步脱水相同（同样的提示词、生成参数与分块规则），结果经同一条保存/缓存/统计路径写出
+- OpenAI：上传JSONL请求文件（purpose=batch），创建 /v1/batches 任务，完成后下载输出文件与错误文件
+- Gemini：Gemini API 的 batchGenerateContent 内联请求，轮询 batches/<id> 长时操作
+- 超过请求数或体积上限时拆分为多个任务，同一章节的分块总在同一个任务中
+- 已提交的任务记录在输出目录的 .batch_state.json，中断后再次运行会继续轮询而不会重复提交
+
+可用 scripts/batch_api_stub.py 启动本地替身服务离线测试。
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import config
+from .main import NovelCondenser
+from .api_service import (
+    MAX_API_INPUT_LENGTH,
+    split_content_into_chunks,
+    build_condense_prompt_parts,
+    _build_request_data,
+    _build_gemini_url,
+    _build_openai_url,
+    _get_openai_prompt_cache_key,
+    _parse_llm_response,
+    _record_response_usage,
+    _get_session,
+)
+from .file_utils import read_file, get_output_file_path, save_condensed_novel, create_cache_for_file
+from .cache import flush_all as flush_cache
+from .output_writer import start_output_writer, stop_output_writer, run_in_writer
+from .stats import statistics, print_processing_summary
+from ..utils import setup_logger
+
+# 设置日志记录器
+logger = setup_logger(__name__)
+
+BATCH_STATE_FILE = ".batch_state.json"
+OPENAI_BATCH_ENDPOINT = "/v1/chat/completions"
+HTTP_TIMEOUT = 120
+
+OPENAI_FINISHED_STATES = {"completed", "failed", "expired", "cancelled"}
+GEMINI_FINISHED_STATES = {"BATCH_STATE_SUCCEEDED", "BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED",
+                          "BATCH_STATE_EXPIRED", "JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED",
+                          "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+
+class BatchAPIError(Exception):
+    """批处理接口请求失败"""
+
+
+def _check_response(response, action: str) -> Dict:
+    if response.status_code >= 400:
+        raise BatchAPIError(f"{action}失败: HTTP {response.status_code} {response.text[:300]}")
+    try:
+        return response.json()
+    except ValueError:
+        raise BatchAPIError(f"{action}失败: 响应不是JSON")
+
+
+class OpenAIBatchClient:
+    """OpenAI /v1/batches 接口（也适用于实现了该接口的兼容服务）"""
+
+    api_type = "openai"
+
+    def __init__(self, api_key_config: Dict):
+        self.api_key = api_key_config.get("key", "")
+        self.model = api_key_config.get("model") or config.DEFAULT_OPENAI_MODEL
+        self.redirect_url = api_key_config.get("redirect_url", "")
+        url = _build_openai_url(self.redirect_url)
+        self.base_url = url[:url.rfind("/chat/completions")]
+        self.headers = {"Authorization": f"Bearer {self.api_key}"}
+
+    def request_entry(self, custom_id: str, body: Dict) -> Dict:
+        return {"custom_id": custom_id, "method": "POST", "url": OPENAI_BATCH_ENDPOINT, "body": body}
+
+    def submit(self, entries: List[Dict], display_name: str) -> str:
+        """上传JSONL请求文件并创建批处理任务，返回任务ID"""
+        session = _get_session()
+        jsonl = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+        uploaded = _check_response(session.post(
+            f"{self.base_url}/files", headers=self.headers, timeout=HTTP_TIMEOUT,
+            data={"purpose": "batch"}, files={"file": (f"{display_name}.jsonl", jsonl, "application/jsonl")},
+        ), "上传批处理请求文件")
+        batch = _check_response(session.post(
+            f"{self.base_url}/batches", headers=self.headers, timeout=HTTP_TIMEOUT, json={
+                "input_file_id": uploaded["id"],
+                "endpoint": OPENAI_BATCH_ENDPOINT,
+                "completion_window": config.BATCH_API_SETTINGS.get("completion_window", "24h"),
+                "metadata": {"description": display_name},
+            },
+        ), "创建批处理任务")
+        return batch["id"]
+
+    def poll(self, batch_id: str) -> Tuple[str, bool, Dict]:
+        """查询任务状态，返回 (状态, 是否结束, 原始响应)"""
+        info = _check_response(_get_session().get(f"{self.base_url}/batches/{batch_id}", headers=self.headers,
+                                                  timeout=HTTP_TIMEOUT), "查询批处理任务")
+        status = info.get("status", "")
+        counts = info.get("request_counts") or {}
+        if counts:
+            status = f"{status} ({counts.get('completed', 0)}/{counts.get('total', 0)})"
+        return status, info.get("status") in OPENAI_FINISHED_STATES, info
+
+    def _download_lines(self, file_id: str) -> List[Dict]:
+        response = _get_session().get(f"{self.base_url}/files/{file_id}/content", headers=self.headers,
+                                      timeout=HTTP_TIMEOUT)
+        if response.status_code >= 400:
+            raise BatchAPIError(f"下载结果文件失败: HTTP {response.status_code} {response.text[:300]}")
+        return [json.loads(line) for line in response.content.decode("utf-8").splitlines() if line.strip()]
+
+    def fetch_results(self, batch_id: str, info: Dict) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """下载输出文件与错误文件，返回 custom_id -> (脱水内容, 错误信息)"""
+        results = {}
+        for file_id in (info.get("output_file_id"), info.get("error_file_id")):
+            if not file_id:
+                continue
+            for line in self._download_lines(file_id):
+                response = line.get("response") or {}
+                body = response.get("body") or {}
+                error = line.get("error")
+                text = None
+                if not error and response.get("status_code", 200) < 400:
+                    _record_response_usage(body, "openai")
+                    text = _parse_llm_response(body, "openai")
+                elif not error:
+                    error = body.get("error") or f"HTTP {response.get('status_code')}"
+                results[line.get("custom_id")] = (text, None if text else str(error or "空响应"))
+        return results
+
+
+class GeminiBatchClient:
+    """Gemini API 批处理模式（models/<model>:batchGenerateContent 内联请求）"""
+
+    api_type = "gemini"
+
+    def __init__(self, api_key_config: Dict):
+        self.api_key = api_key_config.get("key", "")
+        self.model = api_key_config.get("model") or config.DEFAULT_GEMINI_MODEL
+        self.redirect_url = api_key_config.get("redirect_url", "")
+        url = _build_gemini_url(self.redirect_url, self.model).split("?")[0]
+        if "/models/" not in url:
+            raise BatchAPIError(f"无法从地址推断Gemini批处理接口: {url}")
+        self.submit_url = url.replace(":generateContent", ":batchGenerateContent")
+        self.base_url = url[:url.index("/models/")]
+        self.headers = {"x-goog-api-key": self.api_key}
+
+    def request_entry(self, custom_id: str, body: Dict) -> Dict:
+        return {"request": body, "metadata": {"key": custom_id}}
+
+    def submit(self, entries: List[Dict], display_name: str) -> str:
+        """提交内联批处理请求，返回任务名（batches/<id>）"""
+        operation = _check_response(_get_session().post(
+            self.submit_url, headers=self.headers, timeout=HTTP_TIMEOUT, json={
+                "batch": {
+                    "display_name": display_name,
+                    "input_config": {"requests": {"requests": entries}},
+                }
+            },
+        ), "创建批处理任务")
+        return operation["name"]
+
+    def poll(self, batch_id: str) -> Tuple[str, bool, Dict]:
+        """查询任务状态，返回 (状态, 是否结束, 原始响应)"""
+        operation = _check_response(_get_session().get(f"{self.base_url}/{batch_id}", headers=self.headers,
+                                                       timeout=HTTP_TIMEOUT), "查询批处理任务")
+        state = (operation.get("metadata") or {}).get("state", "")
+        return state, bool(operation.get("done")) or state in GEMINI_FINISHED_STATES, operation
+
+    def fetch_results(self, batch_id: str, info: Dict) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """读取内联结果，返回 custom_id -> (脱水内容, 错误信息)"""
+        if info.get("error"):
+            logger.error(f"批处理任务 {batch_id} 失败: {info['error'].get('message', info['error'])}")
+        output = info.get("response") or (info.get("metadata") or {}).get("output") or {}
+        if output.get("responsesFile"):
+            logger.error(f"批处理任务 {batch_id} 以文件形式返回结果，仅支持内联结果: {output['responsesFile']}")
+        results = {}
+        for item in (output.get("inlinedResponses") or {}).get("inlinedResponses", []):
+            custom_id = (item.get("metadata") or {}).get("key")
+            text = None
+            if item.get("response"):
+                _record_response_usage(item["response"], "gemini")
+                text = _parse_llm_response(item["response"], "gemini")
+            error = item.get("error")
+            results[custom_id] = (text, None if text else str((error or {}).get("message", error) or "空响应"))
+        return results
+
+
+BATCH_CLIENTS = {"openai": OpenAIBatchClient, "gemini": GeminiBatchClient}
+
+
+def _select_key_config(condenser: NovelCondenser, api_type: str, key_name: Optional[str] = None) -> Optional[Dict]:
+    """选择提交批处理所用的密钥配置：指定名称的配置，或第一条未被跳过的配置"""
+    key_manager = condenser.gemini_key_manager if api_type == "gemini" else condenser.openai_key_manager
+    if not key_manager:
+        return None
+    for api_config in key_manager.api_configs:
+        if key_name:
+            if api_config.get("name") == key_name:
+                return api_config
+        elif api_config.get("_config_id") not in getattr(key_manager, "skipped_configs", set()):
+            return api_config
+    return None
+
+
+def _load_state(state_path: str) -> Optional[Dict]:
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取批处理状态文件 {state_path}: {e}")
+        return None
+
+
+def _save_state(state_path: str, state: Dict) -> None:
+    if not state["batches"]:
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return
+    temp_path = f"{state_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, state_path)
+
+
+def _build_chapter_requests(client, content: str) -> List[Dict]:
+    """按同步脱水的分块规则与提示词拆分方式为一章构建请求体"""
+    if len(content) <= MAX_API_INPUT_LENGTH:
+        pieces = [(content, build_condense_prompt_parts(False, 0, 0, len(content)))]
+    else:
+        chunks = split_content_into_chunks(content)
+        pieces = [(chunk, build_condense_prompt_parts(True, i + 1, len(chunks), len(chunk)))
+                  for i, chunk in enumerate(chunks)]
+    bodies = []
+    for piece, (system_prompt, request_note) in pieces:
+        prompt_cache_key = None
+        if client.api_type == "openai" and config.PROMPT_CACHE_SETTINGS.get("split_static_prompt", True):
+            prompt_cache_key = _get_openai_prompt_cache_key(client.redirect_url, system_prompt)
+        bodies.append(_build_request_data(client.api_type, client.model, system_prompt, piece, request_note,
+                                          prompt_cache_key=prompt_cache_key))
+    return bodies
+
+
+def _group_requests(chapters: List[Tuple[str, List[Dict]]], client) -> List[Tuple[List[Dict], List[Dict]]]:
+    """
+    把章节请求分组为若干批处理任务（按请求数与体积上限），同一章节的分块不拆开
+
+    Returns:
+        List[Tuple[List[Dict], List[Dict]]]: [(任务内的章节记录, 请求条目), ...]
+    """
+    max_requests = max(1, int(config.BATCH_API_SETTINGS.get("max_requests_per_batch", 5000)))
+    max_bytes = max(1, float(config.BATCH_API_SETTINGS.get("max_batch_mb", 15))) * 1024 * 1024
+    groups = []
+    files, entries, size = [], [], 0
+    for path, bodies in chapters:
+        chapter_entries = [client.request_entry(f"{len(files)}-{i}", body) for i, body in enumerate(bodies)]
+        chapter_size = sum(len(json.dumps(entry, ensure_ascii=False).encode("utf-8")) for entry in chapter_entries)
+        if entries and (len(entries) + len(chapter_entries) > max_requests or size + chapter_size > max_bytes):
+            groups.append((files, entries))
+            files, entries, size = [], [], 0
+            chapter_entries = [client.request_entry(f"0-{i}", body) for i, body in enumerate(bodies)]
+        files.append({"path": path, "chunks": len(bodies)})
+        entries.extend(chapter_entries)
+        size += chapter_size
+    if entries:
+        groups.append((files, entries))
+    return groups
+
+
+def _apply_batch_results(condenser: NovelCondenser, batch: Dict, results: Dict, output_dir: Optional[str]) -> List[str]:
+    """把一个任务的结果写回各章节（保存、缓存、统计），返回失败的文件"""
+    failed = []
+    for file_pos, item in enumerate(batch["files"]):
+        path = item["path"]
+        base_name = os.path.basename(path)
+        start_time = batch.get("submitted_at", time.time())
+        condensed_chunks = []
+        for chunk_index in range(item["chunks"]):
+            text, error = results.get(f"{file_pos}-{chunk_index}", (None, "没有返回结果"))
+            if text:
+                condensed_chunks.append(text)
+            else:
+                logger.warning(f"{base_name} 第 {chunk_index + 1}/{item['chunks']} 个请求失败: {error}")
+        try:
+            content = read_file(path)
+        except Exception as e:
+            logger.error(f"无法读取文件内容: {path}, 错误: {str(e)}")
+            condenser._update_stats(path, "error", start_time, error=str(e))
+            failed.append(path)
+            continue
+
+        if condensed_chunks:
+            result = "\n\n".join(condensed_chunks)
+            save_condensed_novel(path, result, output_dir=output_dir)
+            run_in_writer(create_cache_for_file, content, result, path, output_dir=output_dir)
+            condensation_ratio = (len(result) / len(content)) * 100 if len(content) > 0 else 0
+            condenser._update_stats(path, "success", start_time, original_length=len(content),
+                                    condensed_length=len(result), condensation_ratio=condensation_ratio)
+        else:
+            error_msg = f"# 脱水处理失败\n\n原因: 批处理请求失败\n\n时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n请重试或联系管理员。"
+            logger.error(f"处理失败: {base_name}")
+            try:
+                save_condensed_novel(path, error_msg, output_dir=output_dir)
+            except Exception:
+                pass
+            condenser._update_stats(path, "failed", start_time)
+            failed.append(path)
+    return failed
+
+
+def run_batch_condense(
+    files: List[str],
+    api_type: str = "openai",
+    output_dir: Optional[str] = None,
+    force_regenerate: bool = False,
+    key_name: Optional[str] = None,
+    poll_interval: Optional[float] = None,
+    stop_event: Optional[threading.Event] = None,
+    update_progress_func: Optional[Callable] = None,
+    condenser: Optional[NovelCondenser] = None,
+) -> Tuple[int, List[str]]:
+    """
+    通过供应商批处理接口脱水一组章节文件
+
+    Args:
+        files: 章节文件列表
+        api_type: API类型（gemini/openai，不支持mixed）
+        output_dir: 输出目录，默认与同步脱水相同
+        force_regenerate: 忽略已有的脱水结果与缓存
+        key_name: 使用的密钥配置名称，默认为第一条可用配置
+        poll_interval: 轮询间隔（秒），默认使用 batch_api.poll_interval 配置
+        stop_event: 可选的停止事件；停止时已提交的任务保留在状态文件中，下次运行继续轮询
+        update_progress_func: 可选的进度回调 (已完成章节数, 章节总数, 状态)
+        condenser: 可选的已有 NovelCondenser，此时忽略 api_type 与 force_regenerate
+
+    Returns:
+        Tuple[int, List[str]]: (成功数, 失败或尚未完成的文件列表)
+    """
+    if condenser is None:
+        condenser = NovelCondenser(api_type=api_type, force_regenerate=force_regenerate, output_dir=output_dir)
+    api_type = condenser.api_type
+    if api_type not in BATCH_CLIENTS:
+        raise ValueError(f"批处理模式不支持API类型: {api_type}")
+    output_dir = output_dir or condenser.output_dir
+    stop_event = stop_event or threading.Event()
+    poll_interval = poll_interval if poll_interval is not None else config.BATCH_API_SETTINGS.get("poll_interval", 60)
+
+    api_key_config = _select_key_config(condenser, api_type, key_name)
+    if not api_key_config:
+        logger.error(f"没有可用的{api_type.upper()}密钥配置{'：' + key_name if key_name else ''}")
+        return 0, list(files)
+    client = BATCH_CLIENTS[api_type](api_key_config)
+
+    total_files = len(files)
+    statistics["total_files"] = total_files
+    state_dir = output_dir or (os.path.dirname(get_output_file_path(files[0])) if files else ".")
+    os.makedirs(state_dir, exist_ok=True)
+    state_path = os.path.join(state_dir, BATCH_STATE_FILE)
+    state = {"api_type": api_type, "model": client.model, "batches": []}
+
+    success_count = 0
+    failed_files: List[str] = []
+    done_count = 0
+
+    def report(status):
+        if update_progress_func:
+            update_progress_func(done_count, total_files, status)
+
+    # 1. 继续上次运行已提交的任务
+    resumed_paths = set()
+    previous = _load_state(state_path)
+    if previous and previous.get("batches"):
+        if previous.get("api_type") != api_type:
+            logger.error(f"{state_path} 中有未完成的 {previous.get('api_type')} 批处理任务，请使用相同的API类型继续")
+            return 0, list(files)
+        state["batches"] = previous["batches"]
+        resumed_paths = {item["path"] for batch in state["batches"] for item in batch["files"]}
+        logger.info(f"继续上次提交的 {len(state['batches'])} 个批处理任务（{len(resumed_paths)} 章）")
+
+    start_output_writer()
+    try:
+        # 2. 预处理：与同步脱水相同的跳过/缓存/目录页/短章节逻辑，其余章节构建请求
+        chapters = []
+        for index, file_path in enumerate(files):
+            path = os.path.abspath(file_path)
+            if path in resumed_paths:
+                continue
+            start_time = time.time()
+            output_file = get_output_file_path(file_path, output_dir=output_dir)
+            if condenser._should_skip_file(file_path, output_file, start_time, 0):
+                success_count += 1
+                done_count += 1
+                continue
+            try:
+                content = read_file(file_path)
+            except Exception as e:
+                logger.error(f"无法读取文件内容: {file_path}, 错误: {str(e)}")
+                condenser._update_stats(file_path, "error", start_time, error=str(e))
+                failed_files.append(file_path)
+                done_count += 1
+                continue
+            if not content:
+                logger.warning(f"文件内容为空: {file_path}")
+                condenser._update_stats(file_path, "empty", start_time)
+                failed_files.append(file_path)
+                done_count += 1
+                continue
+            handled, _ = condenser._handle_special_cases(file_path, content, start_time, 0, output_dir)
+            if handled:
+                success_count += 1
+                done_count += 1
+                continue
+            chapters.append((path, _build_chapter_requests(client, content)))
+        report("预处理完成")
+
+        # 3. 提交新任务（每提交一个任务即写入状态文件，提交中断也不会重复提交已成功的部分）
+        groups = _group_requests(chapters, client)
+        if groups:
+            logger.info(f"共 {len(chapters)} 章需要脱水，{sum(len(e) for _, e in groups)} 个请求，"
+                        f"分为 {len(groups)} 个批处理任务提交（模型 {client.model}）")
+        run_id = uuid.uuid4().hex[:8]
+        for group_index, (group_files, entries) in enumerate(groups):
+            if stop_event.is_set():
+                failed_files.extend(item["path"] for item in group_files)
+                continue
+            display_name = f"ainovellab-{run_id}-{group_index + 1}"
+            try:
+                batch_id = client.submit(entries, display_name)
+            except Exception as e:
+                logger.error(f"提交批处理任务 {display_name} 失败: {e}")
+                for item in group_files:
+                    condenser._update_stats(item["path"], "failed", time.time())
+                failed_files.extend(item["path"] for item in group_files)
+                done_count += len(group_files)
+                continue
+            logger.info(f"已提交批处理任务 {batch_id}: {len(group_files)} 章，{len(entries)} 个请求")
+            state["batches"].append({"id": batch_id, "submitted_at": time.time(), "files": group_files})
+            _save_state(state_path, state)
+
+        # 4. 轮询，任务结束后下载结果并写回各章节
+        last_status = {}
+        while state["batches"] and not stop_event.is_set():
+            for batch in list(state["batches"]):
+                try:
+                    status, finished, info = client.poll(batch["id"])
+                except Exception as e:
+                    logger.warning(f"查询批处理任务 {batch['id']} 失败，稍后重试: {e}")
+                    continue
+                if last_status.get(batch["id"]) != status:
+                    logger.info(f"批处理任务 {batch['id']}: {status}")
+                    last_status[batch["id"]] = status
+                if not finished:
+                    continue
+                try:
+                    results = client.fetch_results(batch["id"], info)
+                except Exception as e:
+                    logger.warning(f"下载批处理任务 {batch['id']} 的结果失败，稍后重试: {e}")
+                    continue
+                batch_failed = _apply_batch_results(condenser, batch, results, output_dir)
+                success_count += len(batch["files"]) - len(batch_failed)
+                failed_files.extend(batch_failed)
+                done_count += len(batch["files"])
+                state["batches"].remove(batch)
+                _save_state(state_path, state)
+                report(f"批处理任务 {batch['id']} 完成")
+            if state["batches"]:
+                stop_event.wait(poll_interval)
+
+        if state["batches"]:
+            pending = [item["path"] for batch in state["batches"] for item in batch["files"]]
+            failed_files.extend(pending)
+            logger.warning(f"已停止轮询，{len(state['batches'])} 个批处理任务（{len(pending)} 章）仍在供应商处运行，"
+                           f"再次运行将继续轮询: {state_path}")
+    finally:
+        stop_output_writer()
+        flush_cache()
+
+    return success_count, failed_files
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="批处理接口脱水：把章节请求打包提交到供应商的异步批处理接口，完成后写出结果")
+    parser.add_argument("input", help="章节TXT文件或目录")
+    parser.add_argument("-o", "--output", default=None, help="输出目录 (默认: 目录输入为 目录/目录名_脱水，单个文件为 文件所在目录/文件名_脱水)")
+    parser.add_argument("--api", choices=sorted(BATCH_CLIENTS), default="openai", help="使用的API类型")
+    parser.add_argument("--key-name", default=None, help="使用的密钥配置名称 (默认: 第一条可用配置)")
+    parser.add_argument("--poll-interval", type=float, default=None,
+                        help=f"轮询间隔秒数 (默认: {config.BATCH_API_SETTINGS['poll_interval']})")
+    parser.add_argument("--force", action="store_true", help="强制重新生成，忽略已有结果与缓存")
+    parser.add_argument("--debug", action="store_true", help="显示调试信息")
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    if os.path.isdir(args.input):
+        files = sorted(os.path.join(args.input, name) for name in os.listdir(args.input) if name.endswith(".txt"))
+        dir_name = os.path.basename(os.path.abspath(args.input))
+        output_dir = args.output or os.path.join(args.input, f"{dir_name}_脱水")
+    elif os.path.isfile(args.input):
+        files = [args.input]
+        # 与 main.py 一致：默认输出到 <文件所在目录>/<文件名>_脱水，避免结果路径与原文相同
+        file_dir = os.path.dirname(args.input) or "."
+        file_base = os.path.splitext(os.path.basename(args.input))[0]
+        output_dir = args.output or os.path.join(file_dir, f"{file_base}_脱水")
+    else:
+        logger.error(f"找不到输入路径: {args.input}")
+        return 1
+    if not files:
+        logger.error(f"在 {args.input} 中没有找到TXT文件")
+        return 1
+
+    try:
+        success_count, failed_files = run_batch_condense(files, args.api, output_dir, args.force, args.key_name,
+                                                         args.poll_interval)
+    except KeyboardInterrupt:
+        logger.warning("用户中断，已提交的批处理任务记录在输出目录中，再次运行将继续轮询")
+        return 1
+    logger.info(f"处理完成: 共 {len(files)} 个文件，成功 {success_count} 个，失败 {len(failed_files)} 个")
+    try:
+        print_processing_summary()
+    except Exception:
+        pass
+    return 0 if not failed_files else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,870 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+缓存模块 - 管理脱水结果缓存的压缩存储、容量上限与淘汰策略
+
+每个输出目录下的 .cache 目录对应一个 CacheStore：
+- 缓存条目使用 zlib 压缩后的 JSON 保存（<文件名>.json.z），兼容读取旧版未压缩的 .json 条目
+- index.json 记录条目大小、访问时间、命中次数以及整体命中/未命中计数；
+  多个进程共用同一缓存目录时，写回前在锁文件保护下与磁盘上的索引合并
+- 所有使用过的缓存目录登记在用户缓存目录的 stores.json 中，用于全局容量上限的统一淘汰
+- 可选的全局内容寻址缓存位于用户缓存目录的 objects 目录，条目以“原文+脱水参数”的哈希命名，
+  相同章节内容无论位于哪个目录、叫什么文件名都能命中
+
+- 缓存包（.zip）可将某本书或全部缓存条目导出，带指纹清单，在另一台机器导入后无需再次调用API
+
+命令行用法:
+    python -m src.core.novel_condenser.cache stats [目录 ...]
+    python -m src.core.novel_condenser.cache prune [目录 ...] [--max-size-mb N] [--policy lru|lfu]
+    python -m src.core.novel_condenser.cache export 包文件.zip [目录 ...] [--book 书名]
+    python -m src.core.novel_condenser.cache import 包文件.zip [--output-dir 目录] [--global] [--write-outputs]
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from . import config
+from .output_writer import write_file_atomic
+from ..utils import setup_logger, format_time
+
+# 设置日志记录器
+logger = setup_logger(__name__)
+
+# =========================================================
+# 常量定义
+# =========================================================
+
+CACHE_DIR_NAME = ".cache"            # 输出目录下的缓存子目录名
+CACHE_INDEX_FILE = "index.json"      # 缓存索引文件名
+INDEX_LOCK_SUFFIX = ".lock"          # 写回索引时的跨进程锁文件后缀
+INDEX_LOCK_TIMEOUT = 5.0             # 等待索引锁的最长时间（秒）
+INDEX_LOCK_STALE = 30.0              # 超过该时间的锁文件视为遗留（进程崩溃），直接清除
+CACHE_ENTRY_SUFFIX = ".json.z"       # 压缩缓存条目后缀
+LEGACY_ENTRY_SUFFIX = ".json"        # 旧版未压缩缓存条目后缀
+STORE_REGISTRY_FILE = "stores.json"  # 已登记缓存目录列表
+GLOBAL_OBJECTS_DIR = "objects"       # 全局内容寻址缓存子目录名
+INDEX_FLUSH_INTERVAL = 50            # 累积多少次索引变更后落盘一次
+PACK_MANIFEST_FILE = "manifest.json" # 缓存包内的指纹清单
+PACK_ENTRY_DIR = "entries"           # 缓存包内存放条目的子目录
+PACK_FORMAT_VERSION = 1              # 缓存包格式版本
+
+# 年龄分布统计的分桶（上限秒数, 标签）
+AGE_BUCKETS = [
+    (86400, "1天内"),
+    (7 * 86400, "1-7天"),
+    (30 * 86400, "7-30天"),
+    (float("inf"), "30天以上"),
+]
+
+_stores: Dict[str, "CacheStore"] = {}
+_stores_lock = threading.Lock()
+_registry_lock = threading.Lock()
+
+
+def get_user_cache_root() -> str:
+    """获取全局缓存根目录
+
+    优先使用 CACHE_SETTINGS["cache_root"]，否则使用系统的用户缓存目录:
+    Windows 为 %LOCALAPPDATA%/AINovelLab，其他系统为 $XDG_CACHE_HOME/AINovelLab 或 ~/.cache/AINovelLab
+
+    Returns:
+        str: 全局缓存根目录路径
+    """
+    custom_root = config.CACHE_SETTINGS.get("cache_root")
+    if custom_root:
+        return os.path.abspath(os.path.expanduser(custom_root))
+
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "AINovelLab")
+
+
+def _write_json_atomic(path: str, data: Dict) -> None:
+    """以临时文件+重命名的方式写入JSON，避免中途崩溃留下损坏的文件"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _index_file_lock(path: str):
+    """基于 O_EXCL 锁文件的跨进程锁，保护索引的“读取-合并-替换”
+
+    等待超时时不再等待而直接继续：索引本身仍以原子替换写入，最坏情况只是丢失对方的部分索引更新。
+    """
+    lock_path = path + INDEX_LOCK_SUFFIX
+    deadline = time.time() + INDEX_LOCK_TIMEOUT
+    fd = None
+    while fd is None:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > INDEX_LOCK_STALE:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.time() >= deadline:
+                logger.debug(f"等待缓存索引锁超时: {lock_path}")
+                break
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        if fd is not None:
+            os.close(fd)
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+
+def compress_payload(data: Dict) -> bytes:
+    """将缓存数据序列化并压缩"""
+    raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    level = config.CACHE_SETTINGS.get("compression_level", 6)
+    if not isinstance(level, int) or not 0 <= level <= 9:
+        level = 6
+    return zlib.compress(raw, level)
+
+
+def decompress_payload(payload: bytes) -> Dict:
+    """解压并反序列化缓存数据（兼容未压缩的旧格式）"""
+    try:
+        raw = zlib.decompress(payload)
+    except zlib.error:
+        raw = payload
+    return json.loads(raw.decode("utf-8"))
+
+
+class CacheStore:
+    """单个缓存目录：负责条目的压缩读写、索引维护与淘汰"""
+
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        self.lock = threading.RLock()
+        self._index: Optional[Dict] = None
+        self._pending_changes = 0
+        self._registered = False
+        # 写回索引时与磁盘上的索引合并（其他进程可能共用同一缓存目录）
+        self._removed: set = set()                        # 本进程删除、尚未写回的条目
+        self._flushed_counts = {"hits": 0, "misses": 0}   # 上次读写磁盘时的命中/未命中计数
+
+    # ---------------------------------------------------------
+    # 路径与索引
+    # ---------------------------------------------------------
+
+    def entry_path(self, name: str) -> str:
+        """返回条目的压缩文件路径"""
+        return os.path.join(self.directory, name + CACHE_ENTRY_SUFFIX)
+
+    def _legacy_path(self, name: str) -> str:
+        return os.path.join(self.directory, name + LEGACY_ENTRY_SUFFIX)
+
+    @property
+    def index(self) -> Dict:
+        """懒加载索引；索引缺失或损坏时扫描目录重建"""
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _read_index_file(self) -> Optional[Dict]:
+        """读取磁盘上的索引，不存在或损坏时返回None"""
+        index_path = os.path.join(self.directory, CACHE_INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("entries"), dict):
+                data.setdefault("hits", 0)
+                data.setdefault("misses", 0)
+                return data
+            logger.warning(f"缓存索引格式无效: {index_path}")
+        except Exception as e:
+            logger.warning(f"缓存索引损坏: {index_path} ({e})")
+        return None
+
+    def _load_index(self) -> Dict:
+        index = self._read_index_file()
+        if index is None:
+            index = self._rebuild_index()
+        self._flushed_counts = {"hits": index.get("hits", 0), "misses": index.get("misses", 0)}
+        return index
+
+    def _rebuild_index(self) -> Dict:
+        index = {"version": 1, "hits": 0, "misses": 0, "entries": {}}
+        if not os.path.isdir(self.directory):
+            return index
+
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name == CACHE_INDEX_FILE:
+                continue
+            if entry.name.endswith(CACHE_ENTRY_SUFFIX):
+                name = entry.name[:-len(CACHE_ENTRY_SUFFIX)]
+            elif entry.name.endswith(LEGACY_ENTRY_SUFFIX):
+                name = entry.name[:-len(LEGACY_ENTRY_SUFFIX)]
+            else:
+                continue
+            stat = entry.stat()
+            index["entries"][name] = {
+                "size": stat.st_size,
+                "raw_size": stat.st_size,
+                "created": stat.st_mtime,
+                "last_access": stat.st_mtime,
+                "hits": 0,
+            }
+        self._pending_changes += 1
+        return index
+
+    def _mark_dirty(self) -> None:
+        self._pending_changes += 1
+        if self._pending_changes >= INDEX_FLUSH_INTERVAL:
+            self.flush()
+
+    def _merge_disk_index(self) -> None:
+        """把其他进程写入磁盘的索引变化合并到内存索引
+
+        - 磁盘上新增的条目保留（本进程已删除的除外），同名条目取最近访问的一份
+        - 内存中有而磁盘上没有、且条目文件已不存在的，视为被其他进程删除
+        - 命中/未命中计数累加本进程自上次写回以来的增量
+        """
+        disk = self._read_index_file()
+        if disk is None:
+            return
+        index = self._index
+        for key in ("hits", "misses"):
+            index[key] = disk.get(key, 0) + index.get(key, 0) - self._flushed_counts.get(key, 0)
+
+        entries = index["entries"]
+        disk_entries = disk["entries"]
+        for name, meta in disk_entries.items():
+            if name in self._removed or not isinstance(meta, dict):
+                continue
+            current = entries.get(name)
+            if current is None:
+                entries[name] = meta
+            elif meta.get("last_access", 0) > current.get("last_access", 0):
+                entries[name] = dict(meta, hits=max(meta.get("hits", 0), current.get("hits", 0)))
+        for name in [name for name in entries if name not in disk_entries]:
+            if not os.path.exists(self.entry_path(name)) and not os.path.exists(self._legacy_path(name)):
+                del entries[name]
+
+    def flush(self) -> None:
+        """将索引与磁盘上的索引合并后写回"""
+        with self.lock:
+            if self._index is None or self._pending_changes == 0:
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                index_path = os.path.join(self.directory, CACHE_INDEX_FILE)
+                with _index_file_lock(index_path):
+                    self._merge_disk_index()
+                    _write_json_atomic(index_path, self._index)
+                self._pending_changes = 0
+                self._removed.clear()
+                self._flushed_counts = {"hits": self._index.get("hits", 0), "misses": self._index.get("misses", 0)}
+            except Exception as e:
+                logger.warning(f"保存缓存索引失败: {e}")
+
+    # ---------------------------------------------------------
+    # 条目读写
+    # ---------------------------------------------------------
+
+    def get(self, name: str) -> Optional[Dict]:
+        """读取缓存条目，不存在或读取失败时返回None（不计入命中统计）"""
+        with self.lock:
+            path = self.entry_path(name)
+            legacy_path = self._legacy_path(name)
+            try:
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        return decompress_payload(f.read())
+                if os.path.exists(legacy_path):
+                    with open(legacy_path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    # 顺带迁移为压缩格式
+                    if self.put(name, data):
+                        try:
+                            os.remove(legacy_path)
+                        except OSError:
+                            pass
+                    return data
+            except Exception as e:
+                logger.warning(f"读取缓存条目失败: {name} ({e})")
+            return None
+
+    def put(self, name: str, data: Dict) -> bool:
+        """压缩并写入缓存条目"""
+        with self.lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                payload = compress_payload(data)
+                raw_size = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+                path = self.entry_path(name)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+
+                now = time.time()
+                self._removed.discard(name)
+                previous = self.index["entries"].get(name, {})
+                self.index["entries"][name] = {
+                    "size": len(payload),
+                    "raw_size": raw_size,
+                    "created": now,
+                    "last_access": now,
+                    "hits": previous.get("hits", 0),
+                }
+                self._mark_dirty()
+                if not self._registered:
+                    register_store(self.directory)
+                    self._registered = True
+                return True
+            except Exception as e:
+                logger.warning(f"写入缓存条目失败: {name} ({e})")
+                return False
+
+    def record_hit(self, name: str) -> None:
+        """记录一次命中，更新条目的访问时间和命中次数"""
+        with self.lock:
+            self.index["hits"] = self.index.get("hits", 0) + 1
+            meta = self.index["entries"].get(name)
+            if meta is not None:
+                meta["hits"] = meta.get("hits", 0) + 1
+                meta["last_access"] = time.time()
+            self._mark_dirty()
+
+    def record_miss(self) -> None:
+        """记录一次未命中"""
+        with self.lock:
+            self.index["misses"] = self.index.get("misses", 0) + 1
+            self._mark_dirty()
+
+    def remove(self, name: str) -> int:
+        """删除条目，返回释放的字节数"""
+        with self.lock:
+            freed = 0
+            for path in (self.entry_path(name), self._legacy_path(name)):
+                try:
+                    if os.path.exists(path):
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+                except OSError as e:
+                    logger.warning(f"删除缓存条目失败: {path} ({e})")
+            if self.index["entries"].pop(name, None) is not None:
+                self._removed.add(name)
+                self._mark_dirty()
+            return freed
+
+    # ---------------------------------------------------------
+    # 统计
+    # ---------------------------------------------------------
+
+    def total_size(self) -> int:
+        """返回当前条目占用的总字节数"""
+        with self.lock:
+            return sum(meta.get("size", 0) for meta in self.index["entries"].values())
+
+    def stats(self) -> Dict:
+        """返回本缓存目录的统计快照"""
+        with self.lock:
+            entries = self.index["entries"]
+            now = time.time()
+            age_distribution = {label: 0 for _, label in AGE_BUCKETS}
+            for meta in entries.values():
+                age = now - meta.get("created", now)
+                for limit, label in AGE_BUCKETS:
+                    if age < limit:
+                        age_distribution[label] += 1
+                        break
+
+            stored = sum(meta.get("size", 0) for meta in entries.values())
+            raw = sum(meta.get("raw_size", 0) for meta in entries.values())
+            hits = self.index.get("hits", 0)
+            misses = self.index.get("misses", 0)
+            lookups = hits + misses
+            return {
+                "directory": self.directory,
+                "entries": len(entries),
+                "stored_bytes": stored,
+                "raw_bytes": raw,
+                "bytes_saved": max(0, raw - stored),
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / lookups * 100, 1) if lookups else 0.0,
+                "age_distribution": age_distribution,
+            }
+
+
+def get_cache_store(directory: str) -> CacheStore:
+    """获取（并复用）指定缓存目录对应的 CacheStore"""
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = CacheStore(key)
+            _stores[key] = store
+        return store
+
+
+def is_global_cache_enabled() -> bool:
+    """是否启用全局内容寻址缓存"""
+    return bool(config.CACHE_SETTINGS.get("global_cache", False))
+
+
+def get_global_cache_store() -> CacheStore:
+    """获取全局内容寻址缓存"""
+    return get_cache_store(os.path.join(get_user_cache_root(), GLOBAL_OBJECTS_DIR))
+
+
+def compute_content_key(content: str) -> str:
+    """计算章节内容在全局缓存中的键
+
+    键由原文与影响脱水结果的参数（提示词模板、脱水比例）共同决定，
+    修改提示词或比例后不会误用旧的结果。
+
+    Args:
+        content: 原文内容
+
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    digest.update(config.PROMPT_TEMPLATES.get("novel_condenser", "").encode("utf-8"))
+    digest.update(f"\0{config.MIN_CONDENSATION_RATIO}-{config.MAX_CONDENSATION_RATIO}\0".encode("utf-8"))
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# =========================================================
+# 缓存目录登记与全局淘汰
+# =========================================================
+
+def _registry_path() -> str:
+    return os.path.join(get_user_cache_root(), STORE_REGISTRY_FILE)
+
+
+def load_registered_stores() -> List[str]:
+    """读取已登记且仍存在的缓存目录列表"""
+    path = _registry_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            directories = json.load(f)
+        if isinstance(directories, list):
+            return [d for d in directories if isinstance(d, str) and os.path.isdir(d)]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"读取缓存目录登记表失败: {e}")
+    return []
+
+
+def register_store(directory: str) -> None:
+    """将缓存目录登记到全局登记表，便于全局容量上限统一淘汰"""
+    directory = os.path.abspath(directory)
+    with _registry_lock:
+        try:
+            directories = load_registered_stores()
+            if directory in directories:
+                return
+            directories.append(directory)
+            os.makedirs(get_user_cache_root(), exist_ok=True)
+            _write_json_atomic(_registry_path(), directories)
+        except Exception as e:
+            logger.debug(f"登记缓存目录失败: {e}")
+
+
+def _eviction_key(policy: str):
+    if policy == "lfu":
+        return lambda item: (item[2].get("hits", 0), item[2].get("last_access", 0))
+    return lambda item: item[2].get("last_access", 0)
+
+
+def evict_to_limit(stores: List[CacheStore], max_bytes: int, policy: str = "lru",
+                   dry_run: bool = False) -> Tuple[int, int]:
+    """在多个缓存目录之间按统一策略淘汰条目，直到总大小不超过上限
+
+    Args:
+        stores: 参与淘汰的缓存目录
+        max_bytes: 容量上限（字节）
+        policy: 淘汰策略，"lru" 或 "lfu"
+        dry_run: 为True时只计算不删除
+
+    Returns:
+        Tuple[int, int]: (淘汰条目数, 释放字节数)
+    """
+    candidates = []
+    total = 0
+    for store in stores:
+        with store.lock:
+            for name, meta in store.index["entries"].items():
+                candidates.append((store, name, dict(meta)))
+                total += meta.get("size", 0)
+
+    if max_bytes <= 0 or total <= max_bytes:
+        return 0, 0
+
+    candidates.sort(key=_eviction_key(policy))
+    removed = 0
+    freed = 0
+    for store, name, meta in candidates:
+        if total - freed <= max_bytes:
+            break
+        if dry_run:
+            freed += meta.get("size", 0)
+        else:
+            freed += store.remove(name) or meta.get("size", 0)
+        removed += 1
+
+    if not dry_run:
+        for store in stores:
+            store.flush()
+    return removed, freed
+
+
+def enforce_size_limit() -> Tuple[int, int]:
+    """按配置的全局容量上限淘汰所有已登记缓存目录中的条目"""
+    max_size_mb = config.CACHE_SETTINGS.get("max_size_mb", 0)
+    if not isinstance(max_size_mb, (int, float)) or max_size_mb <= 0:
+        return 0, 0
+
+    directories = set(load_registered_stores())
+    with _stores_lock:
+        directories.update(_stores.keys())
+    stores = [get_cache_store(d) for d in sorted(directories)]
+    policy = config.CACHE_SETTINGS.get("eviction_policy", "lru")
+    removed, freed = evict_to_limit(stores, int(max_size_mb * 1024 * 1024), policy)
+    if removed:
+        logger.info(f"缓存超过容量上限 {max_size_mb}MB，已按{policy.upper()}策略淘汰 {removed} 个条目，释放 {freed / 1024 / 1024:.2f}MB")
+    return removed, freed
+
+
+def flush_all(enforce_limit: bool = True) -> None:
+    """将所有已打开缓存目录的索引落盘，并按需执行全局容量淘汰"""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+    if enforce_limit and stores:
+        try:
+            enforce_size_limit()
+        except Exception as e:
+            logger.warning(f"执行缓存淘汰失败: {e}")
+
+
+atexit.register(flush_all)
+
+
+# =========================================================
+# 缓存包导入导出
+# =========================================================
+
+def _is_valid_entry(data: Optional[Dict]) -> bool:
+    return bool(data) and isinstance(data.get("condensed_content"), str) and bool(data.get("content_hash"))
+
+
+def _matches_book(source_name: str, book: str) -> bool:
+    """文件名是否属于指定书籍（文件名格式为 书名_[序号]...，书名需完整匹配）"""
+    return source_name == book or source_name.startswith(book + "_")
+
+
+def export_pack(stores: List[CacheStore], pack_path: str, book: Optional[str] = None) -> int:
+    """将缓存条目导出为一个缓存包
+
+    缓存包是一个zip文件：manifest.json 记录每个条目的文件名与指纹（content_hash/content_key），
+    entries/ 下保存压缩后的条目数据。同一章节在多个缓存目录中重复出现时只导出一份。
+
+    Args:
+        stores: 要导出的缓存目录
+        pack_path: 缓存包输出路径
+        book: 只导出该书的条目（文件名为“书名_...”），为None时导出全部
+
+    Returns:
+        int: 导出的条目数
+    """
+    manifest = {"version": PACK_FORMAT_VERSION, "created": time.time(), "entries": []}
+    seen = set()
+
+    pack_dir = os.path.dirname(os.path.abspath(pack_path))
+    os.makedirs(pack_dir, exist_ok=True)
+    tmp_path = f"{pack_path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as pack:
+        for store in stores:
+            with store.lock:
+                names = list(store.index["entries"].keys())
+            for name in names:
+                data = store.get(name)
+                if not _is_valid_entry(data):
+                    continue
+                # 全局缓存条目以哈希命名，原始文件名记录在 source_name 中
+                source_name = data.get("source_name") or name
+                if book and not _matches_book(source_name, book):
+                    continue
+                fingerprint = (source_name, data["content_hash"])
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+
+                arcname = f"{PACK_ENTRY_DIR}/{len(manifest['entries']):06d}{CACHE_ENTRY_SUFFIX}"
+                # 条目本身已经压缩，直接存储
+                pack.writestr(zipfile.ZipInfo(arcname, time.localtime()[:6]), compress_payload(data),
+                              compress_type=zipfile.ZIP_STORED)
+                manifest["entries"].append({
+                    "file": arcname,
+                    "name": source_name,
+                    "content_hash": data["content_hash"],
+                    "content_key": data.get("content_key"),
+                    "condensed_length": data.get("condensed_length", len(data["condensed_content"])),
+                })
+        pack.writestr(PACK_MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=2))
+    os.replace(tmp_path, pack_path)
+    return len(manifest["entries"])
+
+
+def import_pack(pack_path: str, output_dir: Optional[str] = None, to_global: bool = False,
+                write_outputs: bool = False) -> Dict[str, int]:
+    """将缓存包合并到本地缓存
+
+    已存在且指纹相同的条目会被跳过，不会产生重复。
+
+    Args:
+        pack_path: 缓存包路径
+        output_dir: 脱水输出目录，条目会导入到其下的 .cache 目录；为None时只导入全局缓存
+        to_global: 是否同时导入全局内容寻址缓存（未指定 output_dir 时总是导入）
+        write_outputs: 是否在输出目录中直接写出脱水后的文件（已存在的文件不会覆盖）
+
+    Returns:
+        Dict[str, int]: imported/skipped/invalid/written 计数
+    """
+    counts = {"imported": 0, "skipped": 0, "invalid": 0, "written": 0}
+    local_store = get_cache_store(os.path.join(output_dir, CACHE_DIR_NAME)) if output_dir else None
+    global_store = get_global_cache_store() if (to_global or not output_dir) else None
+
+    with zipfile.ZipFile(pack_path, "r") as pack:
+        manifest = json.loads(pack.read(PACK_MANIFEST_FILE).decode("utf-8"))
+        if manifest.get("version", 0) > PACK_FORMAT_VERSION:
+            raise ValueError(f"不支持的缓存包版本: {manifest.get('version')}")
+
+        for item in manifest.get("entries", []):
+            try:
+                data = decompress_payload(pack.read(item["file"]))
+            except Exception as e:
+                logger.warning(f"缓存包条目损坏: {item.get('file')} ({e})")
+                counts["invalid"] += 1
+                continue
+            # 校验指纹，防止清单与条目不一致
+            if not _is_valid_entry(data) or data["content_hash"] != item.get("content_hash"):
+                counts["invalid"] += 1
+                continue
+
+            name = os.path.basename(item.get("name") or data.get("source_name") or "")
+            changed = False
+            if local_store is not None and name:
+                existing = local_store.get(name)
+                if not (existing and existing.get("content_hash") == data["content_hash"]):
+                    changed = local_store.put(name, data) or changed
+            content_key = data.get("content_key")
+            if global_store is not None and content_key:
+                existing = global_store.get(content_key)
+                if not (existing and existing.get("content_hash") == data["content_hash"]):
+                    changed = global_store.put(content_key, data) or changed
+            counts["imported" if changed else "skipped"] += 1
+
+            if write_outputs and output_dir and name:
+                output_path = os.path.join(output_dir, name)
+                if not os.path.exists(output_path):
+                    # 原子写入，导入中断时不会留下被当作有效结果的残缺文件
+                    write_file_atomic(output_path, data["condensed_content"])
+                    counts["written"] += 1
+
+    for store in (local_store, global_store):
+        if store is not None:
+            store.flush()
+    return counts
+
+
+# =========================================================
+# 命令行接口
+# =========================================================
+
+def _discover_stores(paths: List[str]) -> List[CacheStore]:
+    """根据命令行路径查找缓存目录；未指定路径时使用登记表"""
+    directories = []
+    if not paths:
+        directories = load_registered_stores()
+    for path in paths:
+        path = os.path.abspath(path)
+        if not os.path.isdir(path):
+            logger.warning(f"路径不存在或不是目录: {path}")
+            continue
+        if os.path.basename(path) == CACHE_DIR_NAME or os.path.exists(os.path.join(path, CACHE_INDEX_FILE)):
+            directories.append(path)
+            continue
+        for root, dirs, _ in os.walk(path):
+            if CACHE_DIR_NAME in dirs:
+                directories.append(os.path.join(root, CACHE_DIR_NAME))
+    return [get_cache_store(d) for d in sorted(set(directories))]
+
+
+def _format_bytes(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.2f}MB"
+    return f"{size / 1024:.1f}KB"
+
+
+def print_cache_stats(stores: List[CacheStore]) -> None:
+    """打印缓存统计信息"""
+    if not stores:
+        logger.info("未找到任何缓存目录")
+        return
+
+    totals = {"entries": 0, "stored_bytes": 0, "raw_bytes": 0, "bytes_saved": 0, "hits": 0, "misses": 0}
+    age_totals = {label: 0 for _, label in AGE_BUCKETS}
+
+    logger.info("=" * 50)
+    logger.info("缓存统计")
+    logger.info("=" * 50)
+    for store in stores:
+        stats = store.stats()
+        for key in totals:
+            totals[key] += stats[key]
+        for label, count in stats["age_distribution"].items():
+            age_totals[label] += count
+        logger.info(
+            f"{stats['directory']}: {stats['entries']} 个条目, 占用 {_format_bytes(stats['stored_bytes'])}, "
+            f"命中率 {stats['hit_rate']}% ({stats['hits']}/{stats['hits'] + stats['misses']})"
+        )
+
+    lookups = totals["hits"] + totals["misses"]
+    hit_rate = totals["hits"] / lookups * 100 if lookups else 0.0
+    logger.info("-" * 50)
+    logger.info(f"缓存目录数: {len(stores)}")
+    logger.info(f"条目总数: {totals['entries']}")
+    logger.info(f"磁盘占用: {_format_bytes(totals['stored_bytes'])} (未压缩 {_format_bytes(totals['raw_bytes'])})")
+    logger.info(f"压缩节省: {_format_bytes(totals['bytes_saved'])}")
+    logger.info(f"命中率: {hit_rate:.1f}% (命中 {totals['hits']} 次, 未命中 {totals['misses']} 次)")
+    logger.info("年龄分布:")
+    for label, count in age_totals.items():
+        logger.info(f"  - {label}: {count} 个条目")
+
+
+def prune_stores(stores: List[CacheStore], max_size_mb: Optional[float] = None, policy: Optional[str] = None,
+                 older_than_days: Optional[float] = None, dry_run: bool = False) -> Tuple[int, int]:
+    """清理缓存：先删除超过指定天数未访问的条目，再按容量上限淘汰
+
+    Returns:
+        Tuple[int, int]: (删除条目数, 释放字节数)
+    """
+    removed = 0
+    freed = 0
+
+    if older_than_days is not None:
+        cutoff = time.time() - older_than_days * 86400
+        for store in stores:
+            with store.lock:
+                stale = [name for name, meta in store.index["entries"].items()
+                         if meta.get("last_access", 0) < cutoff]
+                for name in stale:
+                    if dry_run:
+                        freed += store.index["entries"][name].get("size", 0)
+                    else:
+                        freed += store.remove(name)
+                    removed += 1
+                if not dry_run:
+                    store.flush()
+
+    if max_size_mb is None:
+        max_size_mb = config.CACHE_SETTINGS.get("max_size_mb", 0)
+    policy = policy or config.CACHE_SETTINGS.get("eviction_policy", "lru")
+    if max_size_mb and max_size_mb > 0:
+        count, size = evict_to_limit(stores, int(max_size_mb * 1024 * 1024), policy, dry_run=dry_run)
+        removed += count
+        freed += size
+
+    return removed, freed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """缓存管理命令行入口"""
+    parser = argparse.ArgumentParser(description="脱水结果缓存管理")
+    subparsers = parser.add_subparsers(dest="command")
+
+    stats_parser = subparsers.add_parser("stats", help="显示缓存命中率、压缩节省和年龄分布")
+    stats_parser.add_argument("paths", nargs="*", help="缓存目录或包含缓存目录的上级目录（默认: 所有已登记的缓存目录）")
+
+    prune_parser = subparsers.add_parser("prune", help="按容量上限和淘汰策略清理缓存")
+    prune_parser.add_argument("paths", nargs="*", help="缓存目录或包含缓存目录的上级目录（默认: 所有已登记的缓存目录）")
+    prune_parser.add_argument("--max-size-mb", type=float, default=None, help="容量上限（MB，默认使用配置值）")
+    prune_parser.add_argument("--policy", choices=["lru", "lfu"], default=None, help="淘汰策略（默认使用配置值）")
+    prune_parser.add_argument("--older-than", type=float, default=None, help="删除超过指定天数未访问的条目")
+    prune_parser.add_argument("--dry-run", action="store_true", help="只显示将要删除的内容，不实际删除")
+
+    export_parser = subparsers.add_parser("export", help="将缓存条目导出为缓存包")
+    export_parser.add_argument("pack", help="缓存包输出路径（.zip）")
+    export_parser.add_argument("paths", nargs="*", help="缓存目录或包含缓存目录的上级目录（默认: 所有已登记的缓存目录）")
+    export_parser.add_argument("--book", default=None, help="只导出指定书名的条目（书名需完整匹配）")
+
+    import_parser = subparsers.add_parser("import", help="将缓存包合并到本地缓存")
+    import_parser.add_argument("pack", help="缓存包路径")
+    import_parser.add_argument("--output-dir", default=None, help="脱水输出目录，条目导入到其下的 .cache 目录")
+    import_parser.add_argument("--global", dest="to_global", action="store_true", help="同时导入全局内容寻址缓存")
+    import_parser.add_argument("--write-outputs", action="store_true", help="在输出目录中直接写出脱水后的文件")
+
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return 1
+
+    config.load_api_config()
+
+    if args.command == "import":
+        if args.write_outputs and not args.output_dir:
+            logger.error("--write-outputs 需要同时指定 --output-dir")
+            return 1
+        try:
+            counts = import_pack(args.pack, args.output_dir, args.to_global, args.write_outputs)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            logger.error(f"导入缓存包失败: {e}")
+            return 1
+        logger.info(
+            f"导入完成: 新增 {counts['imported']} 个条目, 跳过重复 {counts['skipped']} 个, "
+            f"无效 {counts['invalid']} 个, 写出文件 {counts['written']} 个"
+        )
+        return 0
+
+    stores = _discover_stores(args.paths)
+
+    if args.command == "export":
+        count = export_pack(stores, args.pack, args.book)
+        logger.info(f"已导出 {count} 个缓存条目到: {args.pack}")
+        return 0
+
+    if args.command == "stats":
+        print_cache_stats(stores)
+        return 0
+
+    start_time = time.time()
+    removed, freed = prune_stores(stores, args.max_size_mb, args.policy, args.older_than, args.dry_run)
+    action = "将删除" if args.dry_run else "已删除"
+    logger.info(f"{action} {removed} 个缓存条目，释放 {_format_bytes(freed)}，耗时 {format_time(time.time() - start_time)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
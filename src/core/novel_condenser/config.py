@@ -125,13 +125,64 @@ LLM_GENERATION_PARAMS = {
     "retry_delay": 5,          # 基础重试延迟（秒）
 }
 
+# =========================================================
+# 脱水结果缓存配置
+# =========================================================
+
+CACHE_SETTINGS = {
+    "compression_level": 6,    # zlib压缩级别（1-9），越大体积越小、速度越慢
+    "max_size_mb": 1024,       # 所有缓存目录合计的容量上限（MB），0表示不限制
+    "eviction_policy": "lru",  # 超出上限时的淘汰策略："lru"（最近最少使用）或"lfu"（最不经常使用）
+    "cache_root": "",          # 全局缓存根目录，留空时使用用户缓存目录
+    "global_cache": False,     # 是否启用跨输出目录共享的全局内容寻址缓存
+}
+
+# 输出写入配置
+OUTPUT_SETTINGS = {
+    "async_writer": True,      # 是否使用后台写出线程，API线程不再等待磁盘
+    "queue_size": 64,          # 写出队列容量，队列满时提交方会等待
+    "fsync": "none",           # 落盘策略："none"（交给系统）、"batch"（任务结束时统一落盘）、"always"（每个文件落盘）
+}
+
+# 密钥调度配置（交互式请求优先于批量脱水）
+KEY_SCHEDULING = {
+    "interactive_reserved": 1,        # 每个密钥池为交互式请求（提示词测试）保留的并发额度，仅在GUI连接或有交互式请求等待时生效；0为不保留
+}
+
+# 提示词缓存配置（静态系统提示词作为固定前缀，由供应商缓存）
+PROMPT_CACHE_SETTINGS = {
+    "split_static_prompt": True,      # 系统提示词只含静态内容，字数等随章节变化的数值放在用户消息开头
+    "gemini_cached_content": True,    # 为Gemini创建显式缓存（cachedContents），不可用时退回隐式前缀缓存
+    "gemini_cache_ttl_seconds": 3600, # Gemini显式缓存的有效期（秒），到期前自动重建
+    "openai_prompt_cache_key": "auto",  # 发送 prompt_cache_key："auto"（仅官方接口）、true（总是）、false（从不）
+}
+
+# 短章节打包配置（多个连续短章节合并为一个请求）
+PACKING_SETTINGS = {
+    "enabled": False,                 # 是否启用打包（命令行 --pack-short 也可启用）
+    "max_chapter_chars": 4000,        # 参与打包的章节最大字数
+    "max_pack_chars": 12000,          # 每个打包请求的原文总字数上限（受模型输出token上限约束）
+    "max_pack_chapters": 6,           # 每个打包请求的最大章节数
+}
+
+# 供应商批处理接口配置（离线批量脱水，见 batch_api.py）
+BATCH_API_SETTINGS = {
+    "poll_interval": 60,              # 轮询批处理状态的间隔（秒）
+    "max_requests_per_batch": 5000,   # 每个批处理任务的最大请求数，超出时拆分为多个任务
+    "max_batch_mb": 15,               # 每个批处理任务的最大请求体积（MB），Gemini内联请求上限约20MB
+    "completion_window": "24h",       # OpenAI批处理的完成时限
+}
+
 # 提示词模板
 PROMPT_TEMPLATES = {
     # 小说压缩提示词模板
     "novel_condenser": '你是一位专业的小说内容整理与改写专家。你的任务是将下面的小说内容（原文 {original_count}字）调整为一个更简洁的版本。调整后版本的字数应在 {min_count} 字到 {max_count} 字之间，请务必严格控制产出字数在该范围内。\n\n请严格遵循以下要求：\n\n主线完整：完整保留故事的主线情节与所有关键转折点。不允许遗漏任何重要剧情推进环节。\n人物塑造：保留主要人物性格、形象发展至关重要的对话、内心活动和互动细节。\n环境氛围：保留对理解世界观、故事背景、气氛营造有核心作用的环境描写与关键细节（但避免无关冗余描写）。\n重要配角与线索：不遗漏任何对情节发展有显著影响的次要人物和叙事线索。\n风格连贯流畅：确保压缩后的文本连贯、流畅，逻辑清楚，尽量保持原作风格和叙事调性。\n动态回补机制：初步整理完成后，请统计自己整理后文本的字数。如果字数低于目标下限 {min_count}，请回溯补充之前可能略去的次要情节、气氛描写、对主配角的心理刻画、对话或有助主旨细节，直至内容字数达到要求。\n禁止输出范围外字数：不允许输出低于 {min_count}或高于 {max_count} 字的文本。\n\n输出格式与注意事项：\n直接输出脱水压缩后的文本本身，不要添加任何前言、说明、评论、总结、序号或标题。\n如果整理后确实已到目标范围上限，但仍有部分细节未能保留，在不影响主线流畅的前提下可以适当取舍，但必须优先保障上述 1-5 点。',
     
     # 分块处理前缀
-    "chunk_prefix": "这是一个小说的第{chunk_index}段，共{total_chunks}段。"
+    "chunk_prefix": "这是一个小说的第{chunk_index}段，共{total_chunks}段。",
+    
+    # 多章打包说明（附加在压缩提示词之后）
+    "packed_chapters": "下面的内容包含 {chapter_count} 个相互独立的章节，第N章以 {start_marker} 开始、以 {end_marker} 结束。请对每一章分别按上述要求调整，各章字数范围如下：\n{chapter_targets}\n按原顺序逐章输出，每章同样用 {start_marker} 和 {end_marker} 包围，不要合并、遗漏或增加章节，标记之外不要输出任何内容。"
 }
 
 # =========================================================
@@ -170,8 +221,9 @@ def load_api_config(config_path: Optional[str] = None) -> bool:
         bool: 配置加载是否成功
     """
     global MIN_CONDENSATION_RATIO, MAX_CONDENSATION_RATIO, TARGET_CONDENSATION_RATIO
-    global LLM_GENERATION_PARAMS, PROMPT_TEMPLATES
-    
+    global LLM_GENERATION_PARAMS, PROMPT_TEMPLATES, CACHE_SETTINGS, OUTPUT_SETTINGS, KEY_SCHEDULING
+    global BATCH_API_SETTINGS, PACKING_SETTINGS, PROMPT_CACHE_SETTINGS
+
     if config_path:
         return _load_from_file(config_path)
 
@@ -206,7 +258,31 @@ def load_api_config(config_path: Optional[str] = None) -> bool:
         # 加载提示词模板（如果存在）
         if hasattr(project_config, 'PROMPT_TEMPLATES'):
             PROMPT_TEMPLATES.update(project_config.PROMPT_TEMPLATES)
-            
+
+        # 加载缓存配置（如果存在）
+        if hasattr(project_config, 'CACHE_SETTINGS'):
+            CACHE_SETTINGS.update(project_config.CACHE_SETTINGS)
+
+        # 加载输出写入配置（如果存在）
+        if hasattr(project_config, 'OUTPUT_SETTINGS'):
+            OUTPUT_SETTINGS.update(project_config.OUTPUT_SETTINGS)
+
+        # 加载密钥调度配置（如果存在）
+        if hasattr(project_config, 'KEY_SCHEDULING'):
+            KEY_SCHEDULING.update(project_config.KEY_SCHEDULING)
+
+        # 加载提示词缓存配置（如果存在）
+        if hasattr(project_config, 'PROMPT_CACHE_SETTINGS'):
+            PROMPT_CACHE_SETTINGS.update(project_config.PROMPT_CACHE_SETTINGS)
+
+        # 加载短章节打包配置（如果存在）
+        if hasattr(project_config, 'PACKING_SETTINGS'):
+            PACKING_SETTINGS.update(project_config.PACKING_SETTINGS)
+
+        # 加载批处理接口配置（如果存在）
+        if hasattr(project_config, 'BATCH_API_SETTINGS'):
+            BATCH_API_SETTINGS.update(project_config.BATCH_API_SETTINGS)
+
         # 如果至少加载了一种API配置，则返回成功
         if len(GEMINI_API_CONFIG) > 0 or len(OPENAI_API_CONFIG) > 0:
             return True
@@ -231,8 +307,8 @@ def _load_from_file(file_path: str) -> bool:
         bool: 加载是否成功
     """
     global MIN_CONDENSATION_RATIO, MAX_CONDENSATION_RATIO, TARGET_CONDENSATION_RATIO
-    global LLM_GENERATION_PARAMS, PROMPT_TEMPLATES
-    
+    global LLM_GENERATION_PARAMS, PROMPT_TEMPLATES, CACHE_SETTINGS, OUTPUT_SETTINGS, KEY_SCHEDULING
+
     if not os.path.exists(file_path):
         logger.warning(f"配置文件不存在: {file_path}")
         return False
@@ -286,7 +362,49 @@ def _load_from_file(file_path: str) -> bool:
         if 'customer_prompt' in config_data and isinstance(config_data['customer_prompt'], str):
             PROMPT_TEMPLATES["novel_condenser"] = config_data['customer_prompt']
             logger.info("加载了自定义提示词")
-                
+
+        # 加载缓存配置（如果存在）
+        if 'cache_settings' in config_data and isinstance(config_data['cache_settings'], dict):
+            for key, value in config_data['cache_settings'].items():
+                if key in CACHE_SETTINGS:
+                    CACHE_SETTINGS[key] = value
+            logger.info("加载了缓存配置")
+
+        # 加载输出写入配置（如果存在）
+        if 'output_settings' in config_data and isinstance(config_data['output_settings'], dict):
+            for key, value in config_data['output_settings'].items():
+                if key in OUTPUT_SETTINGS:
+                    OUTPUT_SETTINGS[key] = value
+            logger.info("加载了输出写入配置")
+
+        # 加载密钥调度配置（如果存在）
+        if 'key_scheduling' in config_data and isinstance(config_data['key_scheduling'], dict):
+            for key, value in config_data['key_scheduling'].items():
+                if key in KEY_SCHEDULING:
+                    KEY_SCHEDULING[key] = value
+            logger.info("加载了密钥调度配置")
+
+        # 加载提示词缓存配置（如果存在）
+        if 'prompt_cache' in config_data and isinstance(config_data['prompt_cache'], dict):
+            for key, value in config_data['prompt_cache'].items():
+                if key in PROMPT_CACHE_SETTINGS:
+                    PROMPT_CACHE_SETTINGS[key] = value
+            logger.info("加载了提示词缓存配置")
+
+        # 加载短章节打包配置（如果存在）
+        if 'packing' in config_data and isinstance(config_data['packing'], dict):
+            for key, value in config_data['packing'].items():
+                if key in PACKING_SETTINGS:
+                    PACKING_SETTINGS[key] = value
+            logger.info("加载了短章节打包配置")
+
+        # 加载批处理接口配置（如果存在）
+        if 'batch_api' in config_data and isinstance(config_data['batch_api'], dict):
+            for key, value in config_data['batch_api'].items():
+                if key in BATCH_API_SETTINGS:
+                    BATCH_API_SETTINGS[key] = value
+            logger.info("加载了批处理接口配置")
+
         logger.info(f"成功加载配置文件: {file_path}")
         
         # 至少有一种API配置加载成功
@@ -354,6 +472,12 @@ def create_config_template(config_path: Optional[str] = None) -> None:
             "max_condensation_ratio": MAX_CONDENSATION_RATIO,
             "target_condensation_ratio": TARGET_CONDENSATION_RATIO,
             "llm_generation_params": LLM_GENERATION_PARAMS,
+            "cache_settings": CACHE_SETTINGS,
+            "output_settings": OUTPUT_SETTINGS,
+            "key_scheduling": KEY_SCHEDULING,
+            "prompt_cache": PROMPT_CACHE_SETTINGS,
+            "packing": PACKING_SETTINGS,
+            "batch_api": BATCH_API_SETTINGS,
             "prompt_templates": {
                 "novel_condenser": '你是一位专业的小说内容整理与改写专家。你的任务是将下面的小说内容（原文 {original_count}字）调整为一个更简洁的版本。调整后版本的字数应在 {min_count} 字到 {max_count} 字之间，请务必严格控制产出字数在该范围内。\n\n请严格遵循以下要求：\n\n主线完整：完整保留故事的主线情节与所有关键转折点。不允许遗漏任何重要剧情推进环节。\n人物塑造：保留主要人物性格、形象发展至关重要的对话、内心活动和互动细节。\n环境氛围：保留对理解世界观、故事背景、气氛营造有核心作用的环境描写与关键细节（但避免无关冗余描写）。\n重要配角与线索：不遗漏任何对情节发展有显著影响的次要人物和叙事线索。\n风格连贯流畅：确保压缩后的文本连贯、流畅，逻辑清楚，尽量保持原作风格和叙事调性。\n动态回补机制：初步整理完成后，请统计自己整理后文本的字数。如果字数低于目标下限 {min_count}，请回溯补充之前可能略去的次要情节、气氛描写、对主配角的心理刻画、对话或有助主旨细节，直至内容字数达到要求。\n禁止输出范围外字数：不允许输出低于 {min_count}或高于 {max_count} 字的文本。\n\n输出格式与注意事项：\n直接输出脱水压缩后的文本本身，不要添加任何前言、说明、评论、总结、序号或标题。\n如果整理后确实已到目标范围上限，但仍有部分细节未能保留，在不影响主线流畅的前提下可以适当取舍，但必须优先保障上述 1-5 点。',
                 "chunk_prefix": "这是一个小说的第{chunk_index}段，共{total_chunks}段。"
@@ -8,14 +8,18 @@ import os
 import re
 import glob
 import hashlib
-import json
 import time  # 添加time模块的导入
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 
 # 导入配置和工具函数
 from . import config
-from ..utils import setup_logger, ensure_dir, read_text_file, get_safe_filename
+from .cache import (
+    CACHE_DIR_NAME, get_cache_store, get_global_cache_store,
+    is_global_cache_enabled, compute_content_key,
+)
+from .output_writer import ensure_output_dir, write_output
+from ..utils import setup_logger, ensure_dir, read_text_file, get_safe_filename, get_chapter_file_index
 
 # 设置日志记录器
 logger = setup_logger(__name__)
@@ -93,6 +97,17 @@ def is_directory_file(content):
     
     return False
 
+def is_valid_condensed_content(content: str) -> bool:
+    """判断已有的脱水结果是否可以直接复用（不过短、开头不含错误信息）
+
+    Args:
+        content: 已保存的脱水内容
+
+    Returns:
+        bool: 是否有效
+    """
+    return len(content) >= 300 and "错误" not in content[:100] and "失败" not in content[:100]
+
 def save_to_output_dir(
     file_path: str,
     content: str,
@@ -107,7 +122,7 @@ def save_to_output_dir(
         file_type: 文件类型描述，用于输出消息
 
     Returns:
-        保存后的文件路径，如果保存失败则返回None
+        保存后的文件路径（异步写出时可能尚未落盘），如果保存失败则返回None
     """
     file_name = os.path.basename(file_path)
     file_dir = os.path.dirname(file_path)
@@ -115,25 +130,15 @@ def save_to_output_dir(
     # 使用自定义输出目录或默认的condensed子目录
     final_output_dir = output_dir or OUTPUT_DIR or os.path.join(file_dir, "condensed")
     
-    # 确保输出目录存在
-    if not os.path.exists(final_output_dir):
-        try:
-            os.makedirs(final_output_dir)
-        except Exception as e:
-            logger.error(f"创建输出目录失败: {e}")
-            return None
+    # 确保输出目录存在（每次运行每个目录只创建一次）
+    if not ensure_output_dir(final_output_dir):
+        return None
     
-    # 使用原始文件名保存到输出目录
+    # 使用原始文件名保存到输出目录（由写出线程原子提交）
     output_path = os.path.join(final_output_dir, file_name)
-    
-    try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        logger.info(f"{file_type}文件已保存到: {output_path}")
-        return output_path
-    except Exception as e:
-        logger.error(f"保存文件时出错: {e}")
+    if not write_output(output_path, content, file_type):
         return None
+    return output_path
 
 def save_condensed_novel(
     original_path: str,
@@ -175,12 +180,8 @@ def get_output_file_path(file_path: str, output_dir: Optional[str] = None) -> Op
         final_output_dir = OUTPUT_DIR
     
     # 确保输出目录存在
-    if not os.path.exists(final_output_dir):
-        try:
-            os.makedirs(final_output_dir)
-        except Exception as e:
-            logger.error(f"创建输出目录失败: {e}")
-            return None
+    if not ensure_output_dir(final_output_dir):
+        return None
     
     # 返回完整的输出文件路径
     return os.path.join(final_output_dir, file_name)
@@ -202,10 +203,30 @@ def save_directory_file(file_path: str, output_dir: Optional[str] = None) -> Opt
         logger.error(f"复制目录文件时出错: {e}")
         return None
 
+def _compile_num_pattern(name_pattern: str) -> "re.Pattern":
+    """将包含 [num] 占位符的文件名模式编译为正则表达式
+
+    占位符可匹配 数字 或 [数字]；模式中的 * 和 ? 按通配符处理，其余字符（包括方括号）按字面匹配。
+    """
+    placeholder = '[[num]]' if '[[num]]' in name_pattern else '[num]'
+    parts = []
+    for literal in name_pattern.split(placeholder, 1):
+        translated = ''.join(
+            '.*' if ch == '*' else '.' if ch == '?' else re.escape(ch)
+            for ch in literal
+        )
+        parts.append(translated)
+    number_group = r'(?:\[(?P<bracketed>\d+)\]|(?P<plain>\d+))'
+    flags = re.IGNORECASE if os.name == 'nt' else 0
+    return re.compile('^' + number_group.join(parts) + '$', flags)
+
 def find_matching_files(file_pattern: str, num_range: Optional[Tuple[int, int]] = None, 
                       debug_mode: bool = False) -> List[str]:
     """查找匹配的文件
 
+    批量模式下只扫描一次目录：用章节文件索引列出文件名，再用编译好的模式一次性匹配，
+    不再对范围内的每个序号分别 glob。
+
     Args:
         file_pattern: 文件路径模式
         num_range: 数字范围，用于批量处理
@@ -222,34 +243,22 @@ def find_matching_files(file_pattern: str, num_range: Optional[Tuple[int, int]]
         if debug_mode:
             logger.debug(f"查找范围 {start} 到 {end} 的文件")
         
-        # 逐个数字尝试替换并使用glob查找
-        for num in range(start, end + 1):
-            # 准备多种可能的替换模式
-            patterns = []
-            
-            # 标准替换: [num] -> 数字
-            patterns.append(file_pattern.replace('[num]', str(num)))
-            
-            # 方括号替换: [num] -> [数字]
-            patterns.append(file_pattern.replace('[num]', f'[{num}]'))
-            
-            # 尝试双层方括号
-            if '[[num]]' in file_pattern:
-                patterns.append(file_pattern.replace('[[num]]', f'[{num}]'))
-            
-            if debug_mode:
-                logger.debug(f"数字 {num} 的匹配模式: {patterns}")
-            
-            # 使用通配符查找匹配的文件
-            for pattern in patterns:
-                # 修复Windows路径问题
-                fixed_pattern = pattern.replace('\\', '/')
-                # 使用glob.glob()时不使用递归模式
-                matched = glob.glob(fixed_pattern)
-                if matched and debug_mode:
-                    logger.debug(f"模式 '{fixed_pattern}' 匹配到 {len(matched)} 个文件")
-                
-                file_paths.extend(matched)
+        dir_part, name_pattern = os.path.split(file_pattern.replace('\\', '/'))
+        index = get_chapter_file_index(dir_part or '.', suffix='')
+        regex = _compile_num_pattern(name_pattern)
+        if debug_mode:
+            logger.debug(f"在目录 '{dir_part or '.'}' 中匹配模式: {regex.pattern}")
+        
+        for name in index.names:
+            match = regex.match(name)
+            if not match:
+                continue
+            num = int(match.group('bracketed') or match.group('plain'))
+            if start <= num <= end:
+                file_paths.append(os.path.join(dir_part, name) if dir_part else name)
+        
+        if debug_mode:
+            logger.debug(f"模式匹配到 {len(file_paths)} 个文件")
         
         # 如果仍未找到文件，尝试更宽松的搜索
         if not file_paths:
@@ -275,6 +284,9 @@ def _find_files_by_wider_search(file_pattern: str, num_range: Tuple[int, int],
                                debug_mode: bool = False) -> List[str]:
     """当常规匹配失败时使用更宽松的搜索策略，只搜索当前目录
 
+    复用章节文件索引：优先按规范序号（[n]、_n_、[a-b]）筛选，
+    文件名中没有规范序号时退回到文件名中的第一个数字。
+
     Args:
         file_pattern: 文件路径模式
         num_range: 数字范围
@@ -284,7 +296,6 @@ def _find_files_by_wider_search(file_pattern: str, num_range: Tuple[int, int],
         匹配的文件路径列表
     """
     start, end = num_range
-    file_paths = []
     
     logger.info("没有找到精确匹配的文件，尝试更宽松的搜索...")
     
@@ -293,49 +304,22 @@ def _find_files_by_wider_search(file_pattern: str, num_range: Tuple[int, int],
     if debug_mode:
         logger.debug(f"在目录 '{base_dir}' 中搜索")
     
-    # 只列出当前目录中的文件，不递归
-    try:
-        # 只获取当前目录的文件列表
-        files = [f for f in os.listdir(base_dir) if os.path.isfile(os.path.join(base_dir, f))]
-        
-        for filename in files:
-            if not filename.endswith('.txt'):
-                continue
-                
-            full_path = os.path.join(base_dir, filename)
-            
-            # 尝试从文件名中提取数字
-            digits = re.findall(r'\[(\d+)\]', filename)
-            if digits:
-                for digit in digits:
-                    try:
-                        num = int(digit)
-                        if start <= num <= end:
-                            if debug_mode:
-                                logger.debug(f"找到匹配文件 '{full_path}', 序号 {num}")
-                            file_paths.append(full_path)
-                            break
-                    except ValueError:
-                        continue
-            
-            # 也可以尝试从文件名中提取其他形式的数字
-            if not digits:
-                # 从文件名中提取数字
-                number_match = re.search(r'(\d+)', filename)
-                if number_match:
-                    try:
-                        num = int(number_match.group(1))
-                        if start <= num <= end:
-                            if debug_mode:
-                                logger.debug(f"找到匹配文件 '{full_path}', 序号 {num}")
-                            file_paths.append(full_path)
-                    except ValueError:
-                        continue
-    except Exception as e:
-        logger.error(f"搜索文件时出错: {e}")
+    index = get_chapter_file_index(base_dir, suffix='.txt')
+    file_paths = [os.path.join(base_dir, name)
+                  for name in index.names_in_range(start, end, include_loose=True)]
+    if debug_mode:
+        for path in file_paths:
+            logger.debug(f"找到匹配文件 '{path}'")
     
     return sorted(list(set(file_paths)))
 
+def _get_cache_dir(file_path: str, output_dir: Optional[str] = None) -> Optional[str]:
+    """获取文件对应的缓存目录（输出目录下的 .cache）"""
+    output_path = get_output_file_path(file_path, output_dir=output_dir)
+    if not output_path:
+        return None
+    return os.path.join(os.path.dirname(output_path), CACHE_DIR_NAME)
+
 def create_cache_for_file(
     content: str,
     condensed_content: str,
@@ -356,18 +340,10 @@ def create_cache_for_file(
         # 计算文件内容的哈希值
         content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
         
-        # 获取文件所在目录
-        output_path = get_output_file_path(file_path, output_dir=output_dir)
-        if not output_path:
+        # 获取缓存目录
+        cache_dir = _get_cache_dir(file_path, output_dir=output_dir)
+        if not cache_dir:
             return False
-            
-        # 创建缓存目录
-        cache_dir = os.path.join(os.path.dirname(output_path), ".cache")
-        os.makedirs(cache_dir, exist_ok=True)
-        
-        # 创建缓存文件路径
-        file_name = os.path.basename(file_path)
-        cache_file = os.path.join(cache_dir, file_name + ".json")
         
         # 构造缓存数据
         cache_data = {
@@ -375,14 +351,17 @@ def create_cache_for_file(
             'condensed_content': condensed_content,
             'timestamp': time.time(),
             'content_length': len(content),
-            'condensed_length': len(condensed_content)
+            'condensed_length': len(condensed_content),
+            'source_name': os.path.basename(file_path),
+            'content_key': compute_content_key(content),
         }
         
-        # 保存缓存
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False)
-            
-        return True
+        # 同时写入全局内容寻址缓存（如果启用），供其他输出目录复用
+        if is_global_cache_enabled():
+            get_global_cache_store().put(cache_data['content_key'], cache_data)
+        
+        # 压缩保存缓存
+        return get_cache_store(cache_dir).put(os.path.basename(file_path), cache_data)
     except Exception as e:
         logger.warning(f"保存缓存失败: {e}")
         return False
@@ -404,26 +383,30 @@ def get_cached_content(file_path: str, output_dir: Optional[str] = None) -> Opti
             
         content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
         
-        # 尝试获取缓存文件
-        output_path = get_output_file_path(file_path, output_dir=output_dir)
-        if not output_path:
-            return None
-            
-        cache_dir = os.path.join(os.path.dirname(output_path), ".cache")
-        file_name = os.path.basename(file_path)
-        cache_file = os.path.join(cache_dir, file_name + ".json")
+        # 优先查询全局内容寻址缓存：与路径和文件名无关，只看章节内容
+        if is_global_cache_enabled():
+            global_store = get_global_cache_store()
+            content_key = compute_content_key(content)
+            cache_data = global_store.get(content_key)
+            if cache_data and cache_data.get('content_hash') == content_hash and 'condensed_content' in cache_data:
+                global_store.record_hit(content_key)
+                return cache_data['condensed_content']
+            global_store.record_miss()
         
-        # 如果缓存文件不存在，返回None
-        if not os.path.exists(cache_file):
+        # 尝试获取缓存条目
+        cache_dir = _get_cache_dir(file_path, output_dir=output_dir)
+        if not cache_dir:
             return None
             
-        # 读取缓存
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            cache_data = json.load(f)
+        store = get_cache_store(cache_dir)
+        file_name = os.path.basename(file_path)
+        cache_data = store.get(file_name)
             
         # 检查内容哈希是否匹配
-        if cache_data.get('content_hash') == content_hash and 'condensed_content' in cache_data:
+        if cache_data and cache_data.get('content_hash') == content_hash and 'condensed_content' in cache_data:
+            store.record_hit(file_name)
             return cache_data['condensed_content']
+        store.record_miss()
             
     except Exception as e:
         logger.warning(f"读取缓存失败: {e}")
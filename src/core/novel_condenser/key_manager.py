@@ -2,6 +2,13 @@
 # -*- coding: utf-8 -*-
 """
 API密钥管理模块 - 基于每条配置的并发数分配请求
+
+请求分为两个优先级：
+- interactive（交互式，如提示词测试）：有空闲额度时优先分配，不受冷却/跳过状态限制
+- batch（批量脱水）：有交互式请求在等待时让出额度；有交互式客户端（GUI）连接或交互式请求等待时，
+  每个密钥池保留少量额度（见 config.KEY_SCHEDULING）不分配给批量请求。
+  池容量不足以保留时，交互式请求可以临时超出并发上限，大批量运行中的提示词测试也不必等待批量请求完成。
+  命令行、后台服务等没有交互式客户端的运行不受影响
 """
 
 import threading
@@ -13,6 +20,27 @@ from ..utils import setup_logger
 
 logger = setup_logger(__name__)
 
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+
+# 已连接的交互式客户端数（如GUI窗口），大于0时各密钥池为交互式请求保留额度
+_interactive_clients = 0
+_interactive_clients_lock = threading.Lock()
+
+
+def attach_interactive_client() -> None:
+    """登记一个交互式客户端（GUI启动时调用）"""
+    global _interactive_clients
+    with _interactive_clients_lock:
+        _interactive_clients += 1
+
+
+def detach_interactive_client() -> None:
+    """注销一个交互式客户端（GUI关闭时调用）"""
+    global _interactive_clients
+    with _interactive_clients_lock:
+        _interactive_clients = max(0, _interactive_clients - 1)
+
 
 class APIKeyManager:
     """API密钥管理器：按配置实例的并发额度分配请求。"""
@@ -46,78 +74,138 @@ class APIKeyManager:
         self.skipped_configs = set()
         self._local = threading.local()
         self.lock = threading.Lock()
+        self._slot_available = threading.Condition(self.lock)
+        self._waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
         self.global_cooling_until = 0
 
         logger.info(
             f"已初始化API密钥管理器，共{len(api_configs)}个密钥，总并发额度:{self.get_max_concurrency()}"
         )
 
-    def get_key_config(self):
-        """获取可用的API密钥配置。"""
+    def _get_pool_reservation(self) -> Tuple[int, int]:
+        """在持有锁时计算本密钥池的保留额度，返回 (批量请求让出的额度, 交互式请求可超出上限的额度)
+
+        只有交互式客户端已连接或有交互式请求等待时才保留；批量请求至少保留1个额度，
+        池容量不足以保留的部分改为允许交互式请求临时超出并发上限。
+        """
+        if _interactive_clients <= 0 and self._waiting[PRIORITY_INTERACTIVE] <= 0:
+            return 0, 0
+        reserved = max(0, int(config.KEY_SCHEDULING.get("interactive_reserved", 0) or 0))
+        held = min(reserved, self.get_max_concurrency() - 1)
+        return held, reserved - held
+
+    def _select_config(self, current_time: float, priority: str, config_id: Optional[str]):
+        """在持有锁时挑选可用的配置，返回 (配置ID, 配置, 下标) 或 None"""
+        interactive = priority == PRIORITY_INTERACTIVE
+        if not interactive and self._waiting[PRIORITY_INTERACTIVE] > 0:
+            # 交互式请求优先拿到下一个空闲额度
+            return None
+        held, overflow = self._get_pool_reservation()
+        total_usage = sum(self.key_usage.values())
+        pool_capacity = self.get_max_concurrency()
+        if not interactive and total_usage >= pool_capacity - held:
+            # 剩余额度保留给交互式请求
+            return None
+
+        available_keys = []
+        for i, api_config in enumerate(self.api_configs):
+            cfg_id = api_config.get("_config_id")
+            if config_id is not None and cfg_id != config_id:
+                continue
+            if not interactive:
+                if cfg_id in self.skipped_configs:
+                    continue
+                if api_config.get("cooling_until", 0) > current_time:
+                    continue
+
+            current_usage = self.key_usage.get(cfg_id, 0)
+            max_concurrency = api_config.get("concurrency", config.DEFAULT_KEY_CONCURRENCY)
+            if current_usage >= max_concurrency:
+                # 池容量不足以保留时，交互式请求可在池总上限之外临时多用 overflow 个额度
+                if not (interactive and overflow and total_usage < pool_capacity + overflow):
+                    continue
+
+            load_ratio = current_usage / max_concurrency if max_concurrency > 0 else 1.0
+            success_rate = self.success_rates.get(cfg_id, 0.5)
+            rotation_weight = 1.0 - (((i - self.next_key_index) % len(self.api_configs)) / len(self.api_configs))
+            score = (success_rate * 0.5) - (load_ratio * 0.3) + (rotation_weight * 0.2)
+            available_keys.append((cfg_id, score, api_config, i))
+
+        if not available_keys:
+            return None
+        selected_cfg_id, _, selected_key_config, selected_index = max(available_keys, key=lambda item: item[1])
+        return selected_cfg_id, selected_key_config, selected_index
+
+    def get_key_config(self, priority: str = PRIORITY_BATCH, config_id: Optional[str] = None):
+        """获取可用的API密钥配置。
+
+        Args:
+            priority: 请求优先级，PRIORITY_INTERACTIVE 或 PRIORITY_BATCH
+            config_id: 只使用指定的配置实例（如提示词测试选定的密钥）
+
+        Returns:
+            Optional[Dict]: 配置副本，等待超时返回None
+        """
         max_wait_attempts = 60
         wait_attempts = 0
         backoff_count = 0
+        interactive = priority == PRIORITY_INTERACTIVE
 
-        while wait_attempts < max_wait_attempts:
-            need_to_wait = True
-            selected_key_config = None
-            global_cooldown_remaining = 0.0
-
-            with self.lock:
-                current_time = time.time()
-                if self.global_cooling_until > current_time:
+        with self._slot_available:
+            self._waiting[priority] += 1
+            try:
+                while wait_attempts < max_wait_attempts:
+                    current_time = time.time()
                     global_cooldown_remaining = self.global_cooling_until - current_time
-                else:
-                    available_keys = []
-
-                    for i, api_config in enumerate(self.api_configs):
-                        cfg_id = api_config.get("_config_id")
-                        if cfg_id in self.skipped_configs:
-                            continue
-                        if api_config.get("cooling_until", 0) > current_time:
-                            continue
-
-                        current_usage = self.key_usage.get(cfg_id, 0)
-                        max_concurrency = api_config.get("concurrency", config.DEFAULT_KEY_CONCURRENCY)
-                        if current_usage >= max_concurrency:
-                            continue
-
-                        load_ratio = current_usage / max_concurrency if max_concurrency > 0 else 1.0
-                        success_rate = self.success_rates.get(cfg_id, 0.5)
-                        rotation_weight = 1.0 - (((i - self.next_key_index) % len(self.api_configs)) / len(self.api_configs))
-                        score = (success_rate * 0.5) - (load_ratio * 0.3) + (rotation_weight * 0.2)
-                        available_keys.append((cfg_id, score, api_config, i))
-
-                    if available_keys:
-                        selected_cfg_id, _, selected_key_config, selected_index = max(
-                            available_keys,
-                            key=lambda item: item[1],
-                        )
+                    if global_cooldown_remaining > 0 and not interactive:
+                        if wait_attempts == 0:
+                            logger.warning(f"所有密钥处于冷却或跳过状态，进入全局冷却，预计等待{int(global_cooldown_remaining)}秒...")
+                        self._slot_available.wait(min(5.0, global_cooldown_remaining))
+                        continue
+
+                    selected = self._select_config(current_time, priority, config_id)
+                    if selected:
+                        selected_cfg_id, selected_key_config, selected_index = selected
                         self.key_usage[selected_cfg_id] = self.key_usage.get(selected_cfg_id, 0) + 1
                         self.next_key_index = (selected_index + 1) % len(self.api_configs)
                         self._local.last_cfg_id = selected_cfg_id
-                        need_to_wait = False
-                    elif wait_attempts == 0:
-                        logger.debug("当前所有API配置都已达到并发上限或处于冷却期，等待中...")
+                        return selected_key_config.copy()
 
-            if not need_to_wait and selected_key_config:
-                return selected_key_config.copy()
-
-            if global_cooldown_remaining > 0:
-                if wait_attempts == 0:
-                    logger.warning(f"所有密钥处于冷却或跳过状态，进入全局冷却，预计等待{int(global_cooldown_remaining)}秒...")
-                time.sleep(min(5.0, global_cooldown_remaining))
-                continue
+                    if wait_attempts == 0:
+                        logger.debug("当前所有API配置都已达到并发上限或处于冷却期，等待中...")
 
-            wait_attempts += 1
-            wait_time = min(0.5 * (2 ** backoff_count), 5.0)
-            if wait_attempts % 3 == 0:
-                backoff_count += 1
-            time.sleep(wait_time)
+                    # 释放额度时会被唤醒；只有等待超时才计入重试次数
+                    # （批量请求因额度保留给交互式请求而等待时不计入，避免多出的工作线程超时放弃）
+                    wait_time = min(0.5 * (2 ** backoff_count), 5.0)
+                    reserved_wait = not interactive and self._get_pool_reservation()[0] > 0
+                    if not self._slot_available.wait(wait_time) and not reserved_wait:
+                        wait_attempts += 1
+                        if wait_attempts % 3 == 0:
+                            backoff_count += 1
+            finally:
+                self._waiting[priority] -= 1
+                if interactive:
+                    self._slot_available.notify_all()
 
         logger.warning("等待可用API密钥超时，放弃处理...")
         return None
 
+    def find_config_id(self, api_key_config: Dict) -> Optional[str]:
+        """按密钥、地址与模型找到对应的配置实例ID（配置重新加载后字典不再是同一个对象）"""
+        if not isinstance(api_key_config, dict):
+            return None
+        if api_key_config.get("_config_id") and api_key_config["_config_id"] in self.key_usage:
+            return api_key_config["_config_id"]
+        fields = ("key", "redirect_url", "model")
+        fallback = None
+        for api_config in self.api_configs:
+            if api_config.get("key") != api_key_config.get("key"):
+                continue
+            if all(api_config.get(field) == api_key_config.get(field) for field in fields):
+                return api_config.get("_config_id")
+            fallback = fallback or api_config.get("_config_id")
+        return fallback
+
     def _resolve_cfg_target(self, key) -> Tuple[Optional[str], Optional[Dict]]:
         if isinstance(key, dict):
             cfg_id = key.get("_config_id")
@@ -147,6 +235,7 @@ class APIKeyManager:
             return
         with self.lock:
             self.key_usage[cfg_id] = max(0, self.key_usage.get(cfg_id, 0) - 1)
+            self._slot_available.notify_all()
 
     def report_success(self, key) -> None:
         """报告API密钥请求成功。"""
@@ -159,7 +248,9 @@ class APIKeyManager:
             self.success_rates[cfg_id] = current_rate * 0.9 + 0.1
             self.success_counts[cfg_id] = self.success_counts.get(cfg_id, 0) + 1
             target_config["consecutive_errors"] = 0
-            self.global_cooling_until = 0
+            if self.global_cooling_until:
+                self.global_cooling_until = 0
+                self._slot_available.notify_all()
 
     def report_error(self, key) -> None:
         """报告API密钥请求失败。"""
@@ -275,4 +366,5 @@ class APIKeyManager:
                 self.success_counts[cfg_id] = 0
             for cfg_id in self.error_counts:
                 self.error_counts[cfg_id] = 0
+            self._slot_available.notify_all()
             logger.info("已重置所有API配置实例的冷却时间、错误计数和跳过标记")
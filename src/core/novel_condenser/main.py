@@ -19,9 +19,11 @@ from .key_manager import APIKeyManager
 from .file_utils import (
     read_file, is_directory_file, save_condensed_novel,
     save_directory_file, find_matching_files, get_output_file_path,
-    get_cached_content, create_cache_for_file
+    get_cached_content, create_cache_for_file, is_valid_condensed_content
 )
-from .api_service import condense_novel_gemini, condense_novel_openai, print_processing_stats
+from .cache import flush_all as flush_cache
+from .output_writer import start_output_writer, stop_output_writer, run_in_writer
+from .api_service import condense_novel_gemini, condense_novel_openai, condense_packed_chapters, print_processing_stats
 from .stats import statistics, reset_statistics, update_file_stats, finalize_statistics, print_processing_summary
 from ..utils import setup_logger
 
@@ -31,6 +33,10 @@ logger = setup_logger(__name__)
 # 全局变量（兼容层）：新路径优先通过参数/实例属性传递 output_dir。
 OUTPUT_DIR = None
 
+# 当前任务使用的密钥管理器（GUI 状态面板与交互式请求读取）
+gemini_key_manager = None
+openai_key_manager = None
+
 class NovelCondenser:
     """小说脱水处理器类，处理小说文件的脱水流程"""
     
@@ -73,7 +79,7 @@ class NovelCondenser:
 
         # 同步到模块级全局引用，确保 GUI 能读取当前任务实际使用的运行时状态
         try:
-            import src.core.novel_condenser.main as current_main_module
+            current_main_module = sys.modules[__name__]
             current_main_module.gemini_key_manager = self.gemini_key_manager
             current_main_module.openai_key_manager = self.openai_key_manager
         except Exception:
@@ -158,39 +164,46 @@ class NovelCondenser:
         statistics["total_files"] = total_files
         logger.info(f"找到 {total_files} 个文件待处理")
         
-        # 根据工作线程数选择处理模式
-        if self.workers <= 1:
-            return self._process_files_sequentially(files, total_files)
-        else:
-            return self._process_files_concurrently(files, total_files)
+        # 根据工作线程数选择处理模式（输出文件由后台写出线程落盘）
+        start_output_writer()
+        try:
+            if self.workers <= 1:
+                return self._process_files_sequentially(files, total_files)
+            else:
+                return self._process_files_concurrently(files, total_files)
+        finally:
+            # 等待剩余输出写完，再落盘缓存索引并按全局容量上限淘汰
+            stop_output_writer()
+            flush_cache()
     
     def _process_files_sequentially(self, files, total_files):
         """顺序处理文件"""
         success_count = 0
         failed_files = {}
         
-        for i, file_path in enumerate(files):
+        for unit in self._build_work_units(files):
             try:
-                status = self.process_single_file(file_path, file_index=i+1, total_files=total_files)
-                
+                statuses = self._process_unit(unit, total_files)
+            except Exception as e:
+                logger.error(f"处理文件 {unit[0][1]} 时发生错误: {str(e)}")
+                statuses = [False] * len(unit)
+            
+            for (_, file_path), status in zip(unit, statuses):
                 if status:
                     success_count += 1
                 else:
                     failed_files[file_path] = 0
-                    
-            except Exception as e:
-                logger.error(f"处理文件 {file_path} 时发生错误: {str(e)}")
-                failed_files[file_path] = 0
         
         return success_count, failed_files
     
-    def _process_files_concurrently(self, files, total_files, stop_event=None):
+    def _process_files_concurrently(self, files, total_files, stop_event=None, update_progress_func=None):
         """并发处理文件
 
         Args:
             files: 待处理文件列表
             total_files: 文件总数
             stop_event: 可选的停止事件，用于外部请求中止处理
+            update_progress_func: 可选的进度回调 (已完成数, 总数, 状态)，每完成一个文件调用一次
         """
         success_count = 0
         failed_files = {}
@@ -206,15 +219,16 @@ class NovelCondenser:
         # 停止事件（支持外部传入）
         stop_event = stop_event or threading.Event()
         
-        # 处理函数
-        def process_file(file_path, file_index):
+        # 处理函数（一个工作单元为单个文件，或启用打包时的一组连续短章节）
+        def process_unit(unit):
             nonlocal success_count, completed_count
             
             # 检查是否应该停止
             if stop_event.is_set():
                 with lock:
-                    completed_count += 1
-                    failed_files[file_path] = 0
+                    completed_count += len(unit)
+                    for _, file_path in unit:
+                        failed_files[file_path] = 0
                 return False
                 
             # 检查是否要跳过处理
@@ -226,44 +240,29 @@ class NovelCondenser:
                 )
                 if skip_condition:
                     with lock:
-                        completed_count += 1
-                        failed_files[file_path] = 0
+                        completed_count += len(unit)
+                        for _, file_path in unit:
+                            failed_files[file_path] = 0
                     return False
             
-            # 处理单个文件
-            status = self.process_single_file(file_path, file_index=file_index, total_files=total_files)
+            # 处理单个文件或打包的短章节
+            statuses = self._process_unit(unit, total_files)
             
             # 更新计数
             with lock:
-                completed_count += 1
-                if status:
-                    success_count += 1
-                else:
-                    failed_files[file_path] = 0
+                completed_count += len(unit)
+                for (_, file_path), status in zip(unit, statuses):
+                    if status:
+                        success_count += 1
+                    else:
+                        failed_files[file_path] = 0
             
             # 检查密钥状态
             self._check_key_status(all_keys_skipped, keys_skipped_lock)
                 
-            return status
+            return all(statuses)
         
-        # 计算有效并发度：不超过配置的workers，且不超过密钥能力
-        try:
-            effective_workers = int(self.workers)
-        except Exception:
-            effective_workers = 1
-        effective_workers = max(1, effective_workers)
-        try:
-            if self.api_type == "gemini" and self.gemini_key_manager:
-                effective_workers = min(effective_workers, max(1, self.gemini_key_manager.get_max_concurrency()))
-            elif self.api_type == "openai" and self.openai_key_manager:
-                effective_workers = min(effective_workers, max(1, self.openai_key_manager.get_max_concurrency()))
-            elif self.api_type == "mixed":
-                g = self.gemini_key_manager.get_max_concurrency() if self.gemini_key_manager else 0
-                o = self.openai_key_manager.get_max_concurrency() if self.openai_key_manager else 0
-                effective_workers = min(effective_workers, max(1, g + o if (g + o) > 0 else effective_workers))
-        except Exception:
-            pass
-        effective_workers = max(1, effective_workers)
+        effective_workers = self.get_effective_workers()
 
         # 使用tqdm显示进度条
         from tqdm import tqdm
@@ -273,21 +272,22 @@ class NovelCondenser:
                 with concurrent.futures.ThreadPoolExecutor(max_workers=effective_workers) as executor:
                     futures = set()
                     # 预填充任务，不超过有效并发数
-                    file_iter = ((idx + 1, path) for idx, path in enumerate(files))
+                    units = self._build_work_units(files)
+                    unit_iter = iter(units)
 
                     def submit_next_batch(num_to_submit=1):
                         submitted = 0
                         while submitted < num_to_submit and not stop_event.is_set():
                             try:
-                                file_index, file_path = next(file_iter)
+                                unit = next(unit_iter)
                             except StopIteration:
                                 break
-                            futures.add(executor.submit(process_file, file_path, file_index))
+                            futures.add(executor.submit(process_unit, unit))
                             submitted += 1
                         return submitted
 
                     # 初始提交
-                    submit_next_batch(min(effective_workers, total_files))
+                    submit_next_batch(min(effective_workers, len(units)))
 
                     # 处理完成的future并滚动提交新任务
                     while futures:
@@ -312,6 +312,8 @@ class NovelCondenser:
                             # 更新进度条
                             pbar.n = completed_count
                             pbar.refresh()
+                            if update_progress_func:
+                                update_progress_func(completed_count, total_files)
 
                             if stop_event.is_set():
                                 break
@@ -343,6 +345,26 @@ class NovelCondenser:
         
         return success_count, failed_files
     
+    def get_effective_workers(self):
+        """计算有效并发度：不超过配置的workers，且不超过密钥能力"""
+        try:
+            effective_workers = int(self.workers)
+        except Exception:
+            effective_workers = 1
+        effective_workers = max(1, effective_workers)
+        try:
+            if self.api_type == "gemini" and self.gemini_key_manager:
+                effective_workers = min(effective_workers, max(1, self.gemini_key_manager.get_max_concurrency()))
+            elif self.api_type == "openai" and self.openai_key_manager:
+                effective_workers = min(effective_workers, max(1, self.openai_key_manager.get_max_concurrency()))
+            elif self.api_type == "mixed":
+                g = self.gemini_key_manager.get_max_concurrency() if self.gemini_key_manager else 0
+                o = self.openai_key_manager.get_max_concurrency() if self.openai_key_manager else 0
+                effective_workers = min(effective_workers, max(1, g + o if (g + o) > 0 else effective_workers))
+        except Exception:
+            pass
+        return max(1, effective_workers)
+    
     def _check_key_status(self, all_keys_skipped, keys_skipped_lock):
         """检查API密钥状态"""
         # 检查Gemini API密钥状态
@@ -385,35 +407,200 @@ class NovelCondenser:
             logger.warning("混合模式下没有有效的API密钥配置")
             return "gemini"
     
+    def _build_work_units(self, files):
+        """把文件列表划分为工作单元：启用打包时连续的短章节合并为一组，其余文件各自为一组
+        
+        章节字数按文件大小估算（每字字节数取自第一个可读章节），不需要在发出第一个请求前读完整本书；
+        各章的实际内容在 condense_packed 中读取并检查。
+        
+        Returns:
+            List[List[Tuple[int, str]]]: [[(文件序号, 文件路径), ...], ...]
+        """
+        settings = config.PACKING_SETTINGS
+        if not settings.get("enabled"):
+            return [[(i + 1, file_path)] for i, file_path in enumerate(files)]
+        
+        max_chapter_chars = int(settings.get("max_chapter_chars", 4000))
+        max_pack_chars = int(settings.get("max_pack_chars", 12000))
+        max_pack_chapters = max(1, int(settings.get("max_pack_chapters", 6)))
+        bytes_per_char = self._estimate_bytes_per_char(files)
+        units = []
+        current, current_chars = [], 0
+        for i, file_path in enumerate(files):
+            try:
+                length = int(os.path.getsize(file_path) / bytes_per_char)
+            except OSError:
+                length = None
+            # 不足100字的章节按原样保存，不需要打包
+            packable = length is not None and 100 <= length <= max_chapter_chars
+            if packable and current and current_chars + length <= max_pack_chars and len(current) < max_pack_chapters:
+                current.append((i + 1, file_path))
+                current_chars += length
+                continue
+            if current:
+                units.append(current)
+                current, current_chars = [], 0
+            if packable:
+                current, current_chars = [(i + 1, file_path)], length
+            else:
+                units.append([(i + 1, file_path)])
+        if current:
+            units.append(current)
+        
+        packed = sum(1 for unit in units if len(unit) > 1)
+        if packed:
+            logger.info(f"短章节打包: {len(files)} 个文件划分为 {len(units)} 个请求单元，其中 {packed} 个为多章打包")
+        return units
+    
+    @staticmethod
+    def _estimate_bytes_per_char(files, sample_count=3):
+        """读取开头几个章节，估算文件每个字符占用的字节数（同一本书的章节编码通常一致）"""
+        total_bytes = total_chars = 0
+        for file_path in files[:sample_count * 3]:
+            try:
+                content = read_file(file_path)
+                size = os.path.getsize(file_path)
+            except Exception:
+                continue
+            if content:
+                total_bytes += size
+                total_chars += len(content)
+                sample_count -= 1
+                if sample_count <= 0:
+                    break
+        return total_bytes / total_chars if total_chars else 1.0
+    
+    def _process_unit(self, unit, total_files):
+        """处理一个工作单元，返回与其中文件对应的成功状态列表"""
+        if len(unit) == 1:
+            file_index, file_path = unit[0]
+            return [self.process_single_file(file_path, file_index=file_index, total_files=total_files)]
+        return [success for success, _ in self.condense_packed(unit, total_files)]
+    
+    def condense_packed(self, unit, total_files=None, output_dir=None) -> List[Tuple[bool, Optional[str]]]:
+        """把一组连续的短章节打包为一个请求脱水
+        
+        各章先按单文件流程检查（已有结果、缓存、目录页、短内容），其余章节合并为一个请求，
+        按分隔标记拆回各章后分别保存、缓存与统计；只剩一章、请求失败或响应无法拆分时改为逐章处理。
+        
+        Args:
+            unit: [(文件序号, 文件路径), ...]
+            total_files: 文件总数（用于日志）
+            output_dir: 输出目录，默认为 self.output_dir
+        
+        Returns:
+            List[Tuple[bool, Optional[str]]]: 与 unit 对应的 (是否成功, 脱水后的内容)
+        """
+        output_dir = output_dir or self.output_dir
+        results = [None] * len(unit)
+        pending = []
+        
+        for pos, (file_index, file_path) in enumerate(unit):
+            start_time = time.time()
+            output_file = get_output_file_path(file_path, output_dir=output_dir)
+            if self._should_skip_file(file_path, output_file, start_time, 0):
+                try:
+                    results[pos] = (True, read_file(output_file))
+                except Exception:
+                    results[pos] = (True, None)
+                continue
+            try:
+                content = read_file(file_path)
+            except Exception:
+                # 读取失败与空文件交给单文件流程记录
+                continue
+            if not content:
+                continue
+            status, result = self._handle_special_cases(file_path, content, start_time, 0, output_dir)
+            if status:
+                results[pos] = (True, result)
+                continue
+            pending.append((pos, file_index, file_path, content, start_time))
+        
+        if len(pending) > 1:
+            api_type = self._select_api_type(pending[0][1]) if self.api_type == "mixed" else self.api_type
+            key_manager = self.gemini_key_manager if api_type == "gemini" else self.openai_key_manager
+            first_index, last_index = pending[0][1], pending[-1][1]
+            progress = f" [{first_index}-{last_index}/{total_files}]" if total_files is not None else ""
+            logger.info(f"\n打包处理{progress}: {len(pending)} 个短章节合并为一个请求 "
+                        f"({sum(len(item[3]) for item in pending)}字)")
+            
+            sections = condense_packed_chapters(api_type, [item[3] for item in pending], None, key_manager)
+            if sections is None:
+                logger.warning(f"打包请求未能拆分出各章结果，改为逐章请求: {len(pending)} 个章节")
+            else:
+                for (pos, file_index, file_path, content, start_time), result in zip(pending, sections):
+                    self._save_result(file_path, content, result, start_time, 0, output_dir)
+                    results[pos] = (True, result)
+        
+        # 单独剩下的章节、读取失败或打包失败的章节按单文件流程处理
+        for pos, (file_index, file_path) in enumerate(unit):
+            if results[pos] is None:
+                results[pos] = self.condense_file(file_path, file_index, total_files, output_dir=output_dir)
+        return results
+    
+    def _save_result(self, file_path, content, result, start_time, retry_attempt, output_dir):
+        """保存脱水后的内容、创建缓存并更新统计信息"""
+        save_condensed_novel(file_path, result, output_dir=output_dir)
+        run_in_writer(create_cache_for_file, content, result, file_path, output_dir=output_dir)
+        
+        condensation_ratio = (len(result) / len(content)) * 100 if len(content) > 0 else 0
+        self._update_stats(
+            file_path, 
+            "success", 
+            start_time, 
+            retry_attempt,
+            original_length=len(content),
+            condensed_length=len(result),
+            condensation_ratio=condensation_ratio
+        )
+    
     def process_single_file(self, file_path, file_index=None, total_files=None, retry_attempt=0):
         """处理单个文件"""
+        return self.condense_file(file_path, file_index, total_files, retry_attempt)[0]
+    
+    def condense_file(self, file_path, file_index=None, total_files=None, retry_attempt=0,
+                      output_dir=None) -> Tuple[bool, Optional[str]]:
+        """处理单个文件并返回脱水后的内容
+        
+        Args:
+            output_dir: 本文件的输出目录，默认为 self.output_dir（多本书共用一个处理器时按书指定）
+        
+        Returns:
+            Tuple[bool, Optional[str]]: (是否成功, 脱水后的内容)；失败时内容为None
+        """
         # 获取开始时间和文件名
         start_time = time.time()
         base_name = os.path.basename(file_path)
-        output_file = get_output_file_path(file_path, output_dir=self.output_dir)
+        output_dir = output_dir or self.output_dir
+        output_file = get_output_file_path(file_path, output_dir=output_dir)
         
         # 显示处理信息
         self._log_process_info(file_path, file_index, total_files, retry_attempt)
         
         # 1. 检查是否需要处理（已存在有效输出文件）
         if self._should_skip_file(file_path, output_file, start_time, retry_attempt):
-            return True
+            try:
+                return True, read_file(output_file)
+            except Exception as e:
+                logger.warning(f"读取已处理文件失败: {output_file}, 错误: {str(e)}")
+                return True, None
         
         # 2. 读取文件内容
         try:
             content = read_file(file_path)
         except Exception as e:
             logger.error(f"无法读取文件内容: {file_path}, 错误: {str(e)}")
-            return self._update_stats(file_path, "error", start_time, retry_attempt, error=str(e))
+            return self._update_stats(file_path, "error", start_time, retry_attempt, error=str(e)), None
         
         if not content:
             logger.warning(f"文件内容为空: {file_path}")
-            return self._update_stats(file_path, "empty", start_time, retry_attempt)
+            return self._update_stats(file_path, "empty", start_time, retry_attempt), None
         
         # 3. 处理特殊情况（缓存、目录文件、短内容）
-        status, result = self._handle_special_cases(file_path, content, start_time, retry_attempt)
+        status, result = self._handle_special_cases(file_path, content, start_time, retry_attempt, output_dir)
         if status:
-            return True
+            return True, result
         
         # 4. 使用API处理内容
         # 选择API类型
@@ -441,41 +628,28 @@ class NovelCondenser:
         
         # 5. 处理结果
         if success and result:
-            # 保存脱水后的内容并创建缓存
-            save_condensed_novel(file_path, result, output_dir=self.output_dir)
-            create_cache_for_file(content, result, file_path, output_dir=self.output_dir)
-            
-            # 更新统计信息
-            condensation_ratio = (len(result) / len(content)) * 100 if len(content) > 0 else 0
-            self._update_stats(
-                file_path, 
-                "success", 
-                start_time, 
-                retry_attempt,
-                original_length=len(content),
-                condensed_length=len(result),
-                condensation_ratio=condensation_ratio
-            )
+            # 保存脱水后的内容、创建缓存并更新统计信息
+            self._save_result(file_path, content, result, start_time, retry_attempt, output_dir)
             
             # 输出完成信息
             if file_index is not None and total_files is not None:
                 logger.info(f"[{file_index}/{total_files}] 处理完成")
             
-            return True
+            return True, result
         else:
             # 处理失败，保存错误信息
             error_msg = f"# 脱水处理失败\n\n原因: API处理失败\n\n时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n请重试或联系管理员。"
             logger.error(f"处理失败: {base_name}")
             
             try:
-                save_condensed_novel(file_path, error_msg, output_dir=self.output_dir)
+                save_condensed_novel(file_path, error_msg, output_dir=output_dir)
             except:
                 pass
             
             # 更新统计信息
             self._update_stats(file_path, "failed", start_time, retry_attempt)
             
-            return False
+            return False, None
     
     def _log_process_info(self, file_path, file_index, total_files, retry_attempt):
         """记录处理信息"""
@@ -497,7 +671,7 @@ class NovelCondenser:
                     existing_content = f.read()
                 
                 # 检查文件是否过小或包含错误信息
-                if len(existing_content) < 300 or "错误" in existing_content[:100] or "失败" in existing_content[:100]:
+                if not is_valid_condensed_content(existing_content):
                     reason = "小于300个字符" if len(existing_content) < 300 else "包含错误信息"
                     logger.info(f"已存在的脱水文件 {base_name} {reason}，将重新脱水")
                     try:
@@ -518,16 +692,17 @@ class NovelCondenser:
         
         return False
     
-    def _handle_special_cases(self, file_path, content, start_time, retry_attempt):
+    def _handle_special_cases(self, file_path, content, start_time, retry_attempt, output_dir=None):
         """处理特殊情况：缓存、目录文件和短内容"""
         base_name = os.path.basename(file_path)
+        output_dir = output_dir or self.output_dir
         
         # 尝试使用缓存
         if not self.force_regenerate:
-            cached_content = get_cached_content(file_path, output_dir=self.output_dir)
+            cached_content = get_cached_content(file_path, output_dir=output_dir)
             if cached_content:
                 logger.info(f"使用缓存的处理结果: {base_name}")
-                save_condensed_novel(file_path, cached_content, output_dir=self.output_dir)
+                save_condensed_novel(file_path, cached_content, output_dir=output_dir)
                 self._update_stats(
                     file_path, "success-cached", start_time, retry_attempt,
                     original_length=len(content), condensed_length=len(cached_content)
@@ -537,14 +712,14 @@ class NovelCondenser:
         # 检查是否是目录文件
         if is_directory_file(content):
             logger.info(f"检测到目录文件，直接保存: {base_name}")
-            save_directory_file(file_path, output_dir=self.output_dir)
+            save_directory_file(file_path, output_dir=output_dir)
             self._update_stats(file_path, "success-directory", start_time, retry_attempt)
             return True, content
         
         # 检查内容是否需要处理（太短的内容不处理）
         if len(content) < 100:
             logger.info(f"内容太短，不需要脱水: {base_name}")
-            save_condensed_novel(file_path, content, output_dir=self.output_dir)
+            save_condensed_novel(file_path, content, output_dir=output_dir)
             self._update_stats(file_path, "success-short", start_time, retry_attempt)
             return True, content
         
@@ -616,6 +791,9 @@ def parse_and_find_files():
     parser.add_argument("--test", help="测试模式，只处理前5个文件", action="store_true")
     parser.add_argument("--parse-dir", help="解析指定目录中的所有txt文件", action="store_true")
     parser.add_argument("--debug", help="启用调试日志", action="store_true")
+    parser.add_argument("--global-cache", help="启用跨输出目录共享的全局内容寻址缓存", action="store_true")
+    parser.add_argument("--pack-short", help="把连续的短章节打包为一个请求（见 packing 配置）", action="store_true")
+    parser.add_argument("--batch-api", help="通过供应商的异步批处理接口提交（离线批量脱水，需指定gemini或openai）", action="store_true")
     
     args = parser.parse_args()
     
@@ -726,6 +904,10 @@ def main():
         logger.setLevel(logging.DEBUG)
         logger.debug("已启用调试日志")
     
+    if args.batch_api and args.api == "mixed":
+        logger.error("批处理接口模式不支持混合API，请指定 --api gemini 或 --api openai")
+        return 1
+    
     # 初始化处理器
     condenser = NovelCondenser(
         api_type=args.api, 
@@ -733,6 +915,14 @@ def main():
         force_regenerate=args.force
     )
     
+    # 启用全局缓存（在加载配置文件之后设置，命令行优先）
+    if args.global_cache:
+        config.CACHE_SETTINGS["global_cache"] = True
+        logger.info("已启用全局内容寻址缓存")
+    if args.pack_short:
+        config.PACKING_SETTINGS["enabled"] = True
+        logger.info("已启用短章节打包")
+    
     # 验证API密钥
     if not condenser.validate_api_keys():
         logger.error("API密钥验证失败，程序退出")
@@ -753,7 +943,12 @@ def main():
         return 1
     
     # 处理文件
-    success_count, failed_files = condenser.process_files(files_to_process)
+    if args.batch_api:
+        from .batch_api import run_batch_condense
+        success_count, failed = run_batch_condense(files_to_process, output_dir=output_dir, condenser=condenser)
+        failed_files = {file_path: 0 for file_path in failed}
+    else:
+        success_count, failed_files = condenser.process_files(files_to_process)
     
     # 打印处理结果摘要
     total_files = len(files_to_process)
@@ -848,14 +1043,18 @@ def process_files_concurrently(
         pass
 
     # 调用实例方法处理文件
+    start_output_writer()
     try:
-        return condenser._process_files_concurrently(file_paths, total_files, stop_event=stop_event)
+        return condenser._process_files_concurrently(file_paths, total_files, stop_event=stop_event,
+                                                     update_progress_func=update_progress_func)
     finally:
         # 清理挂载的事件，避免影响后续调用
         try:
             delattr(process_files_concurrently, 'progress_stopped')
         except Exception:
             pass
+        stop_output_writer()
+        flush_cache()
 
 if __name__ == "__main__":
     main() 
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+输出写入模块 - 由独立线程负责脱水结果的落盘
+
+- API线程只把待写内容放入有界队列，由后台线程写出，不再等待磁盘
+- 每个文件先写入同目录的临时文件再原子重命名，进程崩溃时不会留下被截断的章节
+- 同一次运行中每个输出目录只创建一次
+- 支持 none / batch / always 三种 fsync 策略（见 config.OUTPUT_SETTINGS）
+"""
+
+import os
+import queue
+import threading
+from typing import Callable, List, Optional, Set
+
+from . import config
+from ..utils import setup_logger
+
+# 设置日志记录器
+logger = setup_logger(__name__)
+
+FSYNC_POLICIES = ("none", "batch", "always")
+TEMP_FILE_SUFFIX = ".part"   # 临时文件后缀，不会被 .txt 文件扫描误认
+
+_known_dirs: Set[str] = set()
+_known_dirs_lock = threading.Lock()
+
+
+def ensure_output_dir(directory: str) -> bool:
+    """确保输出目录存在，同一目录在一次运行中只检查/创建一次
+
+    Args:
+        directory: 目录路径
+
+    Returns:
+        bool: 目录是否可用
+    """
+    key = os.path.abspath(directory)
+    if key in _known_dirs:
+        return True
+    with _known_dirs_lock:
+        if key in _known_dirs:
+            return True
+        try:
+            os.makedirs(key, exist_ok=True)
+        except Exception as e:
+            logger.error(f"创建输出目录失败: {e}")
+            return False
+        _known_dirs.add(key)
+        return True
+
+
+def _forget_output_dir(directory: str) -> None:
+    with _known_dirs_lock:
+        _known_dirs.discard(os.path.abspath(directory))
+
+
+def _fsync_directory(directory: str) -> None:
+    """将目录项（重命名结果）落盘；Windows 不支持对目录 fsync，直接跳过"""
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"目录落盘失败: {directory} ({e})")
+
+
+def write_file_atomic(path: str, content: str, fsync: bool = False) -> None:
+    """以临时文件+重命名的方式写入文本文件
+
+    Args:
+        path: 目标文件路径
+        content: 文件内容
+        fsync: 是否在重命名前将文件内容落盘
+
+    Raises:
+        OSError: 写入失败
+    """
+    directory = os.path.dirname(path) or "."
+    if not ensure_output_dir(directory):
+        raise OSError(f"输出目录不可用: {directory}")
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{TEMP_FILE_SUFFIX}"
+    try:
+        try:
+            f = open(tmp_path, "w", encoding="utf-8")
+        except FileNotFoundError:
+            # 目录在运行期间被删除，重新创建后再试一次
+            _forget_output_dir(directory)
+            if not ensure_output_dir(directory):
+                raise
+            f = open(tmp_path, "w", encoding="utf-8")
+        with f:
+            f.write(content)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class OutputWriter:
+    """后台写出线程：有界队列 + 原子提交"""
+
+    def __init__(self, queue_size: int = 64, fsync_policy: str = "none"):
+        self.fsync_policy = fsync_policy if fsync_policy in FSYNC_POLICIES else "none"
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size or 1)))
+        self._thread: Optional[threading.Thread] = None
+        self._written: List[str] = []   # batch 策略下等待统一落盘的文件
+        self.failed: List[str] = []
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """启动写出线程"""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="OutputWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, path: str, content: str, label: str = "脱水后的小说") -> None:
+        """提交一个写文件任务；队列满时等待，写出线程未运行时直接同步写入"""
+        if not self.running:
+            self._write(path, content, label)
+            return
+        self._queue.put(("write", path, content, label))
+
+    def submit_call(self, func: Callable, *args, **kwargs) -> None:
+        """提交一个需要在写出线程中执行的任务（如写缓存），保持与文件写入相同的顺序"""
+        if not self.running:
+            self._call(func, args, kwargs)
+            return
+        self._queue.put(("call", func, args, kwargs))
+
+    def flush(self) -> None:
+        """等待队列中已提交的任务全部完成，batch 策略下统一落盘"""
+        if self.running:
+            self._queue.join()
+        if self.fsync_policy == "batch":
+            self._sync_written()
+
+    def close(self) -> None:
+        """写完剩余任务并停止线程"""
+        if self.running:
+            self._queue.join()
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+        if self.fsync_policy == "batch":
+            self._sync_written()
+        if self.failed:
+            logger.error(f"有 {len(self.failed)} 个文件写入失败")
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if item[0] == "write":
+                    self._write(*item[1:])
+                else:
+                    self._call(*item[1:])
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path: str, content: str, label: str) -> bool:
+        try:
+            write_file_atomic(path, content, fsync=self.fsync_policy == "always")
+            if self.fsync_policy == "always":
+                _fsync_directory(os.path.dirname(path) or ".")
+            elif self.fsync_policy == "batch":
+                self._written.append(path)
+            logger.info(f"{label}文件已保存到: {path}")
+            return True
+        except Exception as e:
+            logger.error(f"保存文件时出错: {path} ({e})")
+            self.failed.append(path)
+            return False
+
+    @staticmethod
+    def _call(func: Callable, args, kwargs) -> None:
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"后台写出任务执行失败: {e}")
+
+    def _sync_written(self) -> None:
+        written, self._written = self._written, []
+        directories = set()
+        for path in written:
+            try:
+                with open(path, "rb") as f:
+                    os.fsync(f.fileno())
+            except OSError as e:
+                logger.debug(f"文件落盘失败: {path} ({e})")
+            directories.add(os.path.dirname(path) or ".")
+        for directory in directories:
+            _fsync_directory(directory)
+
+
+# =========================================================
+# 当前运行的写出线程
+# =========================================================
+
+_active_writer: Optional[OutputWriter] = None
+_active_users = 0
+_active_lock = threading.Lock()
+
+
+def start_output_writer() -> Optional[OutputWriter]:
+    """为一次处理任务启动（或复用）后台写出线程，需与 stop_output_writer 成对调用
+
+    Returns:
+        Optional[OutputWriter]: 当前写出线程；配置关闭异步写出时返回None
+    """
+    global _active_writer, _active_users
+    settings = config.OUTPUT_SETTINGS
+    with _active_lock:
+        if _active_users == 0:
+            # 新的一次运行：重新确认输出目录
+            with _known_dirs_lock:
+                _known_dirs.clear()
+        _active_users += 1
+        if _active_writer is None and settings.get("async_writer", True):
+            _active_writer = OutputWriter(settings.get("queue_size", 64), settings.get("fsync", "none"))
+            _active_writer.start()
+        return _active_writer
+
+
+def stop_output_writer() -> None:
+    """结束一次处理任务；最后一个使用者退出时写完剩余内容并停止线程"""
+    global _active_writer, _active_users
+    with _active_lock:
+        _active_users = max(0, _active_users - 1)
+        if _active_users > 0 or _active_writer is None:
+            return
+        writer, _active_writer = _active_writer, None
+    writer.close()
+
+
+def write_output(path: str, content: str, label: str = "脱水后的小说") -> bool:
+    """写出一个输出文件：有后台写出线程时异步提交，否则同步原子写入
+
+    Returns:
+        bool: 同步写入是否成功；异步提交时总是返回True
+    """
+    writer = _active_writer
+    if writer is not None:
+        writer.submit(path, content, label)
+        return True
+    return OutputWriter(fsync_policy=config.OUTPUT_SETTINGS.get("fsync", "none"))._write(path, content, label)
+
+
+def run_in_writer(func: Callable, *args, **kwargs) -> None:
+    """在后台写出线程中执行任务；没有写出线程时直接执行"""
+    writer = _active_writer
+    if writer is not None:
+        writer.submit_call(func, *args, **kwargs)
+        return
+    OutputWriter._call(func, args, kwargs)
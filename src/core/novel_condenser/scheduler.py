@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多书公平调度 - 一次运行中按权重/优先级交替处理多本书的章节
+
+以往排队的几本书只能逐本运行，每次运行独占全部密钥额度，大部头会让急需的短书一直等待。
+这里多本书共用一个 NovelCondenser（同一组 APIKeyManager 与并发额度），
+每当有脱水线程空闲时，由调度器决定下一章来自哪本书：
+
+- 优先级高的书先处理，同一优先级内按亏空轮转（Deficit Round Robin）分配
+- 每轮每本书的额度为 quantum × 权重，章节按文件大小计费，权重为 2 的书获得约两倍的吞吐
+- 运行中可以继续加入新书，急需的书可以用更高的优先级插队
+- 每本书有独立的进度回调与完成事件
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .main import NovelCondenser
+from .cache import flush_all as flush_cache
+from .output_writer import start_output_writer, stop_output_writer
+from .stats import print_processing_summary
+from ..utils import setup_logger
+
+# 设置日志记录器
+logger = setup_logger(__name__)
+
+DEFAULT_QUANTUM = 16 * 1024        # 每轮每单位权重的额度（字节）
+
+
+class BookJob:
+    """调度中的一本书"""
+
+    def __init__(
+        self,
+        name: str,
+        files: List[str],
+        output_dir: str,
+        weight: float = 1.0,
+        priority: int = 0,
+        update_progress_func: Optional[Callable] = None,
+        on_complete: Optional[Callable[["BookJob"], None]] = None,
+    ):
+        """
+        Args:
+            name: 书名（用于日志）
+            files: 章节文件列表（按处理顺序）
+            output_dir: 脱水结果输出目录
+            weight: 同一优先级内的吞吐权重
+            priority: 优先级，数值越大越先处理
+            update_progress_func: 可选的进度回调 (已完成章节数, 章节总数, 状态)
+            on_complete: 可选的完成回调，参数为本对象
+        """
+        if weight <= 0:
+            raise ValueError(f"权重必须大于0: {weight}")
+        self.name = name
+        self.files = list(files)
+        self.output_dir = output_dir
+        self.weight = weight
+        self.priority = priority
+        self.update_progress_func = update_progress_func
+        self.on_complete = on_complete
+        self.total = len(self.files)
+        self.next_index = 0            # 下一个待分发的章节
+        self.deficit = 0.0
+        self.completed = 0
+        self.succeeded = 0
+        self.failed: List[str] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    @property
+    def has_pending(self) -> bool:
+        return self.next_index < self.total
+
+    def next_cost(self) -> int:
+        """下一章的费用（文件大小，至少为1）"""
+        try:
+            return max(1, os.path.getsize(self.files[self.next_index]))
+        except OSError:
+            return 1
+
+
+class FairShareScheduler:
+    """按优先级 + 亏空轮转选择下一章（线程安全）"""
+
+    def __init__(self, quantum: int = DEFAULT_QUANTUM):
+        self.quantum = quantum
+        self.books: List[BookJob] = []
+        self._queues: Dict[int, deque] = {}     # 优先级 -> 有待分发章节的书
+        self._fresh: Dict[int, bool] = {}       # 队首的书是否刚轮到（需要补充额度）
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def add_book(self, book: BookJob) -> None:
+        """加入一本书（运行中也可以加入）"""
+        with self._condition:
+            self.books.append(book)
+            if book.has_pending:
+                queue = self._queues.setdefault(book.priority, deque())
+                if not queue:
+                    self._fresh[book.priority] = True
+                queue.append(book)
+            else:
+                self._finish_book(book)
+            self._condition.notify_all()
+        logger.info(f"加入书籍《{book.name}》: {book.total} 章，权重 {book.weight}，优先级 {book.priority}")
+
+    def close(self) -> None:
+        """不再加入新书；全部章节处理完后 run 返回"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _pick(self) -> Optional[Tuple[BookJob, int]]:
+        """在持有锁时选择下一章：最高优先级的队列中做亏空轮转"""
+        for priority in sorted(self._queues, reverse=True):
+            queue = self._queues[priority]
+            while queue:
+                book = queue[0]
+                if not book.has_pending:
+                    queue.popleft()
+                    book.deficit = 0.0
+                    self._fresh[priority] = True
+                    continue
+                if self._fresh[priority]:
+                    book.deficit += self.quantum * book.weight
+                    self._fresh[priority] = False
+                cost = book.next_cost()
+                if book.deficit >= cost:
+                    book.deficit -= cost
+                    index = book.next_index
+                    book.next_index += 1
+                    if book.started_at is None:
+                        book.started_at = time.time()
+                    return book, index
+                # 额度不足，轮到下一本书（本书的亏空保留到下一轮）
+                queue.rotate(-1)
+                self._fresh[priority] = True
+        return None
+
+    def next_chapter(self, stop_event: threading.Event) -> Optional[Tuple[BookJob, int]]:
+        """取下一章；暂时没有章节时等待新书加入，全部结束或停止时返回None"""
+        with self._condition:
+            while not stop_event.is_set():
+                picked = self._pick()
+                if picked is not None:
+                    return picked
+                if self._closed:
+                    return None
+                self._condition.wait(0.5)
+        return None
+
+    def _finish_book(self, book: BookJob) -> None:
+        book.finished_at = time.time()
+        book.done.set()
+        self._condition.notify_all()
+
+    def chapter_done(self, book: BookJob, index: int, success: bool) -> None:
+        """记录一章的结果，并在整本书完成时触发完成事件"""
+        with self._condition:
+            book.completed += 1
+            if success:
+                book.succeeded += 1
+            else:
+                book.failed.append(book.files[index])
+            finished = book.completed >= book.total
+            if finished:
+                self._finish_book(book)
+        if book.update_progress_func:
+            book.update_progress_func(book.completed, book.total, os.path.basename(book.files[index]))
+        if finished:
+            elapsed = book.finished_at - (book.started_at or book.finished_at)
+            logger.info(f"书籍《{book.name}》完成: 成功 {book.succeeded}/{book.total} 章，"
+                        f"失败 {len(book.failed)} 章，用时 {elapsed:.1f} 秒")
+            if book.on_complete:
+                book.on_complete(book)
+
+    def skip_remaining(self) -> None:
+        """把所有未分发的章节记为失败（停止或密钥全部不可用时）"""
+        with self._condition:
+            pending = [(book, index) for book in self.books for index in range(book.next_index, book.total)]
+            for book in self.books:
+                book.next_index = book.total
+        for book, index in pending:
+            self.chapter_done(book, index, False)
+
+    def run(
+        self,
+        condenser: NovelCondenser,
+        stop_event: Optional[threading.Event] = None,
+        update_progress_func: Optional[Callable] = None,
+    ) -> List[BookJob]:
+        """
+        用一个 NovelCondenser 的并发额度处理所有书籍，直到 close() 之后全部完成
+
+        Args:
+            condenser: 共用的脱水处理器（workers 为总并发数）
+            stop_event: 可选的停止事件
+            update_progress_func: 可选的总体进度回调 (已完成章节数, 章节总数, 状态)
+
+        Returns:
+            List[BookJob]: 所有书籍（含各自的成功/失败统计）
+        """
+        stop_event = stop_event or threading.Event()
+        workers = condenser.get_effective_workers()
+        all_keys_skipped = {"gemini": False, "openai": False}
+        keys_skipped_lock = threading.Lock()
+        progress_lock = threading.Lock()
+
+        def keys_exhausted():
+            with keys_skipped_lock:
+                if condenser.api_type == "mixed":
+                    return all_keys_skipped["gemini"] and all_keys_skipped["openai"]
+                return all_keys_skipped.get(condenser.api_type, False)
+
+        def report(book, index):
+            if update_progress_func:
+                with progress_lock:
+                    update_progress_func(sum(b.completed for b in self.books), sum(b.total for b in self.books),
+                                         f"{book.name}: {os.path.basename(book.files[index])}")
+
+        def work():
+            while True:
+                picked = self.next_chapter(stop_event)
+                if picked is None:
+                    return
+                book, index = picked
+                success = False
+                if not keys_exhausted():
+                    try:
+                        success, _ = condenser.condense_file(book.files[index], index + 1, book.total,
+                                                             output_dir=book.output_dir)
+                    except Exception as e:
+                        logger.error(f"处理《{book.name}》的文件 {book.files[index]} 时出错: {e}")
+                    condenser._check_key_status(all_keys_skipped, keys_skipped_lock)
+                self.chapter_done(book, index, success)
+                report(book, index)
+                if keys_exhausted():
+                    logger.error("所有API密钥都已被跳过，停止分发剩余章节")
+                    stop_event.set()
+
+        logger.info(f"多书调度: 并发 {workers}，每轮额度 {self.quantum} 字节/单位权重")
+        threads = [threading.Thread(target=work, name=f"fair-share-{i + 1}", daemon=True) for i in range(workers)]
+        start_output_writer()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            logger.warning("用户中断处理")
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            if stop_event.is_set():
+                self.skip_remaining()
+            stop_output_writer()
+            flush_cache()
+        return self.books
+
+
+def find_book_files(folder: str) -> List[str]:
+    """列出目录下的章节TXT文件（按文件名排序）"""
+    return sorted(str(p) for p in Path(folder).glob("*.txt"))
+
+
+def _parse_number_list(value: Optional[str], count: int, cast: Callable, default) -> List:
+    if not value:
+        return [default] * count
+    items = [cast(item) for item in value.split(",")]
+    if len(items) != count:
+        raise ValueError(f"需要 {count} 个值，实际为 {len(items)} 个: {value}")
+    return items
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="多书公平调度：多本书共用一组API密钥，按权重/优先级交替处理章节")
+    parser.add_argument("folders", nargs="+", help="各本书的章节TXT目录")
+    parser.add_argument("--api", choices=["gemini", "openai", "mixed"], default="gemini", help="使用的API类型")
+    parser.add_argument("--workers", type=int, default=None, help="总并发数 (默认: API配置的并发额度)")
+    parser.add_argument("--weights", default=None, help="各本书的权重，逗号分隔，如 1,3,1 (默认: 均为1)")
+    parser.add_argument("--priorities", default=None, help="各本书的优先级，逗号分隔，数值越大越先处理 (默认: 均为0)")
+    parser.add_argument("--quantum", type=int, default=DEFAULT_QUANTUM,
+                        help=f"每轮每单位权重的额度（字节）(默认: {DEFAULT_QUANTUM})")
+    parser.add_argument("--force", action="store_true", help="强制重新生成，忽略已有结果与缓存")
+    parser.add_argument("--debug", action="store_true", help="显示调试信息")
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    try:
+        weights = _parse_number_list(args.weights, len(args.folders), float, 1.0)
+        priorities = _parse_number_list(args.priorities, len(args.folders), int, 0)
+    except ValueError as e:
+        logger.error(f"参数错误: {e}")
+        return 1
+
+    condenser = NovelCondenser(api_type=args.api, force_regenerate=args.force)
+    if not condenser.validate_api_keys():
+        logger.error("API密钥验证失败，请检查配置")
+        return 1
+    key_managers = (condenser.gemini_key_manager, condenser.openai_key_manager)
+    condenser.workers = args.workers or sum(km.get_max_concurrency() for km in key_managers if km) or 1
+
+    scheduler = FairShareScheduler(args.quantum)
+    for folder, weight, priority in zip(args.folders, weights, priorities):
+        files = find_book_files(folder)
+        if not files:
+            logger.warning(f"在 {folder} 中没有找到TXT文件，跳过")
+            continue
+        dir_name = os.path.basename(folder.rstrip("/\\"))
+        scheduler.add_book(BookJob(dir_name, files, os.path.join(folder, f"{dir_name}_脱水"), weight, priority))
+    scheduler.close()
+
+    books = scheduler.run(condenser)
+    print_processing_summary()
+    for book in books:
+        logger.info(f"《{book.name}》: 成功 {book.succeeded}/{book.total} 章 -> {book.output_dir}")
+    return 0 if books and all(not book.failed for book in books) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
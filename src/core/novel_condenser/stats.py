@@ -4,6 +4,7 @@
 统计模块 - 记录和展示脱水处理的统计信息
 """
 
+import threading
 import time
 from typing import Dict, List, Optional
 
@@ -29,6 +30,9 @@ class ProcessingStatistics:
             "condensation_ratios": [],     # 压缩比例列表
             "total_characters_original": 0,  # 原始总字符数
             "total_characters_condensed": 0, # 压缩后总字符数
+            "usage_requests": 0,           # 返回了用量信息的请求数
+            "prompt_tokens": 0,            # 输入token总数
+            "cached_prompt_tokens": 0,     # 命中供应商提示词缓存的输入token数
         }
 
     def reset(self) -> None:
@@ -43,6 +47,9 @@ class ProcessingStatistics:
         self.data["condensation_ratios"] = []
         self.data["total_characters_original"] = 0
         self.data["total_characters_condensed"] = 0
+        self.data["usage_requests"] = 0
+        self.data["prompt_tokens"] = 0
+        self.data["cached_prompt_tokens"] = 0
 
 
 _STATS = ProcessingStatistics()
@@ -50,10 +57,24 @@ _STATS = ProcessingStatistics()
 # 兼容层：保留原变量名，且引用在进程生命周期内保持稳定
 statistics = _STATS.data
 
+_usage_lock = threading.Lock()
+
 def reset_statistics():
     """重置统计数据"""
     _STATS.reset()
 
+def record_token_usage(prompt_tokens: int, cached_prompt_tokens: int = 0) -> None:
+    """记录一次API请求的输入token用量（可在多个请求线程中调用）
+    
+    Args:
+        prompt_tokens: 输入token数
+        cached_prompt_tokens: 其中命中提示词缓存的token数
+    """
+    with _usage_lock:
+        statistics["usage_requests"] += 1
+        statistics["prompt_tokens"] += prompt_tokens
+        statistics["cached_prompt_tokens"] += cached_prompt_tokens
+
 def update_file_stats(file_path: str, status: str, processing_time: float, 
                     is_first_attempt: bool = True, **kwargs):
     """更新文件处理统计信息
@@ -173,6 +194,15 @@ def print_processing_summary(failed_files: Optional[Dict[str, int]] = None) -> N
         logger.info(f"  - 脱水后总字符: {cond_chars:,} 字符")
         logger.info(f"  - 整体压缩比: {total_ratio:.1f}%")
     
+    # 提示词缓存统计
+    if statistics["prompt_tokens"] > 0:
+        prompt_tokens = statistics["prompt_tokens"]
+        cached_tokens = statistics["cached_prompt_tokens"]
+        logger.info("\n提示词缓存统计:")
+        logger.info(f"  - 请求数（含用量信息）: {statistics['usage_requests']}")
+        logger.info(f"  - 输入token: {prompt_tokens:,}")
+        logger.info(f"  - 命中缓存的输入token: {cached_tokens:,} ({cached_tokens / prompt_tokens * 100:.1f}%)")
+    
     # 性能统计
     if statistics["file_stats"]:
         try:
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EPUB一键脱水流水线 - EPUB -> 脱水 -> EPUB，三个阶段同时进行
+
+以往需要分三次运行：先把整本EPUB分割为TXT，再整体脱水，最后整体合并。
+这里用有界队列把三个阶段串起来：
+
+    读取线程 --章节队列--> 脱水线程 x N --结果队列--> 写出（按章节顺序）
+
+- 读取线程用流式读取器逐章提取正文，第一章提取出来后即可发出API请求
+- 脱水线程复用 NovelCondenser 的单文件流程（缓存、目录页、短章节、重试、统计）
+- 写出端按章节顺序把结果写入流式EPUB，先完成的章节在内存中等待前面的章节
+- 同时在途（已读取但尚未写出）的章节数有上限，读取线程会等待写出端，
+  即使某一章迟迟没有返回，内存占用也不会随书籍大小增长
+
+脱水流程以文件为单位，章节会写成 书名_[序号]_标题.txt 交给脱水器；
+默认写在临时目录并在结束后删除，指定 txt_dir 时保留原文与脱水结果，
+再次运行时已脱水的章节会被直接复用。
+"""
+
+import os
+import queue
+import shutil
+import tempfile
+import argparse
+import logging
+import threading
+from pathlib import Path
+
+from .utils import setup_logger, get_safe_filename
+from .epub_splitter import open_epub_documents, iter_chapters, generate_output_filename, write_chapters_to_file
+from .txt_to_epub import StreamingEpubWriter, render_chapter, add_cover_page, add_toc_page
+from .novel_condenser.main import NovelCondenser
+from .novel_condenser.output_writer import start_output_writer, stop_output_writer
+from .novel_condenser.cache import flush_all as flush_cache
+from .novel_condenser.stats import print_processing_summary
+
+# 设置日志记录器
+logger = setup_logger(__name__)
+
+QUEUE_SIZE_PER_WORKER = 2          # 章节队列长度（每个脱水线程）
+_DONE = object()                   # 队列结束标记
+
+
+def _put(target_queue, item, stop_event):
+    """向有界队列放入元素；停止后不再等待。返回是否放入成功"""
+    while True:
+        try:
+            target_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            if stop_event.is_set():
+                return False
+
+
+def run_pipeline(epub_path, output_path=None, api_type="gemini", workers=None, txt_dir=None,
+                 force_regenerate=False, author=None, language='zh-CN', jobs=1, queue_size=None,
+                 stop_event=None, update_progress_func=None, min_condensation_ratio=None,
+                 max_condensation_ratio=None, target_condensation_ratio=None, condenser=None):
+    """
+    将EPUB逐章脱水并写出为新的EPUB
+
+    Args:
+        epub_path: 源EPUB路径
+        output_path: 输出EPUB路径，默认为源文件同目录下的 书名_脱水.epub
+        api_type: API类型（gemini/openai/mixed）
+        workers: 脱水线程数，默认按API配置的并发额度
+        txt_dir: 保留TXT文件的目录（原文章节与 书名_脱水 子目录），默认使用临时目录
+        force_regenerate: 忽略已有的脱水结果与缓存
+        author: 作者
+        language: 语言代码
+        jobs: 提取章节的进程数
+        queue_size: 章节队列长度，默认为脱水线程数的 QUEUE_SIZE_PER_WORKER 倍
+        stop_event: 可选的停止事件
+        update_progress_func: 可选的进度回调 (已写出章节数, 文档总数, 状态)
+        min_condensation_ratio: 最小脱水比例
+        max_condensation_ratio: 最大脱水比例
+        target_condensation_ratio: 目标脱水比例
+        condenser: 可选的已有 NovelCondenser（复用其密钥管理器，如后台服务），此时忽略 api_type 与比例参数
+
+    Returns:
+        str or None: 输出EPUB路径，失败或被停止时返回None
+    """
+    epub_path = Path(epub_path)
+    book_title = get_safe_filename(epub_path.stem)
+    output_path = Path(output_path) if output_path else epub_path.with_name(f"{book_title}_脱水.epub")
+    stop_event = stop_event or threading.Event()
+
+    temp_dir = None if txt_dir else tempfile.mkdtemp(prefix="ainovellab-pipeline-")
+    chapter_dir = Path(txt_dir or temp_dir)
+    chapter_dir.mkdir(parents=True, exist_ok=True)
+    condensed_dir = chapter_dir / f"{book_title}_脱水"
+
+    if condenser is None:
+        condenser = NovelCondenser(
+            api_type=api_type,
+            force_regenerate=force_regenerate,
+            output_dir=str(condensed_dir),
+            min_condensation_ratio=min_condensation_ratio,
+            max_condensation_ratio=max_condensation_ratio,
+            target_condensation_ratio=target_condensation_ratio,
+        )
+    else:
+        condenser.force_regenerate = force_regenerate
+        condenser.output_dir = str(condensed_dir)
+    if not workers:
+        key_managers = (condenser.gemini_key_manager, condenser.openai_key_manager)
+        workers = sum(km.get_max_concurrency() for km in key_managers if km) or 1
+    condenser.workers = workers
+    workers = condenser.get_effective_workers()
+    queue_size = queue_size or workers * QUEUE_SIZE_PER_WORKER
+
+    # 在途章节上限：排队中 + 正在脱水 + 等待按顺序写出
+    window = threading.BoundedSemaphore(queue_size * 2 + workers)
+    chapter_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=queue_size)
+    state = {"documents": 0, "chapters": 0, "error": None}
+    failed = []
+
+    logger.info(f"流水线: {epub_path} -> {output_path}")
+    logger.info(f"脱水线程数: {workers}，章节队列长度: {queue_size}，TXT目录: {txt_dir or '(临时目录，结束后删除)'}")
+
+    def read_chapters():
+        """读取线程：逐章提取正文，写成TXT后放入章节队列"""
+        try:
+            items, toc_map, close_epub = open_epub_documents(str(epub_path))
+            state["documents"] = len(items)
+            try:
+                for index, chapter in enumerate(iter_chapters(items, toc_map, jobs)):
+                    # 在途章节达到上限时等待写出端
+                    while not window.acquire(timeout=0.5):
+                        if stop_event.is_set():
+                            return
+                    if stop_event.is_set():
+                        window.release()
+                        return
+                    path = generate_output_filename(str(chapter_dir), book_title, index + 1, [chapter],
+                                                    True, index + 1, index + 1)
+                    if not write_chapters_to_file(path, [chapter]):
+                        path = None
+                    state["chapters"] = index + 1
+                    if not _put(chapter_queue, (index, chapter[0], chapter[1], path), stop_event):
+                        return
+            finally:
+                close_epub()
+        except Exception as e:
+            logger.error(f"读取EPUB时出错: {e}")
+            state["error"] = str(e)
+            stop_event.set()
+        finally:
+            for _ in range(workers):
+                chapter_queue.put(_DONE)
+
+    def condense_chapters():
+        """脱水线程：从章节队列取出章节，脱水后放入结果队列"""
+        try:
+            while True:
+                item = chapter_queue.get()
+                if item is _DONE:
+                    break
+                index, title, text, path = item
+                success, condensed = False, None
+                if path and not stop_event.is_set():
+                    try:
+                        success, condensed = condenser.condense_file(path, index + 1, None)
+                    except Exception as e:
+                        logger.error(f"脱水章节 '{title}' 时出错: {e}")
+                _put(result_queue, (index, title, text, condensed if success else None), stop_event)
+        finally:
+            result_queue.put(_DONE)
+
+    reader = threading.Thread(target=read_chapters, name="pipeline-reader", daemon=True)
+    condense_threads = [threading.Thread(target=condense_chapters, name=f"pipeline-condense-{i + 1}", daemon=True)
+                        for i in range(workers)]
+
+    writer = None
+    start_output_writer()
+    try:
+        writer = StreamingEpubWriter(output_path, book_title, language, author, {
+            'description': f'{book_title} - 由AI小说工具脱水生成',
+            'publisher': 'AI小说工具',
+            'rights': '版权归原作者所有',
+        })
+        toc_position = add_cover_page(writer, book_title, author or "佚名", language)
+
+        reader.start()
+        for thread in condense_threads:
+            thread.start()
+
+        # 写出端：按章节顺序写入EPUB，先完成的章节暂存等待
+        pending = {}
+        written_chapters = []
+        next_index = 0
+        finished = 0
+        while finished < workers:
+            item = result_queue.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            pending[item[0]] = item
+            while next_index in pending:
+                _, title, text, condensed = pending.pop(next_index)
+                next_index += 1
+                window.release()
+                if stop_event.is_set():
+                    continue
+                if condensed is None:
+                    logger.warning(f"章节 '{title}' 脱水失败，保留原文")
+                    failed.append(title)
+                file_name = f'chapter_{next_index}.xhtml'
+                writer.add_document(f'chapter_{next_index}', file_name, title,
+                                    render_chapter(title, condensed if condensed is not None else text, language))
+                written_chapters.append((file_name, title))
+                if update_progress_func:
+                    update_progress_func(len(written_chapters), state["documents"], title)
+        reader.join()
+
+        if stop_event.is_set():
+            logger.warning(f"流水线已停止{'：' + state['error'] if state['error'] else ''}")
+            writer.abort()
+            return None
+        if not written_chapters:
+            logger.error("未能提取任何章节。请检查EPUB文件是否有效。")
+            writer.abort()
+            return None
+
+        add_toc_page(writer, written_chapters, toc_position, language)
+        writer.close()
+        logger.info(f"流水线完成: 共 {len(written_chapters)} 章，脱水失败 {len(failed)} 章（保留原文）")
+        logger.info(f"EPUB文件已生成: {output_path}")
+        return str(output_path)
+    except Exception as e:
+        logger.error(f"流水线运行出错: {e}")
+        stop_event.set()
+        if writer is not None:
+            writer.abort()
+        return None
+    finally:
+        # 等待剩余输出写完，再落盘缓存索引
+        stop_output_writer()
+        flush_cache()
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def main():
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description='EPUB一键脱水：边分割边脱水，按章节顺序直接写出脱水后的EPUB')
+    parser.add_argument('epub_file', help='源EPUB文件路径')
+    parser.add_argument('-o', '--output', default=None, help='输出EPUB路径 (默认: 源文件目录下的 书名_脱水.epub)')
+    parser.add_argument('--api', choices=['gemini', 'openai', 'mixed'], default='gemini', help='使用的API类型')
+    parser.add_argument('--workers', type=int, default=None, help='脱水线程数 (默认: API配置的并发额度)')
+    parser.add_argument('--txt-dir', default=None, help='保留原文与脱水后TXT文件的目录 (默认: 不保留)')
+    parser.add_argument('--force', action='store_true', help='忽略已有的脱水结果与缓存，全部重新脱水')
+    parser.add_argument('-a', '--author', default=None, help='作者名称')
+    parser.add_argument('-l', '--language', default='zh-CN', help='语言代码 (默认: zh-CN)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='提取章节的进程数 (默认: 1)')
+    parser.add_argument('--queue-size', type=int, default=None, help='章节队列长度 (默认: 脱水线程数的2倍)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示详细日志')
+    parser.add_argument('-q', '--quiet', action='store_true', help='仅显示错误信息')
+
+    args = parser.parse_args()
+
+    # 设置日志级别
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    elif args.quiet:
+        logging.getLogger().setLevel(logging.ERROR)
+
+    if not os.path.isfile(args.epub_file):
+        logger.error(f"错误: 找不到EPUB文件 '{args.epub_file}'")
+        return 1
+
+    result = run_pipeline(args.epub_file, args.output, args.api, args.workers, args.txt_dir, args.force,
+                          args.author, args.language, args.jobs, args.queue_size)
+    try:
+        print_processing_summary()
+    except Exception:
+        pass
+    return 0 if result else 1
+
+
+if __name__ == "__main__":
+    exit(main())
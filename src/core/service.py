@@ -0,0 +1,756 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台服务 - 持久化任务队列 + 本地HTTP/JSON接口
+
+以常驻进程的方式运行分割、脱水、合并和一键脱水任务：
+- 任务保存在SQLite中，服务重启后未完成的任务会重新排队
+- 任务按提交顺序逐个执行，共用同一组API密钥管理器、HTTP连接和缓存，
+  密钥冷却状态与统计在任务之间保持
+- 任务运行期间的日志写入数据库，可通过接口增量读取（长轮询）
+- 只监听本机地址，GUI或脚本可以作为客户端提交任务、查询状态
+
+接口:
+    GET  /status                      服务状态（队列统计、密钥运行状态）
+    GET  /jobs?status=&limit=         任务列表
+    POST /jobs                        提交任务 {"type": "split|condense|merge|pipeline", "params": {...}}
+    GET  /jobs/<id>                   任务详情
+    POST /jobs/<id>/cancel            取消任务
+    GET  /jobs/<id>/logs?after=&wait= 读取日志（after 为上次返回的 next，wait 秒内等待新日志）
+
+命令行用法:
+    python -m src.core.service [serve] [--port 8765] [--db 路径]
+    python -m src.core.service submit split -p epub_path=书.epub -p chapters_per_file=1
+    python -m src.core.service status [任务ID]
+    python -m src.core.service cancel 任务ID
+    python -m src.core.service logs 任务ID [--follow]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import logging
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from .utils import setup_logger, filter_files_by_chapter_range
+from . import epub_splitter
+from . import txt_to_epub
+from . import pipeline
+from .novel_condenser import config
+from .novel_condenser.main import NovelCondenser
+from .novel_condenser.output_writer import start_output_writer, stop_output_writer
+from .novel_condenser.cache import flush_all as flush_cache, get_user_cache_root
+
+# 设置日志记录器
+logger = setup_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DB_FILE_NAME = "service.db"
+JOB_TYPES = ("split", "condense", "merge", "pipeline")
+# 每种任务必填的参数
+REQUIRED_PARAMS = {
+    "split": ("epub_path",),
+    "condense": ("input",),
+    "merge": ("folder",),
+    "pipeline": ("epub_path",),
+}
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+PROGRESS_INTERVAL = 0.5            # 进度写入数据库的最小间隔（秒）
+MAX_LOG_WAIT = 30                  # 日志长轮询的最长等待时间（秒）
+LOG_PAGE_SIZE = 500                # 单次返回的最大日志条数
+# 任务参数可临时覆盖的压缩比例设置（任务结束后恢复）
+RATIO_PARAMS = ("min_condensation_ratio", "max_condensation_ratio", "target_condensation_ratio")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS job_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_logs_job ON job_logs (job_id, id);
+"""
+
+
+class JobCancelled(Exception):
+    """任务在运行中被取消"""
+
+
+def get_default_db_path():
+    """返回默认的任务数据库路径（用户缓存目录下）"""
+    return os.path.join(get_user_cache_root(), DB_FILE_NAME)
+
+
+# =========================================================
+# 任务存储
+# =========================================================
+
+class JobStore:
+    """SQLite任务队列与任务日志（单连接 + 锁，供HTTP线程与执行线程共用）"""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._log_condition = threading.Condition()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def recover(self):
+        """服务启动时将上次中断的运行中任务重新排队
+
+        Returns:
+            int: 重新排队的任务数
+        """
+        cursor = self._execute(
+            "UPDATE jobs SET status='queued', progress=0, message='服务重启后重新排队', started_at=NULL "
+            "WHERE status='running' AND cancel_requested=0"
+        )
+        self._execute(
+            "UPDATE jobs SET status='cancelled', finished_at=? WHERE status='running' AND cancel_requested=1",
+            (time.time(),)
+        )
+        return cursor.rowcount
+
+    def submit(self, job_type, params):
+        """提交任务，返回任务ID"""
+        cursor = self._execute(
+            "INSERT INTO jobs (type, params, status, created_at) VALUES (?, ?, 'queued', ?)",
+            (job_type, json.dumps(params, ensure_ascii=False), time.time())
+        )
+        return cursor.lastrowid
+
+    def get(self, job_id):
+        rows = self._query("SELECT * FROM jobs WHERE id=?", (job_id,))
+        return self._to_dict(rows[0]) if rows else None
+
+    def list(self, status=None, limit=100):
+        if status:
+            rows = self._query("SELECT * FROM jobs WHERE status=? ORDER BY id DESC LIMIT ?", (status, limit))
+        else:
+            rows = self._query("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [self._to_dict(row) for row in rows]
+
+    def counts(self):
+        """各状态的任务数"""
+        return {row["status"]: row["n"] for row in
+                self._query("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    def claim_next(self):
+        """取出最早排队的任务并标记为运行中；没有任务时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status='queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status='running', started_at=?, message='运行中' WHERE id=?",
+                (time.time(), row["id"])
+            )
+            self._conn.commit()
+        return self.get(row["id"])
+
+    def update_progress(self, job_id, progress, message):
+        self._execute("UPDATE jobs SET progress=?, message=? WHERE id=?", (progress, message, job_id))
+
+    def finish(self, job_id, status, result=None, error=None, message=None):
+        self._execute(
+            "UPDATE jobs SET status=?, result=?, error=?, message=?, finished_at=?, "
+            "progress=CASE WHEN ?='succeeded' THEN 100 ELSE progress END WHERE id=?",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+             message, time.time(), status, job_id)
+        )
+        with self._log_condition:
+            self._log_condition.notify_all()
+
+    def requeue(self, job_id, message):
+        self._execute("UPDATE jobs SET status='queued', progress=0, message=?, started_at=NULL WHERE id=?",
+                      (message, job_id))
+
+    def request_cancel(self, job_id):
+        """请求取消任务：排队中的任务直接取消，运行中的任务标记后由执行线程停止
+
+        Returns:
+            dict or None: 更新后的任务；任务不存在时返回None
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status='cancelled', finished_at=?, message='已取消' WHERE id=? AND status='queued'",
+                (time.time(), job_id)
+            )
+            self._conn.execute("UPDATE jobs SET cancel_requested=1 WHERE id=? AND status='running'", (job_id,))
+            self._conn.commit()
+        return self.get(job_id)
+
+    def add_log(self, job_id, level, message):
+        self._execute("INSERT INTO job_logs (job_id, created_at, level, message) VALUES (?, ?, ?, ?)",
+                      (job_id, time.time(), level, message))
+        with self._log_condition:
+            self._log_condition.notify_all()
+
+    def get_logs(self, job_id, after=0, wait=0):
+        """读取日志ID大于 after 的日志；没有新日志且任务未结束时最多等待 wait 秒
+
+        Returns:
+            list: [{"id", "created_at", "level", "message"}, ...]
+        """
+        deadline = time.time() + min(max(wait, 0), MAX_LOG_WAIT)
+        while True:
+            rows = self._query(
+                "SELECT id, created_at, level, message FROM job_logs WHERE job_id=? AND id>? ORDER BY id LIMIT ?",
+                (job_id, after, LOG_PAGE_SIZE)
+            )
+            remaining = deadline - time.time()
+            if rows or remaining <= 0:
+                return [dict(row) for row in rows]
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES:
+                return []
+            with self._log_condition:
+                self._log_condition.wait(min(remaining, 1.0))
+
+
+class JobLogHandler(logging.Handler):
+    """把日志写入当前运行任务的日志表（任务逐个执行，运行期间的日志都归属当前任务）"""
+
+    def __init__(self, store):
+        super().__init__(logging.INFO)
+        self.store = store
+        self.job_id = None
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    def emit(self, record):
+        job_id = self.job_id
+        if job_id is None:
+            return
+        try:
+            self.store.add_log(job_id, record.levelname, self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+# =========================================================
+# 任务执行
+# =========================================================
+
+class JobService:
+    """任务执行器：常驻的执行线程按顺序运行排队的任务"""
+
+    def __init__(self, store):
+        self.store = store
+        self.log_handler = JobLogHandler(store)
+        self._condensers = {}           # API类型 -> NovelCondenser（密钥管理器在任务之间复用）
+        self._wakeup = threading.Event()
+        self._shutdown = threading.Event()
+        self._current_job = None
+        self._stop_event = None
+        self._thread = None
+
+    def start(self):
+        recovered = self.store.recover()
+        if recovered:
+            logger.info(f"重新排队 {recovered} 个上次中断的任务")
+        logging.getLogger().addHandler(self.log_handler)
+        self._thread = threading.Thread(target=self._run, name="JobService", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止执行线程；正在运行的任务会被中止并在下次启动时重新排队"""
+        self._shutdown.set()
+        self._wakeup.set()
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logging.getLogger().removeHandler(self.log_handler)
+
+    def submit(self, job_type, params):
+        """校验并提交任务
+
+        Raises:
+            ValueError: 任务类型或参数无效
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"未知的任务类型: {job_type}，可选: {', '.join(JOB_TYPES)}")
+        if not isinstance(params, dict):
+            raise ValueError("params 必须是JSON对象")
+        missing = [name for name in REQUIRED_PARAMS[job_type] if not params.get(name)]
+        if missing:
+            raise ValueError(f"缺少参数: {', '.join(missing)}")
+        job_id = self.store.submit(job_type, params)
+        self._wakeup.set()
+        return job_id
+
+    def cancel(self, job_id):
+        job = self.store.request_cancel(job_id)
+        if job and job["status"] == "running" and self._current_job == job_id and self._stop_event is not None:
+            self._stop_event.set()
+        return job
+
+    def status(self):
+        """服务状态：队列统计、当前任务与密钥运行状态"""
+        keys = []
+        for api_type, condenser in self._condensers.items():
+            for name, key_manager in (("gemini", condenser.gemini_key_manager),
+                                      ("openai", condenser.openai_key_manager)):
+                if key_manager is not None:
+                    keys.extend(key_manager.get_runtime_stats(name))
+        return {"jobs": self.store.counts(), "current_job": self._current_job, "keys": keys, "pid": os.getpid()}
+
+    def _run(self):
+        while not self._shutdown.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                continue
+            self._execute(job)
+
+    def _execute(self, job):
+        job_id = job["id"]
+        self._stop_event = threading.Event()
+        self._current_job = job_id
+        self.log_handler.job_id = job_id
+        logger.info(f"开始执行任务 #{job_id} ({job['type']})")
+        saved_ratios = {name: getattr(config, name.upper()) for name in RATIO_PARAMS}
+        try:
+            handler = getattr(self, f"_run_{job['type']}")
+            result = handler(job["params"], self._progress(job_id))
+            error = result.pop("error", None)
+            status, error = ("succeeded", None) if result.pop("success") else ("failed", error)
+        except JobCancelled:
+            status, result, error = "failed", None, None
+        except Exception as e:
+            logger.exception(f"任务 #{job_id} 运行出错: {e}")
+            status, result, error = "failed", None, str(e)
+        finally:
+            # 压缩比例只对本次任务生效，避免影响之后未指定比例的任务
+            for name, value in saved_ratios.items():
+                setattr(config, name.upper(), value)
+            self.log_handler.job_id = None
+            self._current_job = None
+
+        if self._stop_event.is_set():
+            current = self.store.get(job_id)
+            if current and current["cancel_requested"]:
+                status, error = "cancelled", None
+            elif self._shutdown.is_set():
+                self.store.requeue(job_id, "服务停止，任务将在下次启动时重新运行")
+                self._stop_event = None
+                return
+        self._stop_event = None
+        messages = {"succeeded": "已完成", "failed": "失败", "cancelled": "已取消"}
+        self.store.finish(job_id, status, result, error or None, messages[status])
+        logger.info(f"任务 #{job_id} {messages[status]}{': ' + error if error else ''}")
+
+    def _progress(self, job_id):
+        """生成进度回调：限制写库频率；任务被取消时抛出 JobCancelled 中止不支持停止事件的任务"""
+        stop_event = self._stop_event
+        last_update = [0.0]
+
+        def update(current, total, status=None):
+            if stop_event.is_set():
+                raise JobCancelled()
+            now = time.time()
+            if total and (now - last_update[0] >= PROGRESS_INTERVAL or current >= total):
+                last_update[0] = now
+                progress = min(int(current * 100 / total), 99)
+                self.store.update_progress(job_id, progress, f"{current}/{total}{' - ' + status if status else ''}")
+        return update
+
+    def _get_condenser(self, params):
+        """按API类型复用 NovelCondenser，并应用本次任务的参数（压缩比例在任务结束后由 _execute 恢复）"""
+        api_type = params.get("api_type", "gemini")
+        condenser = self._condensers.get(api_type)
+        if condenser is None:
+            condenser = NovelCondenser(api_type=api_type)
+            self._condensers[api_type] = condenser
+        condenser.force_regenerate = bool(params.get("force", False))
+        for name in RATIO_PARAMS:
+            if params.get(name) is not None:
+                setattr(config, name.upper(), params[name])
+        return condenser
+
+    # ---------------------------------------------------------
+    # 各类任务
+    # ---------------------------------------------------------
+
+    def _run_split(self, params, progress):
+        epub_path = params["epub_path"]
+        output_dir = params.get("output_dir") or os.path.join(
+            os.path.dirname(os.path.abspath(epub_path)), Path(epub_path).stem, "splitted")
+        return epub_splitter.split_book(
+            epub_path, output_dir,
+            chapters_per_file=params.get("chapters_per_file", 100),
+            use_range_in_filename=params.get("use_range", True),
+            jobs=params.get("jobs", 1),
+            incremental=params.get("incremental", False),
+            update_progress_func=progress,
+        )
+
+    def _run_condense(self, params, progress):
+        input_path = params["input"]
+        if os.path.isdir(input_path):
+            files = sorted(str(p) for p in Path(input_path).glob("*.txt"))
+            dir_name = os.path.basename(input_path.rstrip("/\\"))
+            default_output = os.path.join(input_path, f"{dir_name}_脱水")
+        else:
+            files = [input_path]
+            default_output = os.path.join(os.path.dirname(input_path) or ".", f"{Path(input_path).stem}_脱水")
+        if params.get("start") or params.get("end"):
+            files = filter_files_by_chapter_range(files, params.get("start", 1), params.get("end", len(files)))
+        if not files:
+            return {"success": False, "error": "没有找到要处理的TXT文件"}
+
+        condenser = self._get_condenser(params)
+        condenser.output_dir = params.get("output_dir") or default_output
+        key_managers = (condenser.gemini_key_manager, condenser.openai_key_manager)
+        condenser.workers = params.get("workers") or sum(km.get_max_concurrency() for km in key_managers if km) or 1
+        os.makedirs(condenser.output_dir, exist_ok=True)
+
+        start_output_writer()
+        try:
+            success_count, failed_files = condenser._process_files_concurrently(
+                files, len(files), stop_event=self._stop_event,
+                update_progress_func=lambda current, total, status=None: self._safe_progress(progress, current, total)
+            )
+        finally:
+            stop_output_writer()
+            flush_cache()
+        return {"success": not failed_files, "output_dir": condenser.output_dir, "total": len(files),
+                "succeeded": success_count, "failed": sorted(failed_files),
+                "error": f"{len(failed_files)} 个文件处理失败" if failed_files else None}
+
+    def _run_merge(self, params, progress):
+        result = txt_to_epub.merge_txt_to_epub(
+            params["folder"],
+            output_path=params.get("output_path"),
+            author=params.get("author"),
+            novel_name=params.get("novel_name"),
+            language=params.get("language", "zh-CN"),
+            jobs=params.get("jobs", 1),
+            incremental=params.get("incremental", False),
+            volume_size=params.get("volume_size"),
+            volume_chars=params.get("volume_chars"),
+            update_progress_func=progress,
+        )
+        return {"success": bool(result), "output": result, "error": None if result else "EPUB生成失败"}
+
+    def _run_pipeline(self, params, progress):
+        condenser = self._get_condenser(params)
+        result = pipeline.run_pipeline(
+            params["epub_path"],
+            output_path=params.get("output_path"),
+            api_type=params.get("api_type", "gemini"),
+            workers=params.get("workers"),
+            txt_dir=params.get("txt_dir"),
+            force_regenerate=condenser.force_regenerate,
+            author=params.get("author"),
+            language=params.get("language", "zh-CN"),
+            jobs=params.get("jobs", 1),
+            stop_event=self._stop_event,
+            update_progress_func=lambda current, total, status=None: self._safe_progress(
+                progress, current, total, status),
+            condenser=condenser,
+        )
+        return {"success": bool(result), "output": result, "error": None if result else "一键脱水失败"}
+
+    @staticmethod
+    def _safe_progress(progress, current, total, status=None):
+        """支持停止事件的任务由停止事件结束，进度回调不抛出取消异常"""
+        try:
+            progress(current, total, status)
+        except JobCancelled:
+            pass
+
+
+# =========================================================
+# HTTP接口
+# =========================================================
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """本地HTTP/JSON接口"""
+
+    service = None                  # 由 create_server 设置
+
+    def log_message(self, format, *args):
+        logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json({"error": message}, status)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def _route(self):
+        """解析路径，返回 (路径片段, 查询参数)"""
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        return parts, query
+
+    def _get_job_id(self, parts):
+        try:
+            return int(parts[1])
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        parts, query = self._route()
+        store = self.service.store
+        try:
+            if parts == ["status"]:
+                return self._send_json(self.service.status())
+            if parts == ["jobs"]:
+                return self._send_json({"jobs": store.list(query.get("status"), int(query.get("limit", 100)))})
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job_id = self._get_job_id(parts)
+                job = store.get(job_id) if job_id is not None else None
+                if job is None:
+                    return self._send_error(404, "任务不存在")
+                if len(parts) == 2:
+                    return self._send_json(job)
+                if parts[2] == "logs":
+                    after = int(query.get("after", 0))
+                    logs = store.get_logs(job_id, after, float(query.get("wait", 0)))
+                    job = store.get(job_id)
+                    return self._send_json({
+                        "logs": logs,
+                        "next": logs[-1]["id"] if logs else after,
+                        "status": job["status"],
+                        "finished": job["status"] in FINISHED_STATUSES,
+                    })
+            self._send_error(404, "接口不存在")
+        except ValueError as e:
+            self._send_error(400, f"参数无效: {e}")
+
+    def do_POST(self):
+        parts, _ = self._route()
+        try:
+            if parts == ["jobs"]:
+                body = self._read_json()
+                job_id = self.service.submit(body.get("type"), body.get("params") or {})
+                return self._send_json(self.service.store.get(job_id), 201)
+            if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+                job_id = self._get_job_id(parts)
+                job = self.service.cancel(job_id) if job_id is not None else None
+                if job is None:
+                    return self._send_error(404, "任务不存在")
+                return self._send_json(job)
+            self._send_error(404, "接口不存在")
+        except (ValueError, AttributeError) as e:
+            self._send_error(400, str(e))
+
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """创建绑定到本机地址的HTTP服务"""
+    handler = type("BoundServiceRequestHandler", (ServiceRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# =========================================================
+# 客户端
+# =========================================================
+
+class ServiceClient:
+    """服务的HTTP客户端（命令行与GUI共用）"""
+
+    def __init__(self, base_url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=MAX_LOG_WAIT + 10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, data=None):
+        body = json.dumps(data).encode("utf-8") if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode("utf-8")).get("error")
+            except Exception:
+                message = str(e)
+            raise RuntimeError(f"HTTP {e.code}: {message}")
+
+    def status(self):
+        return self._request("GET", "/status")
+
+    def submit(self, job_type, params):
+        return self._request("POST", "/jobs", {"type": job_type, "params": params})
+
+    def get_job(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def list_jobs(self, status=None, limit=100):
+        query = f"?limit={limit}" + (f"&status={status}" if status else "")
+        return self._request("GET", f"/jobs{query}")["jobs"]
+
+    def cancel(self, job_id):
+        return self._request("POST", f"/jobs/{job_id}/cancel")
+
+    def logs(self, job_id, after=0, wait=0):
+        return self._request("GET", f"/jobs/{job_id}/logs?after={after}&wait={wait}")
+
+    def follow_logs(self, job_id, after=0):
+        """持续返回任务日志，直到任务结束"""
+        while True:
+            page = self.logs(job_id, after, wait=MAX_LOG_WAIT)
+            yield from page["logs"]
+            after = page["next"]
+            if page["finished"] and not page["logs"]:
+                return
+
+
+# =========================================================
+# 命令行
+# =========================================================
+
+def _parse_param(value):
+    """解析 key=value 形式的任务参数，值按JSON解析（失败时作为字符串）"""
+    if "=" not in value:
+        raise argparse.ArgumentTypeError(f"参数格式应为 key=value: {value}")
+    key, raw = value.split("=", 1)
+    try:
+        return key, json.loads(raw)
+    except ValueError:
+        return key, raw
+
+
+def serve(args):
+    store = JobStore(args.db or get_default_db_path())
+    service = JobService(store)
+    server = create_server(service, args.host, args.port)
+    service.start()
+    logger.info(f"服务已启动: http://{args.host}:{args.port}，任务数据库: {store.db_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("正在停止服务...")
+    finally:
+        server.server_close()
+        service.stop(timeout=60)
+        store.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI小说工具后台服务：持久化任务队列与本地HTTP接口')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'监听/连接地址 (默认: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'端口 (默认: {DEFAULT_PORT})')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='启动服务（默认）')
+    serve_parser.add_argument('--db', default=None, help='任务数据库路径 (默认: 用户缓存目录下的 service.db)')
+
+    submit_parser = subparsers.add_parser('submit', help='提交任务')
+    submit_parser.add_argument('type', choices=JOB_TYPES, help='任务类型')
+    submit_parser.add_argument('-p', '--param', action='append', type=_parse_param, default=[],
+                               help='任务参数 key=value，可重复')
+
+    status_parser = subparsers.add_parser('status', help='查看服务或任务状态')
+    status_parser.add_argument('job_id', nargs='?', type=int, help='任务ID')
+
+    cancel_parser = subparsers.add_parser('cancel', help='取消任务')
+    cancel_parser.add_argument('job_id', type=int, help='任务ID')
+
+    logs_parser = subparsers.add_parser('logs', help='查看任务日志')
+    logs_parser.add_argument('job_id', type=int, help='任务ID')
+    logs_parser.add_argument('-f', '--follow', action='store_true', help='持续输出直到任务结束')
+
+    args = parser.parse_args()
+
+    if args.command in (None, 'serve'):
+        if args.command is None:
+            args.db = None
+        return serve(args)
+
+    client = ServiceClient(f"http://{args.host}:{args.port}")
+    try:
+        if args.command == 'submit':
+            result = client.submit(args.type, dict(args.param))
+        elif args.command == 'status':
+            result = client.get_job(args.job_id) if args.job_id else client.status()
+        elif args.command == 'cancel':
+            result = client.cancel(args.job_id)
+        else:
+            logs = client.follow_logs(args.job_id) if args.follow else client.logs(args.job_id)["logs"]
+            for entry in logs:
+                print(f"{time.strftime('%H:%M:%S', time.localtime(entry['created_at']))} "
+                      f"{entry['level']} {entry['message']}", flush=True)
+            return 0
+    except (RuntimeError, OSError) as e:
+        logger.error(f"无法访问服务: {e}")
+        return 1
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TXT分割器 - 将单个大型TXT小说按章节分割成多个TXT文件
+
+通过内存映射逐行扫描整本小说，用一个预编译的正则识别章节标题
+（第X章/回/节、序章、尾声），边扫描边写出 书名_[序号]_标题.txt，
+整个过程只遍历一次文件，内存占用与文件大小无关。
+"""
+
+import os
+import re
+import mmap
+import codecs
+import argparse
+import logging
+from pathlib import Path
+
+from .utils import get_safe_filename, sniff_text_encoding
+
+# 配置日志系统
+def setup_logger(log_level=logging.INFO):
+    """配置日志系统"""
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    return logging.getLogger(__name__)
+
+
+# 创建全局日志对象
+logger = setup_logger()
+
+# 章节标题：第X章/回/节（X 为阿拉伯或中文数字）、序章、尾声，标题行本身不会太长
+CHAPTER_HEADING_RE = re.compile(
+    r'^[ \t　]*('
+    r'第[0-9０-９零〇一二两三四五六七八九十百千万]+[章回节](?:[ \t　:：、.·-]+[^。！？]{0,40}|[^。！？，,]{0,20})'
+    r'|序章.{0,40}'
+    r'|尾声.{0,40}'
+    r')[ \t　]*$'
+)
+
+ENCODING_SNIFF_SIZE = 64 * 1024      # 用于推断编码的前缀长度
+PREFACE_TITLE = "前言"               # 第一个章节标题之前的内容
+# 以 \n 分行时可以安全地按字节扫描的编码（多字节字符中不会出现 0x0A）
+BYTE_LINE_SAFE_ENCODINGS = ('utf-8', 'utf-8-sig', 'gbk', 'gb2312', 'gb18030', 'big5', 'latin-1', 'ascii')
+
+
+def match_chapter_heading(line):
+    """判断一行是否为章节标题
+
+    Args:
+        line: 去掉换行符的文本行
+
+    Returns:
+        str: 章节标题；不是标题时返回None
+    """
+    match = CHAPTER_HEADING_RE.match(line)
+    if match:
+        return match.group(1).strip()
+    return None
+
+
+def _iter_mmap_lines(mapped, encoding):
+    """按字节逐行扫描内存映射文件并解码，每次只解码一行"""
+    if encoding == 'utf-8-sig' and mapped[:3] == b'\xef\xbb\xbf':
+        mapped.seek(3)
+        encoding = 'utf-8'
+    readline = mapped.readline
+    while True:
+        raw = readline()
+        if not raw:
+            break
+        yield raw.decode(encoding, errors='replace').rstrip('\r\n')
+
+
+def _iter_stream_lines(file_path, encoding):
+    """UTF-16/32 等编码无法按字节分行，改用流式解码逐行读取"""
+    with open(file_path, 'r', encoding=encoding, errors='replace', newline=None) as f:
+        for line in f:
+            yield line.rstrip('\r\n')
+
+
+class _ChapterWriter:
+    """边扫描边写出章节文件；章节标题后出现正文时才创建文件，跳过只有标题的目录行"""
+
+    def __init__(self, output_dir, book_title):
+        self.output_dir = output_dir
+        self.book_title = book_title
+        self.chapter_count = 0
+        self.skipped_headings = 0
+        self.files = []
+        self._pending_title = None
+        self._file = None
+
+    def start_chapter(self, title):
+        """遇到新的章节标题"""
+        self._close_current()
+        if self._pending_title is not None and self._pending_title != PREFACE_TITLE:
+            # 上一个标题后没有任何正文（常见于书首目录），不单独成章
+            self.skipped_headings += 1
+            logger.debug(f"跳过没有正文的标题: {self._pending_title}")
+        self._pending_title = title
+
+    def write_line(self, line):
+        """写入一行正文"""
+        if self._file is None:
+            if not line.strip():
+                return
+            if self._pending_title is None:
+                self._pending_title = PREFACE_TITLE
+            self._open_file(self._pending_title)
+        self._file.write(line)
+        self._file.write('\n')
+
+    def _open_file(self, title):
+        if title == PREFACE_TITLE:
+            index = 0
+            first_line = None
+        else:
+            self.chapter_count += 1
+            index = self.chapter_count
+            first_line = title
+        safe_title = get_safe_filename(title)
+        path = os.path.join(self.output_dir, f"{self.book_title}_[{index}]_{safe_title}.txt")
+        self._file = open(path, 'w', encoding='utf-8')
+        self.files.append(path)
+        if first_line:
+            self._file.write(first_line + '\n\n')
+        self._pending_title = None
+
+    def _close_current(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """结束写出"""
+        self._close_current()
+        if self._pending_title is not None and self._pending_title != PREFACE_TITLE:
+            self.skipped_headings += 1
+
+
+def _codec_name(encoding):
+    """返回编码的规范名称（如 GBK -> gbk、utf8 -> utf-8）"""
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return encoding.lower()
+
+
+def split_txt(txt_path, output_dir, encoding=None, book_title=None):
+    """
+    按章节分割单个TXT小说
+
+    Args:
+        txt_path: TXT文件路径
+        output_dir: 输出目录
+        encoding: 文件编码，默认根据BOM和文件开头自动推断
+        book_title: 书名，默认使用TXT文件名
+
+    Returns:
+        bool: 操作是否成功
+    """
+    try:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        book_title = get_safe_filename(book_title or Path(txt_path).stem)
+        file_size = os.path.getsize(txt_path)
+        if file_size == 0:
+            logger.error(f"TXT文件为空: {txt_path}")
+            return False
+
+        logger.info(f"正在分割TXT文件: {txt_path} ({file_size / 1024 / 1024:.2f}MB)")
+        writer = _ChapterWriter(str(output_dir), book_title)
+
+        with open(txt_path, 'rb') as raw_file:
+            with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if not encoding:
+                    encoding = sniff_text_encoding(mapped[:ENCODING_SNIFF_SIZE]) or 'utf-8'
+                logger.info(f"使用编码: {encoding}")
+
+                if _codec_name(encoding) in BYTE_LINE_SAFE_ENCODINGS:
+                    lines = _iter_mmap_lines(mapped, encoding)
+                else:
+                    lines = _iter_stream_lines(txt_path, encoding)
+
+                try:
+                    for line in lines:
+                        title = match_chapter_heading(line)
+                        if title:
+                            writer.start_chapter(title)
+                        else:
+                            writer.write_line(line)
+                finally:
+                    writer.close()
+
+        if writer.skipped_headings:
+            logger.info(f"跳过 {writer.skipped_headings} 个没有正文的标题（如书首目录）")
+        if writer.chapter_count == 0:
+            logger.error("未识别到任何章节标题，请检查文件内容或编码")
+            return False
+
+        logger.info(f"总共分割为 {writer.chapter_count} 个章节，生成 {len(writer.files)} 个文件")
+        return True
+
+    except Exception as e:
+        logger.error(f"分割TXT文件时出错: {e}")
+        return False
+
+
+def prepare_output_directory(args):
+    """
+    准备输出目录
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        str: 输出目录路径
+    """
+    # 如果没有指定输出目录，则自动创建与TXT文件同名的目录下的splitted目录
+    if args.output is None:
+        base_dir = Path.cwd() / Path(args.txt_file).stem
+        output_dir = base_dir / "splitted"
+    else:
+        output_dir = Path(args.output)
+
+    # 清空输出目录中的所有文件（如果目录存在）
+    if output_dir.exists():
+        files = [f for f in output_dir.iterdir() if f.is_file()]
+        if files and not args.no_clean:
+            logger.info(f"清空目录 {output_dir} 中的 {len(files)} 个文件...")
+            for file in files:
+                try:
+                    file.unlink()
+                except Exception as e:
+                    logger.warning(f"无法删除文件 {file.name}: {e}")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return str(output_dir)
+
+
+def main():
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description='将单个TXT小说按章节分割成多个TXT文件')
+    parser.add_argument('txt_file', help='TXT文件路径')
+    parser.add_argument('-o', '--output', default=None, help='输出目录 (默认: 自动创建与TXT文件同名的目录下的splitted目录)')
+    parser.add_argument('-e', '--encoding', default=None, help='文件编码 (默认: 自动检测)')
+    parser.add_argument('-t', '--title', default=None, help='书名 (默认: 使用TXT文件名)')
+    parser.add_argument('-n', '--no-clean', action='store_true', help='不清空输出目录')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示详细日志')
+    parser.add_argument('-q', '--quiet', action='store_true', help='仅显示错误信息')
+
+    args = parser.parse_args()
+
+    # 设置日志级别
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+    elif args.quiet:
+        logger.setLevel(logging.ERROR)
+
+    # 检查TXT文件是否存在
+    if not Path(args.txt_file).is_file():
+        logger.error(f"错误: 找不到TXT文件 '{args.txt_file}'")
+        return 1
+
+    output_dir = prepare_output_directory(args)
+    logger.info(f"输出目录: {output_dir}")
+
+    if split_txt(args.txt_file, output_dir, args.encoding, args.title):
+        logger.info(f"分割完成! 文件已保存到 {output_dir} 目录")
+        return 0
+    logger.error("分割过程中出现错误，请检查日志")
+    return 1
+
+
+if __name__ == '__main__':
+    exit_code = main()
+    exit(exit_code)
@@ -9,14 +9,22 @@ TXT转EPUB工具 - 将多个TXT文本文件合并为EPUB电子书
 
 import os
 import re
+import sys
+import json
+import shutil
+import time
+import struct
+import hashlib
 import argparse
 import logging
 import uuid
 import zipfile
-import shutil
-import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from ebooklib import epub
+
+from .utils import get_chapter_file_index, decode_text_file
 
 
 # 配置日志系统
@@ -34,6 +42,17 @@ def setup_logger(log_level=logging.INFO):
 logger = setup_logger()
 
 
+# 章节文件名格式（预编译，避免每个文件重复编译）
+FILENAME_PATTERNS = [
+    # 标准格式：小说名称_[序号]_章节名称.txt
+    re.compile(r"(.+?)_\[(\d+)\]_(.+?)\.txt$"),
+    # 多章节合并文件: 小说名_[开始-结束].txt
+    re.compile(r"(.+?)_\[(\d+)-(\d+)\]\.txt$"),
+    # 更宽松的格式：小说名称_序号_章节名称.txt（没有方括号）
+    re.compile(r"(.+?)_(\d+)_(.+?)\.txt$"),
+]
+
+
 def parse_filename(filename):
     """
     从文件名中解析出小说名称、序号和章节名称
@@ -44,17 +63,8 @@ def parse_filename(filename):
     Returns:
         tuple: (小说名称, 章节序号, 章节标题)，解析失败则返回(None, None, None)
     """
-    patterns = [
-        # 标准格式：小说名称_[序号]_章节名称.txt
-        r"(.+?)_\[(\d+)\]_(.+?)\.txt$",
-        # 多章节合并文件: 小说名_[开始-结束].txt
-        r"(.+?)_\[(\d+)-(\d+)\]\.txt$",
-        # 更宽松的格式：小说名称_序号_章节名称.txt（没有方括号）
-        r"(.+?)_(\d+)_(.+?)\.txt$"
-    ]
-    
-    for i, pattern in enumerate(patterns):
-        match = re.match(pattern, filename)
+    for i, pattern in enumerate(FILENAME_PATTERNS):
+        match = pattern.match(filename)
         if match:
             novel_name = match.group(1)
             if i == 1:  # 多章节合并文件
@@ -87,28 +97,17 @@ def read_txt_content(file_path):
         logger.warning(f"警告：文件 {file_path} 为空文件")
         return "（空文件）"
     
-    # 优先尝试最常用的编码
-    encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']
-    
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                content = f.read()
-                if content:
-                    return content
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            logger.warning(f"读取文件 {file_path.name} 时发生错误: {e}")
-    
-    # 所有编码都失败时，尝试二进制读取
+    # 共用解码器：BOM/前缀探测编码，并记住同目录的编码
     try:
-        with open(file_path, 'rb') as f:
-            binary_data = f.read()
-            # 尝试使用latin-1强制解码
-            return binary_data.decode('latin-1', errors='replace')
+        content, encoding = decode_text_file(file_path)
+        if content:
+            return content
+        if encoding is None:
+            # 所有编码都失败时，使用latin-1强制解码
+            with open(file_path, 'rb') as f:
+                return f.read().decode('latin-1', errors='replace')
     except Exception as e:
-        logger.error(f"二进制读取文件 {file_path} 失败: {e}")
+        logger.error(f"读取文件 {file_path} 失败: {e}")
     
     return "（内容读取失败）"
 
@@ -173,297 +172,726 @@ def escape_html(text):
     return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
 
 
-def write_epub(book, output_path):
-    """将EPUB书籍写入文件（优先使用 ebooklib 原生写出）
-
-    说明：历史实现使用系统临时目录手写 OPF/NCX/container.xml 并 zip 打包。
-    在部分运行环境中系统临时目录不可写，会导致必然失败；同时手写 XML 风险更高。
-    """
-    output_path = Path(output_path)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    # 先走 ebooklib 标准写出路径
-    try:
-        try:
-            import ebooklib
-            empty_docs = []
-            for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
-                body = item.get_body_content()
-                if isinstance(body, (bytes, bytearray)):
-                    body_text = body.decode("utf-8", errors="ignore")
-                else:
-                    body_text = str(body) if body is not None else ""
-                if not body_text.strip():
-                    empty_docs.append(f"{getattr(item, 'file_name', '?')} ({type(item).__name__})")
-            if empty_docs:
-                logger.error(f"EPUB文档存在空body（ebooklib可能会失败）: {', '.join(empty_docs)}")
-        except Exception:
-            pass
-
-        epub.write_epub(str(output_path), book, {})
-        if output_path.exists() and output_path.stat().st_size > 1000:
-            logger.info(f"EPUB文件已生成: {output_path}, 大小: {output_path.stat().st_size/1024:.2f} KB")
-            return True
-        logger.error(f"生成的EPUB文件失败或文件过小: {output_path}")
-        return False
-    except Exception as e:
-        import traceback
-        logger.error(f"ebooklib 写出EPUB失败，将尝试 legacy 路径: {e}")
-        logger.error(f"详细错误: {traceback.format_exc()}")
-
-    return _write_epub_legacy(book, output_path)
+EPUB_CONTENT_DIR = "EPUB"      # 压缩包内存放OPF与各文档的目录
+RENDER_BATCH_SIZE = 32         # 并行渲染时每个任务包含的章节数
+RENDER_VERSION = 1             # 章节渲染模板版本，模板变化时递增以使增量构建全部重新渲染
+BUILD_MANIFEST_SUFFIX = ".manifest.json"
+BUILD_MANIFEST_VERSION = 1
+STYLE_FILE_NAME = "style.css"
 
+STYLE_CSS = """
+@namespace epub "http://www.idpf.org/2007/ops";
+body {
+    font-family: "Noto Serif CJK SC", "Source Han Serif CN", SimSun, serif;
+    margin: 5%;
+    line-height: 1.5;
+}
+h1 {
+    text-align: center;
+    font-size: 1.5em;
+    margin: 1em 0;
+}
+p {
+    text-indent: 2em;
+    margin: 0.3em 0;
+}
+.cover {
+    text-align: center;
+    margin: 3em 0;
+}
+.author {
+    text-align: center;
+    margin: 1em 0;
+}
+.toc a {
+    text-decoration: none;
+    color: black;
+}
+"""
 
-def _write_epub_legacy(book, output_path: Path):
-    """legacy 写出路径：保留旧逻辑以便回滚（临时目录改到项目 tmp/ 下避免权限问题）"""
-    try:
-        project_root = Path(__file__).resolve().parents[2]
-        tmp_root = project_root / "tmp"
-        tmp_root.mkdir(parents=True, exist_ok=True)
-
-        # 注意：本运行环境下 tempfile.mkdtemp() 创建的目录不可写；改用显式 mkdir
-        temp_dir = tmp_root / f"epub-legacy-{uuid.uuid4().hex}"
-        temp_dir.mkdir(parents=True, exist_ok=False)
-        logger.info(f"创建临时目录(legacy): {temp_dir}")
-        
-        # 创建mimetype文件（必须是第一个文件，且不压缩）
-        mimetype_path = temp_dir / "mimetype"
-        with open(mimetype_path, "w", encoding="utf-8") as f:
-            f.write("application/epub+zip")
-        
-        # 创建META-INF目录
-        meta_inf_dir = temp_dir / "META-INF"
-        meta_inf_dir.mkdir(exist_ok=True)
-        
-        # 创建container.xml
-        container_path = meta_inf_dir / "container.xml"
-        with open(container_path, "w", encoding="utf-8") as f:
-            f.write('''<?xml version="1.0" encoding="UTF-8"?>
+CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
 <container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
     <rootfiles>
-        <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+        <rootfile full-path="EPUB/content.opf" media-type="application/oebps-package+xml"/>
     </rootfiles>
-</container>''')
-        
-        # 创建OEBPS目录（存放内容）
-        oebps_dir = temp_dir / "OEBPS"
-        oebps_dir.mkdir(exist_ok=True)
-        
-        # 写入CSS文件
-        for item in book.items:
-            if isinstance(item, epub.EpubItem) and item.file_name.endswith('.css'):
-                css_path = oebps_dir / item.file_name
-                data = item.content
-                if isinstance(data, str):
-                    data = data.encode("utf-8")
-                with open(css_path, "wb") as f:
-                    f.write(data)
-        
-        # 写入所有HTML文件
-        for item in book.items:
-            if isinstance(item, epub.EpubHtml):
-                html_path = oebps_dir / item.file_name
-                with open(html_path, "wb") as f:
-                    # 验证内容是否为空
-                    if not item.content or len(item.content) < 10:
-                        safe_title = escape_html(item.title)
-                        item.content = f'''<?xml version="1.0" encoding="utf-8"?>
+</container>"""
+
+XHTML_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
 <!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{language}" xml:lang="{language}">
 <head>
-    <title>{safe_title}</title>
+    <title>{title}</title>
     <link rel="stylesheet" type="text/css" href="style.css" />
     <meta http-equiv="Content-Type" content="text/html; charset=UTF-8" />
 </head>
 <body>
-    <h1>{safe_title}</h1>
-    <p>（本章内容已丢失，请检查原始文件）</p>
+{body}
 </body>
-</html>'''
-                    data = item.content
-                    if isinstance(data, str):
-                        data = data.encode("utf-8")
-                    f.write(data)
-        
-        # 写入导航文件
-        for item in book.items:
-            if isinstance(item, epub.EpubNav):
-                nav_path = oebps_dir / item.file_name
-                data = item.content
-                if isinstance(data, str):
-                    data = data.encode("utf-8")
-                with open(nav_path, "wb") as f:
-                    f.write(data)
-        
-        # 写入NCX文件
-        ncx_path = oebps_dir / "toc.ncx"
-        ncx_content = f'''<?xml version="1.0" encoding="utf-8"?>
+</html>"""
+
+NCX_NAV_POINT_TEMPLATE = """    <navPoint id="{item_id}" playOrder="{order}">
+      <navLabel>
+        <text>{title}</text>
+      </navLabel>
+      <content src="{file_name}"/>
+    </navPoint>"""
+
+NCX_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
 <ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
   <head>
-    <meta name="dtb:uid" content="unique-identifier"/>
+    <meta name="dtb:uid" content="{identifier}"/>
     <meta name="dtb:depth" content="1"/>
     <meta name="dtb:totalPageCount" content="0"/>
     <meta name="dtb:maxPageNumber" content="0"/>
   </head>
   <docTitle>
-    <text>{book.title}</text>
+    <text>{title}</text>
   </docTitle>
-  <navMap>'''
-        
-        # 添加各章节导航点
-        for i, toc_item in enumerate(book.toc):
-            if hasattr(toc_item, 'href'):
-                ncx_content += f'''
-    <navPoint id="navpoint-{i+1}" playOrder="{i+1}">
-      <navLabel>
-        <text>{toc_item.title}</text>
-      </navLabel>
-      <content src="{toc_item.href}"/>
-    </navPoint>'''
-            
-        ncx_content += '''
+  <navMap>
+{nav_points}
   </navMap>
-</ncx>'''
-        
-        with open(ncx_path, "w", encoding="utf-8") as f:
-            f.write(ncx_content)
-        
-        # 创建OPF文件
-        opf_path = oebps_dir / "content.opf"
-        opf_content = f'''<?xml version="1.0" encoding="utf-8"?>
-<package xmlns="http://www.idpf.org/2007/opf" version="2.0" unique-identifier="BookId">
+</ncx>"""
+
+OPF_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="BookId">
   <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">
-    <dc:title>{book.title}</dc:title>'''
-        
-        # 添加作者
-        if hasattr(book, 'metadata') and 'creator' in book.metadata:
-            for creator in book.metadata['creator']:
-                opf_content += f'''
-    <dc:creator>{creator[0]}</dc:creator>'''
-        
-        # 添加语言
-        opf_content += f'''
-    <dc:language>{book.language}</dc:language>'''
-        
-        # 添加唯一标识符
-        unique_id = str(uuid.uuid4())
-        opf_content += f'''
-    <dc:identifier id="BookId">urn:uuid:{unique_id}</dc:identifier>'''
+{metadata}
+  </metadata>
+  <manifest>
+{manifest}
+  </manifest>
+  <spine toc="ncx">
+{spine}
+  </spine>
+</package>"""
+
+
+def render_xhtml(title, body, language):
+    """
+    生成完整的XHTML文档
+    
+    Args:
+        title: 已转义的页面标题
+        body: <body>中的HTML内容
+        language: 语言代码
+    
+    Returns:
+        str: XHTML文档
+    """
+    return XHTML_TEMPLATE.format(title=title, body=body, language=escape_html(language))
+
+
+def render_chapter(title, content, language):
+    """
+    将章节文本渲染为XHTML
+    
+    Args:
+        title: 章节标题（未转义）
+        content: 章节正文
+        language: 语言代码
+    
+    Returns:
+        str: XHTML文档
+    """
+    safe_title = escape_html(title)
+    
+    # 格式化段落（先收集再一次性拼接，避免长章节反复复制字符串）
+    paragraphs_html = "".join(
+        f'<p>{escape_html(line)}</p>\n' for line in (p.strip() for p in content.split('\n')) if line
+    )
+    
+    if not paragraphs_html.strip():
+        paragraphs_html = f"<p>（《{safe_title}》章节内容为空）</p>"
+    
+    return render_xhtml(safe_title, f"    <h1>{safe_title}</h1>\n    {paragraphs_html}", language)
+
+
+def _render_chapter_batch(batch, language):
+    """
+    读取并渲染一批章节（串行与进程池共用）
+    
+    Args:
+        batch: [(章节序号, 文件路径, 章节标题), ...]
+        language: 语言代码
+    
+    Returns:
+        list: 与输入顺序一致的 (章节序号, XHTML, 错误信息) 列表
+    """
+    results = []
+    for index, path, title in batch:
+        try:
+            results.append((index, render_chapter(title, read_txt_content(path), language), None))
+        except Exception as e:
+            results.append((index, None, str(e)))
+    return results
+
+
+def iter_rendered_chapters(chapters, language, jobs=1, indices=None):
+    """
+    按章节顺序返回渲染好的XHTML
+    
+    jobs 大于1时，读取、解码、转义和模板渲染在进程池中进行；
+    结果仍按提交顺序返回，同时在途的批次数有上限，内存不会随书籍大小增长。
+    
+    Args:
+        chapters: extract_chapters 返回的章节列表
+        language: 语言代码
+        jobs: 进程数，1 表示在当前进程中串行处理
+        indices: 只渲染这些序号的章节（按升序），默认渲染全部
+    
+    Yields:
+        tuple: (章节序号, XHTML或None, 错误信息或None)
+    """
+    if indices is None:
+        indices = range(len(chapters))
+    tasks = ((i, str(chapters[i]['path']), chapters[i]['title']) for i in indices)
+    if not jobs or jobs <= 1:
+        for task in tasks:
+            yield from _render_chapter_batch([task], language)
+        return
+    
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            batch = list(islice(tasks, RENDER_BATCH_SIZE))
+            if batch:
+                in_flight.append(executor.submit(_render_chapter_batch, batch, language))
+            if not in_flight:
+                break
+            if batch and len(in_flight) < jobs * 2:
+                continue
+            yield from in_flight.popleft().result()
+
+
+def chapter_source_hash(chapter, language):
+    """
+    计算章节的源内容指纹（原始字节 + 标题 + 语言），决定渲染结果是否可以复用
+    
+    Args:
+        chapter: extract_chapters 返回的章节信息
+        language: 语言代码
+    
+    Returns:
+        str or None: 十六进制哈希，文件无法读取时返回None
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{RENDER_VERSION}\0{chapter['title']}\0{language}\0".encode('utf-8'))
+    try:
+        with open(chapter['path'], 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def get_build_manifest_path(output_path):
+    """返回EPUB对应的增量构建清单路径（与EPUB同目录）"""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + BUILD_MANIFEST_SUFFIX)
+
+
+def load_build_manifest(output_path):
+    """
+    读取上一次构建的清单；清单不存在、格式不符或EPUB已不存在时返回None
+    
+    Returns:
+        dict or None: {"version", "identifier", "chapters": {文件名: 源内容哈希}}
+    """
+    manifest_path = get_build_manifest_path(output_path)
+    if not manifest_path.is_file() or not Path(output_path).is_file():
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取增量构建清单 {manifest_path}: {e}")
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != BUILD_MANIFEST_VERSION:
+        return None
+    if not isinstance(manifest.get('chapters'), dict):
+        return None
+    return manifest
+
+
+def save_build_manifest(output_path, identifier, chapter_hashes):
+    """
+    写出本次构建的清单（临时文件 + 重命名）
+    
+    Args:
+        output_path: EPUB路径
+        identifier: EPUB唯一标识，增量重建时保持不变
+        chapter_hashes: {章节文件名: 源内容哈希}
+    """
+    manifest_path = get_build_manifest_path(output_path)
+    tmp_path = manifest_path.with_name(manifest_path.name + ".part")
+    manifest = {'version': BUILD_MANIFEST_VERSION, 'identifier': identifier, 'chapters': chapter_hashes}
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+# 直接复制压缩数据需要使用 zipfile 的内部实现（_writecheck、start_dir、fp 等），
+# 只在写入流程与之一致的 CPython 版本上启用，其余版本使用公开接口解压后重新压缩
+_RAW_ZIP_COPY_VERSIONS = ((3, 8), (3, 13))
+_RAW_ZIP_COPY_ATTRS = ("_lock", "_writecheck", "_didModify", "start_dir", "fp", "filelist", "NameToInfo")
+
+
+def _raw_zip_copy_supported(zf):
+    """当前解释器与压缩包对象是否支持直接复制压缩数据"""
+    low, high = _RAW_ZIP_COPY_VERSIONS
+    return (sys.implementation.name == "cpython"
+            and low <= sys.version_info[:2] <= high
+            and all(hasattr(zf, name) for name in _RAW_ZIP_COPY_ATTRS))
+
+
+def _read_raw_zip_entry(zf, info):
+    """
+    读取压缩包条目的原始（压缩后）数据，不解压
+    
+    zipfile 没有公开的原始数据读取接口，这里按本地文件头格式自行定位数据区。
+    """
+    zf.fp.seek(info.header_offset)
+    header = zf.fp.read(zipfile.sizeFileHeader)
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    if fields[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"本地文件头损坏: {info.filename}")
+    name_length, extra_length = fields[10], fields[11]
+    zf.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+    data = zf.fp.read(info.compress_size)
+    if len(data) != info.compress_size:
+        raise zipfile.BadZipFile(f"条目数据不完整: {info.filename}")
+    return data
+
+
+class StreamingEpubWriter:
+    """流式EPUB写出器
+    
+    先打开输出压缩包并写入 mimetype（不压缩，必须是第一个条目）、container.xml 和样式表，
+    每个文档生成后立即压缩写入；内存中只保留 (ID, 文件名, 标题) 组成的紧凑索引，
+    最后根据索引生成 nav、NCX 和 OPF。写出时使用临时文件，完成后原子替换目标文件。
+    
+    用法:
+        writer = StreamingEpubWriter(path, title, language, author)
+        writer.add_document("chapter_1", "chapter_1.xhtml", "第一章", xhtml)
+        writer.close()
+    """
+    
+    def __init__(self, output_path, title, language='zh-CN', author=None, metadata=None, identifier=None):
+        self.output_path = Path(output_path)
+        self.title = title
+        self.language = language
+        self.author = author or "佚名"
+        self.metadata = metadata or {}
+        self.identifier = identifier or f"urn:uuid:{uuid.uuid4()}"
+        self.documents = []        # [(ID, 文件名, 标题, 是否加入目录)]，按阅读顺序
         
-        # 添加其他元数据
-        if hasattr(book, 'metadata'):
-            if 'description' in book.metadata:
-                opf_content += f'''
-    <dc:description>{book.metadata['description'][0][0]}</dc:description>'''
-            if 'publisher' in book.metadata:
-                opf_content += f'''
-    <dc:publisher>{book.metadata['publisher'][0][0]}</dc:publisher>'''
-            if 'rights' in book.metadata:
-                opf_content += f'''
-    <dc:rights>{book.metadata['rights'][0][0]}</dc:rights>'''
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.output_path.with_name(self.output_path.name + ".part")
+        self._zip = zipfile.ZipFile(self._tmp_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._raw_copy = _raw_zip_copy_supported(self._zip)
+        try:
+            self._zip.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            self._zip.writestr("META-INF/container.xml", CONTAINER_XML)
+            self._write_content(STYLE_FILE_NAME, STYLE_CSS)
+        except Exception:
+            self.abort()
+            raise
+    
+    def _write_content(self, file_name, data):
+        self._zip.writestr(f"{EPUB_CONTENT_DIR}/{file_name}", data)
+    
+    @property
+    def bytes_written(self):
+        """已写入压缩包的字节数（压缩后）"""
+        return self._zip.start_dir
+    
+    def add_document(self, item_id, file_name, title, xhtml, in_toc=True):
+        """
+        写入一个XHTML文档，并按调用顺序加入阅读顺序（spine）
         
-        opf_content += '''
-  </metadata>
-  <manifest>'''
+        Args:
+            item_id: 清单中的ID
+            file_name: 文件名（相对EPUB目录）
+            title: 目录中显示的标题（未转义）
+            xhtml: 文档内容
+            in_toc: 是否加入目录
+        """
+        self._write_content(file_name, xhtml)
+        self.documents.append((item_id, file_name, title, in_toc))
+    
+    def copy_document(self, source_zip, source_file_name, item_id, file_name, title, in_toc=True):
+        """
+        从上一次生成的EPUB中原样复制一个文档（不重新渲染）
         
-        # 添加NCX
-        opf_content += '''
-    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'''
+        支持的 CPython 版本上直接复制压缩后的数据；否则通过 ZipFile.open 解压后重新压缩写入。
         
-        # 添加样式表
-        for i, item in enumerate([i for i in book.items if isinstance(i, epub.EpubItem) and i.file_name.endswith('.css')]):
-            opf_content += f'''
-    <item id="style_{i+1}" href="{item.file_name}" media-type="text/css"/>'''
+        Args:
+            source_zip: 已打开的旧EPUB压缩包
+            source_file_name: 文档在旧EPUB中的文件名（相对EPUB目录）
+            item_id: 清单中的ID
+            file_name: 新文件名（相对EPUB目录）
+            title: 目录中显示的标题（未转义）
+            in_toc: 是否加入目录
+        """
+        source_info = source_zip.getinfo(f"{EPUB_CONTENT_DIR}/{source_file_name}")
+        zinfo = zipfile.ZipInfo(f"{EPUB_CONTENT_DIR}/{file_name}", date_time=source_info.date_time)
+        zinfo.compress_type = source_info.compress_type
+        zinfo.external_attr = source_info.external_attr
         
-        # 添加HTML文件
-        html_items = [item for item in book.items if isinstance(item, epub.EpubHtml)]
-        for item in html_items:
-            item_id_str = item.id if hasattr(item, 'id') and item.id else f"item_{html_items.index(item)+1}"
-            opf_content += f'''
-    <item id="{item_id_str}" href="{item.file_name}" media-type="application/xhtml+xml"/>'''
+        if self._raw_copy and getattr(source_zip, "fp", None) is not None:
+            self._copy_raw_entry(source_zip, source_info, zinfo)
+        else:
+            with source_zip.open(source_info) as source, self._zip.open(zinfo, 'w') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+        self.documents.append((item_id, file_name, title, in_toc))
+    
+    def _copy_raw_entry(self, source_zip, source_info, zinfo):
+        """按 ZipFile.writestr 的方式登记条目，但直接写入已压缩的数据（依赖 zipfile 内部实现）"""
+        data = _read_raw_zip_entry(source_zip, source_info)
+        zinfo.CRC = source_info.CRC
+        zinfo.file_size = source_info.file_size
+        zinfo.compress_size = len(data)
         
-        # 添加导航文件
-        for item in [item for item in book.items if isinstance(item, epub.EpubNav)]:
-            opf_content += f'''
-    <item id="nav" href="{item.file_name}" media-type="application/xhtml+xml" properties="nav"/>'''
+        zf = self._zip
+        with zf._lock:
+            zf._writecheck(zinfo)
+            zf._didModify = True
+            zf.fp.seek(zf.start_dir)
+            zinfo.header_offset = zf.fp.tell()
+            zf.fp.write(zinfo.FileHeader())
+            zf.fp.write(data)
+            zf.filelist.append(zinfo)
+            zf.NameToInfo[zinfo.filename] = zinfo
+            zf.start_dir = zf.fp.tell()
+    
+    def close(self):
+        """写出 nav、NCX 和 OPF，关闭压缩包并替换目标文件"""
+        try:
+            self._write_content("nav.xhtml", self._render_nav())
+            self._write_content("toc.ncx", self._render_ncx())
+            self._write_content("content.opf", self._render_opf())
+            self._zip.close()
+            os.replace(self._tmp_path, self.output_path)
+        except Exception:
+            self.abort()
+            raise
+    
+    def abort(self):
+        """放弃写出并删除临时文件"""
+        try:
+            self._zip.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+    
+    def _toc_entries(self):
+        return [(item_id, file_name, title) for item_id, file_name, title, in_toc in self.documents if in_toc]
+    
+    def _render_nav(self):
+        items = "\n".join(
+            f'            <li><a href="{escape_html(file_name)}">{escape_html(title)}</a></li>'
+            for _, file_name, title in self._toc_entries()
+        )
+        body = (f'    <nav epub:type="toc" id="toc" role="doc-toc">\n'
+                f'        <h2>{escape_html(self.title)}</h2>\n'
+                f'        <ol>\n{items}\n        </ol>\n'
+                f'    </nav>')
+        return render_xhtml(escape_html(self.title), body, self.language)
+    
+    def _render_ncx(self):
+        nav_points = "\n".join(
+            NCX_NAV_POINT_TEMPLATE.format(item_id=escape_html(item_id), order=order,
+                                          title=escape_html(title), file_name=escape_html(file_name))
+            for order, (item_id, file_name, title) in enumerate(self._toc_entries(), 1)
+        )
+        return NCX_TEMPLATE.format(identifier=self.identifier, title=escape_html(self.title),
+                                   nav_points=nav_points)
+    
+    def _render_opf(self):
+        modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        metadata = [
+            f'    <dc:identifier id="BookId">{self.identifier}</dc:identifier>',
+            f'    <dc:title>{escape_html(self.title)}</dc:title>',
+            f'    <dc:language>{escape_html(self.language)}</dc:language>',
+            f'    <dc:creator id="creator">{escape_html(self.author)}</dc:creator>',
+        ]
+        for name, value in self.metadata.items():
+            metadata.append(f'    <dc:{name}>{escape_html(value)}</dc:{name}>')
+        metadata.append(f'    <meta property="dcterms:modified">{modified}</meta>')
         
-        opf_content += '''
-  </manifest>
-  <spine toc="ncx">'''
+        manifest = [
+            f'    <item id="style" href="{STYLE_FILE_NAME}" media-type="text/css"/>',
+            '    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>',
+            '    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+        ]
+        spine = ['    <itemref idref="nav"/>']
+        for item_id, file_name, _, _ in self.documents:
+            manifest.append(f'    <item id="{escape_html(item_id)}" href="{escape_html(file_name)}" '
+                            f'media-type="application/xhtml+xml"/>')
+            spine.append(f'    <itemref idref="{escape_html(item_id)}"/>')
         
-        # 添加所有项目到spine
-        for item in book.spine:
-            if item == 'nav':
-                opf_content += '''
-    <itemref idref="nav"/>'''
-            elif isinstance(item, epub.EpubHtml):
-                item_id_str = item.id if hasattr(item, 'id') and item.id else f"item_{html_items.index(item)+1}"
-                opf_content += f'''
-    <itemref idref="{item_id_str}"/>'''
+        return OPF_TEMPLATE.format(metadata="\n".join(metadata), manifest="\n".join(manifest),
+                                   spine="\n".join(spine))
+
+
+def plan_volumes(chapters, volume_size=None, volume_chars=None):
+    """
+    将章节划分为多个分卷，分卷边界尽量落在整数章节号上
+    
+    - 按章节数分卷：第k卷包含章节号在 ((k-1)*N, k*N] 内的章节，如 1-500、501-1000
+    - 按字数分卷：累计字数达到上限附近（±10%）时，优先在章节号为 100/50/10 的倍数处分卷
+    
+    Args:
+        chapters: extract_chapters 返回的章节列表（已按章节号排序）
+        volume_size: 每卷章节数
+        volume_chars: 每卷字数上限
+    
+    Returns:
+        list: [(起始下标, 结束下标(不含)), ...]
+    """
+    if not chapters:
+        return []
+    
+    if volume_size:
+        volumes = []
+        start = 0
+        current = None
+        for i, chapter in enumerate(chapters):
+            key = (max(chapter['number'], 1) - 1) // volume_size
+            if current is not None and key != current and i > start:
+                volumes.append((start, i))
+                start = i
+            current = key
+        volumes.append((start, len(chapters)))
+        return volumes
+    
+    if not volume_chars:
+        return [(0, len(chapters))]
+    
+    lengths = [len(read_txt_content(chapter['path'])) for chapter in chapters]
+    
+    def roundness(index):
+        number = chapters[index]['number']
+        for level, base in enumerate((100, 50, 10)):
+            if number % base == 0:
+                return 3 - level
+        return 0
+    
+    volumes = []
+    start = 0
+    while start < len(chapters):
+        total = 0
+        low = high = crossing = None
+        for i in range(start, len(chapters)):
+            total += lengths[i]
+            if low is None and total >= volume_chars * 0.9:
+                low = i
+            if crossing is None and total >= volume_chars:
+                crossing = i
+            if total > volume_chars * 1.1:
+                break
+            high = i
+        if crossing is None:
+            # 剩余内容不足一卷
+            volumes.append((start, len(chapters)))
+            break
         
-        opf_content += '''
-  </spine>
-  <guide>'''
+        high = max(high if high is not None else crossing, low if low is not None else crossing)
+        candidates = range(low if low is not None else crossing, high + 1)
+        # 在允许范围内选择最“整”的章节号作为卷末，同等情况下选最接近字数上限的位置
+        end = max(candidates, key=lambda i: (roundness(i), -abs(i - crossing)))
+        volumes.append((start, end + 1))
+        start = end + 1
+    return volumes
+
+
+def get_volume_output_path(output_path, volume_number):
+    """返回分卷EPUB的路径：书名_脱水.epub -> 书名_脱水_第1卷.epub"""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}_第{volume_number}卷{output_path.suffix}")
+
+
+def add_cover_page(writer, book_name, author, language, subtitle=None):
+    """
+    写出封面页
+
+    Args:
+        writer: StreamingEpubWriter
+        book_name: 书名
+        author: 作者
+        language: 语言代码
+        subtitle: 封面上书名下方的附加说明
+
+    Returns:
+        int: 目录页在阅读顺序中应插入的位置（封面之后）
+    """
+    subtitle_html = f'\n        <p class="author">{escape_html(subtitle)}</p>' if subtitle else ''
+    cover_body = f'''    <div class="cover">
+        <h1 class="cover">{escape_html(book_name)}</h1>{subtitle_html}
+        <p class="author">作者：{escape_html(author)}</p>
+    </div>'''
+    writer.add_document('cover', 'cover.xhtml', '封面', render_xhtml('封面', cover_body, language))
+    return len(writer.documents)
+
+
+def add_toc_page(writer, written_chapters, toc_position, language):
+    """
+    在全部章节写出后生成目录页，并放回阅读顺序中的 toc_position
+
+    Args:
+        writer: StreamingEpubWriter
+        written_chapters: [(文件名, 章节标题), ...]
+        toc_position: add_cover_page 返回的位置
+        language: 语言代码
+    """
+    toc_links = "".join(f'<p><a href="{file_name}">{escape_html(title)}</a></p>\n'
+                        for file_name, title in written_chapters)
+    toc_body = f'    <h1>目录</h1>\n<div class="toc">{toc_links}</div>'
+    writer.add_document('toc', 'toc.xhtml', '目录', render_xhtml('目录', toc_body, language))
+    writer.documents.insert(toc_position, writer.documents.pop())
+
+
+def build_epub(chapters, output_path, book_name, author=None, language='zh-CN', jobs=1, incremental=False,
+               title=None, subtitle=None, chapter_offset=0, update_progress_func=None):
+    """
+    将一组章节写出为一个EPUB文件
+    
+    Args:
+        chapters: extract_chapters 返回的章节列表
+        output_path: 输出EPUB路径
+        book_name: 书名
+        author: 作者
+        language: 语言代码
+        jobs: 并行渲染章节的进程数
+        incremental: 是否复用上一次EPUB中未变化的章节
+        title: EPUB元数据中的标题，默认为书名（分卷时为“书名 第N卷”）
+        subtitle: 封面上书名下方的附加说明（如分卷的章节范围）
+        chapter_offset: 章节文件编号的起始偏移（分卷时保持与整本书一致的编号）
+        update_progress_func: 可选的进度回调 (已写出章节数, 章节总数, 状态)，每写出一章调用一次
+    
+    Returns:
+        str or None: 输出路径，失败时返回None
+    """
+    writer = None
+    previous_zip = None
+    title = title or book_name
+    author = author or "佚名"
+    try:
+        # 增量构建：找出可以从上一次EPUB中复用的章节
+        chapter_hashes = []
+        reusable = {}              # 章节序号 -> 旧EPUB中的文件名
+        identifier = None
+        if incremental:
+            chapter_hashes = [chapter_source_hash(chapter, language) for chapter in chapters]
+            previous = load_build_manifest(output_path)
+            if previous:
+                try:
+                    previous_zip = zipfile.ZipFile(output_path, 'r')
+                    existing = set(previous_zip.namelist())
+                    by_hash = {h: name for name, h in previous['chapters'].items()
+                               if f"{EPUB_CONTENT_DIR}/{name}" in existing}
+                    reusable = {i: by_hash[h] for i, h in enumerate(chapter_hashes) if h and h in by_hash}
+                    identifier = previous.get('identifier')
+                except (OSError, zipfile.BadZipFile) as e:
+                    logger.warning(f"无法读取上一次生成的EPUB，将完整重建: {e}")
+                    previous_zip = None
+                    reusable = {}
+            logger.info(f"增量构建: 复用 {len(reusable)} 章，重新渲染 {len(chapters) - len(reusable)} 章")
         
-        # 添加封面和目录到指南
-        for item in book.items:
-            if isinstance(item, epub.EpubHtml):
-                if 'cover' in item.file_name:
-                    opf_content += f'''
-    <reference type="cover" title="Cover" href="{item.file_name}"/>'''
-                elif 'toc' in item.file_name:
-                    opf_content += f'''
-    <reference type="toc" title="Table of Contents" href="{item.file_name}"/>'''
+        writer = StreamingEpubWriter(output_path, title, language, author, {
+            'description': f'{title} - 由AI小说工具生成',
+            'publisher': 'AI小说工具',
+            'rights': '版权归原作者所有',
+        }, identifier=identifier)
         
-        opf_content += '''
-  </guide>
-</package>'''
+        # 添加封面页；目录页在阅读顺序中位于正文之前，但内容要等全部章节写出后才能确定
+        toc_position = add_cover_page(writer, book_name, author, language, subtitle)
         
-        with open(opf_path, "w", encoding="utf-8") as f:
-            f.write(opf_content)
+        # 读取、渲染章节，按阅读顺序写出（未变化的章节直接复制）
+        written_chapters = []
+        manifest_chapters = {}
+        rendered = iter_rendered_chapters(chapters, language, jobs,
+                                          [i for i in range(len(chapters)) if i not in reusable])
+        for i, chapter in enumerate(chapters):
+            chapter_id = f'chapter_{chapter_offset + i + 1}'
+            file_name = f'{chapter_id}.xhtml'
+            if i in reusable:
+                try:
+                    writer.copy_document(previous_zip, reusable[i], chapter_id, file_name, chapter['title'])
+                    xhtml = error = None
+                except (KeyError, OSError, zipfile.BadZipFile) as e:
+                    logger.warning(f"无法复用章节 '{chapter['title']}'，重新渲染: {e}")
+                    _, xhtml, error = _render_chapter_batch([(i, str(chapter['path']), chapter['title'])], language)[0]
+            else:
+                _, xhtml, error = next(rendered)
+            
+            if update_progress_func:
+                update_progress_func(i + 1, len(chapters),
+                                     f"{chapter['title']}（已压缩 {writer.bytes_written / 1024 / 1024:.2f} MB）")
+            if error is not None:
+                logger.error(f"添加章节 '{chapter['title']}' 时出错: {error}")
+                continue
+            if xhtml is not None:
+                writer.add_document(chapter_id, file_name, chapter['title'], xhtml)
+            written_chapters.append((file_name, chapter['title']))
+            if incremental and chapter_hashes[i]:
+                manifest_chapters[file_name] = chapter_hashes[i]
         
-        # 创建EPUB文件（ZIP格式）
-        if output_path.exists():
-            output_path.unlink()
+        # 复用的章节已全部复制；先关闭旧EPUB，Windows 上打开中的文件无法被替换
+        if previous_zip is not None:
+            previous_zip.close()
+            previous_zip = None
         
-        logger.info(f"创建EPUB文件: {output_path}")
+        if not written_chapters:
+            logger.error("没有成功添加任何章节，无法继续生成EPUB")
+            writer.abort()
+            return None
         
-        with zipfile.ZipFile(output_path, 'w') as epub_file:
-            # 首先添加mimetype文件，不压缩
-            epub_file.write(mimetype_path, "mimetype", compress_type=zipfile.ZIP_STORED)
-
-            # 添加其他所有文件，使用压缩
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    if file != "mimetype":
-                        file_path = Path(root) / file
-                        arcname = str(file_path.relative_to(temp_dir))
-                        epub_file.write(file_path, arcname, compress_type=zipfile.ZIP_DEFLATED)
-
-        # 清理临时目录
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        # 添加目录页，并放回封面之后
+        add_toc_page(writer, written_chapters, toc_position, language)
         
-        # 验证生成的文件
-        if output_path.exists() and output_path.stat().st_size > 1000:
-            logger.info(f"EPUB文件已生成: {output_path}, 大小: {output_path.stat().st_size/1024:.2f} KB")
-            return True
-        else:
-            logger.error(f"生成的EPUB文件失败或文件过小: {output_path}")
-            return False
+        # 写出导航与OPF，完成EPUB文件
+        writer.close()
+        if incremental:
+            save_build_manifest(output_path, writer.identifier, manifest_chapters)
+        size_kb = Path(output_path).stat().st_size / 1024
+        logger.info(f"EPUB文件已生成: {output_path}, 大小: {size_kb:.2f} KB, 共 {len(written_chapters)} 章")
+        return str(output_path)
     except Exception as e:
-        logger.error(f"创建EPUB文件时出错: {e}")
+        logger.error(f"生成EPUB文件 {output_path} 时出错: {e}")
         import traceback
         logger.error(f"详细错误: {traceback.format_exc()}")
-        try:
-            if 'temp_dir' in locals() and isinstance(temp_dir, Path) and temp_dir.exists():
-                shutil.rmtree(temp_dir, ignore_errors=True)
-        except Exception:
-            pass
-        return False
+        if writer is not None:
+            writer.abort()
+        return None
+    finally:
+        if previous_zip is not None:
+            previous_zip.close()
 
 
-def merge_txt_to_epub(folder_path, output_path=None, author=None, novel_name=None, language='zh-CN'):
-    """将文件夹中的txt文件合并为epub"""
+def _build_volume(volume):
+    """进程池任务：写出一个分卷（参数为 build_epub 的关键字参数）"""
+    return build_epub(**volume)
+
+
+def merge_txt_to_epub(folder_path, output_path=None, author=None, novel_name=None, language='zh-CN', jobs=1,
+                      incremental=False, volume_size=None, volume_chars=None, update_progress_func=None):
+    """将文件夹中的txt文件合并为epub（逐章渲染并写出，jobs 大于1时用进程池并行渲染章节）
+    
+    incremental 为True时，根据EPUB旁的构建清单找出源内容未变化的章节，
+    直接复制上一次EPUB中已压缩的数据，只重新渲染有变化的章节。
+    
+    指定 volume_size（每卷章节数）或 volume_chars（每卷字数）时输出多个分卷，
+    文件名为 书名_脱水_第N卷.epub，各卷有独立的目录并使用相同的样式表，
+    jobs 大于1时各卷在进程池中并行写出。此时返回分卷路径列表。
+
+    update_progress_func(当前, 总数, 状态) 在每写出一章后调用；
+    分卷并行写出时改为每完成一卷调用一次。
+    """
     try:
         folder_path = Path(folder_path)
         
@@ -472,8 +900,8 @@ def merge_txt_to_epub(folder_path, output_path=None, author=None, novel_name=Non
             logger.error(f"文件夹不存在或不是有效目录: {folder_path}")
             return None
         
-        # 获取所有txt文件
-        txt_files = [f.name for f in folder_path.iterdir() if f.suffix.lower() == '.txt']
+        # 获取所有txt文件（单次扫描目录，与脱水模块共用章节文件索引）
+        txt_files = list(get_chapter_file_index(folder_path).names)
         if not txt_files:
             logger.error(f"在 {folder_path} 中没有找到TXT文件")
             return None
@@ -495,194 +923,55 @@ def merge_txt_to_epub(folder_path, output_path=None, author=None, novel_name=Non
         if not output_path:
             output_path = folder_path / f"{book_name}_脱水.epub"
         
-        # 创建EPUB书籍
-        book = epub.EpubBook()
-        book.set_title(book_name)
-        book.set_language(language)
-        
-        if author:
-            book.add_author(author)
-        else:
-            book.add_author("佚名")
-        
-        # 添加CSS
-        style = '''
-        @namespace epub "http://www.idpf.org/2007/ops";
-        body { 
-            font-family: "Noto Serif CJK SC", "Source Han Serif CN", SimSun, serif; 
-            margin: 5%; 
-            line-height: 1.5;
-        }
-        h1 { 
-            text-align: center;
-            font-size: 1.5em;
-            margin: 1em 0;
-        }
-        p { 
-            text-indent: 2em; 
-            margin: 0.3em 0;
-        }
-        .cover {
-            text-align: center;
-            margin: 3em 0;
-        }
-        .author {
-            text-align: center;
-            margin: 1em 0;
-        }
-        .toc a {
-            text-decoration: none;
-            color: black;
-        }
-        '''
-        css = epub.EpubItem(uid="style", file_name="style.css", media_type="text/css", content=style)
-        book.add_item(css)
-        
-        # 添加封面页
-        cover = epub.EpubHtml(title='封面', file_name='cover.xhtml', lang=language)
-        cover.content = f'''<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
-<head>
-    <title>封面</title>
-    <link rel="stylesheet" type="text/css" href="style.css" />
-    <meta http-equiv="Content-Type" content="text/html; charset=UTF-8" />
-</head>
-<body>
-    <div class="cover">
-        <h1 class="cover">{book_name}</h1>
-        <p class="author">作者：{author if author else "佚名"}</p>
-    </div>
-</body>
-</html>'''.encode("utf-8")
-        book.add_item(cover)
-        cover.add_link(href="style.css", rel="stylesheet", type="text/css")
-        
-        # 添加目录页
-        toc_content = '<h1>目录</h1>\n<div class="toc">'
-        for i, chapter in enumerate(chapters):
-            safe_title = escape_html(chapter["title"])
-            chapter_num = i + 1
-            toc_content += f'<p><a href="chapter_{chapter_num}.xhtml">{safe_title}</a></p>\n'
-        toc_content += '</div>'
-        
-        toc_page = epub.EpubHtml(title='目录', file_name='toc.xhtml', lang=language)
-        toc_page.content = f'''<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
-<head>
-    <title>目录</title>
-    <link rel="stylesheet" type="text/css" href="style.css" />
-    <meta http-equiv="Content-Type" content="text/html; charset=UTF-8" />
-</head>
-<body>
-    {toc_content}
-</body>
-</html>'''.encode("utf-8")
-        book.add_item(toc_page)
-        toc_page.add_link(href="style.css", rel="stylesheet", type="text/css")
-        
-        # 添加章节
-        epub_chapters = []
-        success_count = 0
-        
-        for i, chapter in enumerate(chapters):
-            try:
-                content = read_txt_content(chapter['path'])
-                
-                # 格式化段落
-                paragraphs_html = ""
-                for p in content.split('\n'):
-                    if p.strip():
-                        paragraphs_html += f'<p>{escape_html(p.strip())}</p>\n'
-                
-                if not paragraphs_html.strip():
-                    safe_title = escape_html(chapter['title'])
-                    paragraphs_html = f"<p>（《{safe_title}》章节内容为空）</p>"
-                
-                # 创建章节
-                chapter_id = f'chapter_{i+1}'
-                file_name = f'{chapter_id}.xhtml'
-                safe_title = escape_html(chapter['title'])
-                
-                c = epub.EpubHtml(uid=chapter_id, title=safe_title, file_name=file_name, lang=language)
-                c.content = f'''<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
-<head>
-    <title>{safe_title}</title>
-    <link rel="stylesheet" type="text/css" href="style.css" />
-    <meta http-equiv="Content-Type" content="text/html; charset=UTF-8" />
-</head>
-<body>
-    <h1>{safe_title}</h1>
-    {paragraphs_html}
-</body>
-</html>'''.encode("utf-8")
-                
-                c.add_link(href="style.css", rel="stylesheet", type="text/css")
-                book.add_item(c)
-                epub_chapters.append(c)
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"添加章节 '{chapter['title']}' 时出错: {e}")
-        
-        if success_count == 0:
-            logger.error("没有成功添加任何章节，无法继续生成EPUB")
-            return None
+        if not volume_size and not volume_chars:
+            result = build_epub(chapters, output_path, book_name, author, language, jobs, incremental,
+                                update_progress_func=update_progress_func)
+            if result:
+                logger.info(f"EPUB文件已成功生成: {result}")
+            return result
         
-        # 添加导航
-        book.add_item(epub.EpubNcx())
-        nav = epub.EpubNav()
-        # ebooklib 0.17.1: 若 nav 文档 body 为空，write_epub 在生成导航页时会触发 lxml "Document is empty"
-        # 提供最小 XHTML skeleton，后续由 writer 注入真正的 toc 内容。
-        nav.content = f'''<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
-<head>
-    <title>Navigation</title>
-    <meta http-equiv="Content-Type" content="text/html; charset=UTF-8" />
-</head>
-<body>
-    <nav epub:type="toc" id="toc">
-        <ol></ol>
-    </nav>
-</body>
-</html>'''.encode("utf-8")
-        nav.add_link(href="style.css", rel="stylesheet", type="text/css")
-        book.add_item(nav)
-        
-        # 设置书籍脊柱（阅读顺序）
-        spine = ['nav', cover, toc_page]
-        for chapter in epub_chapters:
-            spine.append(chapter)
-        book.spine = spine
-        
-        # 设置目录
-        book.toc = [
-            epub.Link('cover.xhtml', '封面', 'cover'),
-            epub.Link('toc.xhtml', '目录', 'toc')
-        ]
-        
-        for i, chapter in enumerate(epub_chapters):
-            chapter_num = i + 1
-            book.toc.append(epub.Link(f'chapter_{chapter_num}.xhtml', chapter.title, f'chapter_{chapter_num}'))
-        
-        # 添加元数据
-        unique_id = str(uuid.uuid4())
-        book.add_metadata('DC', 'description', f'{book_name} - 由AI小说工具生成')
-        book.add_metadata('DC', 'publisher', 'AI小说工具')
-        book.add_metadata('DC', 'rights', '版权归原作者所有')
-        book.add_metadata('DC', 'identifier', f'uuid:{unique_id}', {'id': 'unique-id'})
+        # 分卷输出
+        volumes = []
+        for number, (start, end) in enumerate(plan_volumes(chapters, volume_size, volume_chars), 1):
+            first, last = chapters[start]['number'], chapters[end - 1]['number']
+            volumes.append({
+                'chapters': chapters[start:end],
+                'output_path': str(get_volume_output_path(output_path, number)),
+                'book_name': book_name,
+                'author': author,
+                'language': language,
+                'incremental': incremental,
+                'title': f"{book_name} 第{number}卷",
+                'subtitle': f"第{number}卷（第{first}-{last}章）",
+                'chapter_offset': start,
+            })
+        logger.info(f"共 {len(chapters)} 章，分为 {len(volumes)} 卷")
         
-        # 创建EPUB文件
-        if write_epub(book, output_path):
-            logger.info(f"EPUB文件已成功生成: {output_path}")
-            return str(output_path)
+        if jobs and jobs > 1 and len(volumes) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(volumes))) as executor:
+                results = []
+                for result in executor.map(_build_volume, volumes):
+                    results.append(result)
+                    if update_progress_func:
+                        update_progress_func(len(results), len(volumes), f"已完成 {len(results)}/{len(volumes)} 卷")
         else:
-            logger.error("创建EPUB文件失败")
+            results = []
+            for volume in volumes:
+                if update_progress_func:
+                    # 串行写出时按全书章节数汇报进度
+                    offset, number = volume['chapter_offset'], len(results) + 1
+                    volume['update_progress_func'] = (
+                        lambda current, total, status, offset=offset, number=number:
+                        update_progress_func(offset + current, len(chapters), f"第{number}卷 - {status}")
+                    )
+                results.append(_build_volume(volume))
+        
+        failed = [volume['output_path'] for volume, result in zip(volumes, results) if not result]
+        if failed:
+            logger.error(f"有 {len(failed)} 个分卷生成失败: {', '.join(failed)}")
             return None
+        logger.info(f"EPUB分卷已成功生成: {len(results)} 个文件")
+        return results
     except Exception as e:
         logger.error(f"合并TXT文件时出错: {e}")
         import traceback
@@ -699,6 +988,14 @@ def main():
     parser.add_argument('-a', '--author', help='设置电子书的作者（可选）')
     parser.add_argument('-n', '--name', help='设置电子书的名称（可选，默认从文件名解析）')
     parser.add_argument('-l', '--language', default='zh-CN', help='设置电子书的语言（默认：zh-CN）')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='并行渲染章节的进程数（默认：1）')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help='增量构建：复用上一次EPUB中源内容未变化的章节，只重新渲染有变化的章节')
+    volume_group = parser.add_mutually_exclusive_group()
+    volume_group.add_argument('--volume-size', type=int, default=None,
+                              help='按章节数分卷输出，如 500 表示第1-500章为第1卷（可选）')
+    volume_group.add_argument('--volume-chars', type=int, default=None,
+                              help='按字数分卷输出，分卷边界尽量落在整数章节号上（可选）')
     parser.add_argument('-v', '--verbose', action='store_true', help='显示详细日志')
     parser.add_argument('-q', '--quiet', action='store_true', help='仅显示错误信息')
     
@@ -711,7 +1008,8 @@ def main():
         setup_logger(logging.ERROR)
     
     # 执行转换
-    result = merge_txt_to_epub(args.folder, args.output, args.author, args.name, args.language)
+    result = merge_txt_to_epub(args.folder, args.output, args.author, args.name, args.language, args.jobs,
+                               args.incremental, args.volume_size, args.volume_chars)
     
     # 返回状态码
     if result:
@@ -4,6 +4,7 @@
 工具模块 - 提供项目通用的工具函数和类
 """
 
+import codecs
 import logging
 import os
 import re
@@ -84,8 +85,128 @@ def ensure_dir(directory):
     path.mkdir(parents=True, exist_ok=True)
     return path
 
+# 文本解码相关设置
+DEFAULT_TEXT_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']
+ENCODING_SNIFF_SIZE = 8192  # 用于探测编码的字节前缀长度
+
+# BOM 与对应编码（UTF-32 需要排在 UTF-16 之前，二者的小端 BOM 前缀相同）
+_TEXT_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 每个目录上次成功使用的编码，同一本书的章节文件通常编码一致
+_directory_encodings = {}
+
+# 几乎任何字节都能"解码成功"的兜底编码：只作为最后手段，不作为目录提示记忆
+_CATCH_ALL_ENCODINGS = {'latin-1', 'utf-16'}
+
+
+def _prefix_decodes(prefix, encoding):
+    """检查字节前缀能否按指定编码解码（允许末尾被截断的多字节字符）"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+def sniff_text_encoding(prefix, encodings=None):
+    """根据 BOM 和字节前缀推断编码，不需要读取完整文件
+
+    Args:
+        prefix: 文件开头的若干字节
+        encodings: 候选编码列表，默认为常见中文编码
+
+    Returns:
+        str: 推断出的编码名称；都无法解码时返回None
+    """
+    for bom, encoding in _TEXT_BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    for encoding in encodings or DEFAULT_TEXT_ENCODINGS:
+        if _prefix_decodes(prefix, encoding):
+            return encoding
+    return None
+
+
+def decode_text_bytes(data, encodings=None, hint=None):
+    """将字节解码为文本，返回 (文本, 使用的编码)
+
+    先检查 BOM；否则用字节前缀快速排除无法解码的编码，只对通过前缀检查的编码做完整解码。
+    hint 为同目录上次成功的编码：在数据确定不是 UTF-8 时优先尝试，避免逐个试错；
+    数据不能按 hint 严格解码时仍按正常顺序尝试，兜底编码不作为 hint。
+
+    Args:
+        data: 原始字节
+        encodings: 候选编码列表，按优先级排列，默认为常见中文编码
+        hint: 优先尝试的编码
+
+    Returns:
+        tuple: (解码后的文本, 编码名称)；全部失败时返回 (None, None)
+    """
+    for bom, encoding in _TEXT_BOMS:
+        if data.startswith(bom):
+            try:
+                return data.decode(encoding), encoding
+            except UnicodeDecodeError:
+                break
+
+    if encodings is None:
+        encodings = DEFAULT_TEXT_ENCODINGS
+    prefix = data[:ENCODING_SNIFF_SIZE]
+
+    candidates = list(encodings)
+    tried_hint = None
+    # UTF-8 校验严格，只有在前缀已证明不是 UTF-8 时才让提示编码越过它优先尝试
+    if (hint in candidates and hint not in _CATCH_ALL_ENCODINGS
+            and (candidates[0] == hint or not _prefix_decodes(prefix, candidates[0]))):
+        try:
+            return data.decode(hint), hint
+        except (UnicodeDecodeError, LookupError):
+            tried_hint = hint
+
+    for encoding in candidates:
+        # 先用前缀排除无法解码的编码
+        if encoding == tried_hint or not _prefix_decodes(prefix, encoding):
+            continue
+        try:
+            return data.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+        except LookupError:
+            continue
+    return None, None
+
+
+def decode_text_file(file_path, encodings=None):
+    """读取并解码文本文件，每个文件只读取一次，并记住所在目录的编码
+
+    Args:
+        file_path: 文件路径
+        encodings: 候选编码列表，默认为常见中文编码
+
+    Returns:
+        tuple: (文件内容, 编码名称)；无法解码时返回 (None, None)
+
+    Raises:
+        OSError: 文件读取失败
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    content, encoding = decode_text_bytes(data, encodings, _directory_encodings.get(directory))
+    if encoding and encoding not in _CATCH_ALL_ENCODINGS:
+        _directory_encodings[directory] = encoding
+    return content, encoding
+
+
 def read_text_file(file_path, encodings=None):
-    """读取文本文件，自动尝试不同编码
+    """读取文本文件，自动识别编码
     
     Args:
         file_path: 文件路径
@@ -96,23 +217,150 @@ def read_text_file(file_path, encodings=None):
     """
     logger = logging.getLogger(__name__)
     
-    if encodings is None:
-        encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']
+    try:
+        content, encoding = decode_text_file(file_path, encodings)
+    except Exception as e:
+        logger.error(f"读取文件 {file_path} 时发生错误: {e}")
+        return ""
     
-    file_path = Path(file_path)
+    if encoding is None:
+        logger.warning(f"警告：无法解码文件 {file_path}，将跳过该文件")
+        return ""
     
-    for encoding in encodings:
+    logger.debug(f"文件 {os.path.basename(file_path)} 使用 {encoding} 编码成功读取")
+    return content
+
+# 章节文件名中的序号格式（按优先级）：_[开始-结束]、[序号]、_序号_ 或 _序号.txt
+_CHAPTER_RANGE_RE = re.compile(r'\[(\d+)-(\d+)\]')
+_CHAPTER_BRACKET_RE = re.compile(r'\[(\d+)\]')
+_CHAPTER_UNDERSCORE_RE = re.compile(r'_(\d+)(?=[_.])')
+_ANY_DIGITS_RE = re.compile(r'(\d+)')
+
+
+def parse_chapter_range(filename):
+    """从章节文件名中解析序号范围
+
+    支持 书名_[12]_标题.txt、书名_12_标题.txt 以及合并文件 书名_[1-100].txt
+
+    Args:
+        filename: 文件名（不含目录）
+
+    Returns:
+        tuple: (起始序号, 结束序号)，单章文件两者相同；无法解析时返回None
+    """
+    match = _CHAPTER_RANGE_RE.search(filename)
+    if match:
+        start, end = int(match.group(1)), int(match.group(2))
+        return (start, end) if start <= end else (end, start)
+
+    match = _CHAPTER_BRACKET_RE.search(filename) or _CHAPTER_UNDERSCORE_RE.search(filename)
+    if match:
+        number = int(match.group(1))
+        return number, number
+    return None
+
+
+class ChapterFileIndex:
+    """目录中章节文件的序号索引
+
+    只用一次 os.scandir 扫描目录，按文件名解析出的序号建立索引，
+    之后的范围筛选都在内存中完成，避免对每个序号重复 glob。
+    """
+
+    def __init__(self, directory, suffix='.txt'):
+        self.directory = str(directory)
+        self.suffix = suffix.lower()
+        self.names = []        # 目录中所有匹配后缀的文件名（已排序）
+        self.entries = []      # (起始序号, 结束序号, 文件名)，按序号排序
+        self.loose_entries = []  # 没有规范序号、只能从任意数字推断的文件
+        self.mtime_ns = 0
+        self._scan()
+
+    def _scan(self):
         try:
-            logger.debug(f"尝试使用 {encoding} 编码读取文件 {file_path.name}")
-            with open(file_path, 'r', encoding=encoding) as f:
-                content = f.read()
-                logger.debug(f"文件 {file_path.name} 使用 {encoding} 编码成功读取")
-                return content
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            logger.error(f"读取文件 {file_path} 时发生错误: {e}")
-            break
-    
-    logger.warning(f"警告：无法解码文件 {file_path}，将跳过该文件")
-    return "" 
\ No newline at end of file
+            self.mtime_ns = os.stat(self.directory).st_mtime_ns
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.lower().endswith(self.suffix):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    self.names.append(entry.name)
+        except OSError as e:
+            logging.getLogger(__name__).error(f"扫描目录 {self.directory} 时出错: {e}")
+
+        self.names.sort()
+        for name in self.names:
+            chapter_range = parse_chapter_range(name)
+            if chapter_range:
+                self.entries.append((chapter_range[0], chapter_range[1], name))
+                continue
+            match = _ANY_DIGITS_RE.search(name)
+            if match:
+                number = int(match.group(1))
+                self.loose_entries.append((number, number, name))
+        self.entries.sort()
+        self.loose_entries.sort()
+
+    def path(self, name):
+        """返回文件名对应的完整路径"""
+        return os.path.join(self.directory, name)
+
+    def names_in_range(self, start, end, include_loose=False):
+        """返回序号与 [start, end] 有交集的文件名，按序号排序"""
+        entries = self.entries + self.loose_entries if include_loose else self.entries
+        matched = [(s, name) for s, e, name in entries if s <= end and e >= start]
+        matched.sort()
+        return [name for _, name in matched]
+
+    def files_in_range(self, start, end, include_loose=False):
+        """返回序号与 [start, end] 有交集的文件完整路径，按序号排序"""
+        return [self.path(name) for name in self.names_in_range(start, end, include_loose)]
+
+
+_chapter_index_cache = {}
+
+
+def get_chapter_file_index(directory, suffix='.txt'):
+    """获取目录的章节文件索引，目录未变化时复用上次扫描结果
+
+    Args:
+        directory: 目录路径
+        suffix: 文件后缀，默认 .txt
+
+    Returns:
+        ChapterFileIndex: 章节文件索引
+    """
+    key = (os.path.abspath(str(directory)), suffix.lower())
+    try:
+        mtime_ns = os.stat(key[0]).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+
+    index = _chapter_index_cache.get(key)
+    if index is None or mtime_ns is None or index.mtime_ns != mtime_ns:
+        index = ChapterFileIndex(directory, suffix)
+        _chapter_index_cache[key] = index
+    return index
+
+
+def filter_files_by_chapter_range(file_paths, start, end):
+    """按文件名中的章节序号筛选文件
+
+    Args:
+        file_paths: 文件路径列表
+        start: 起始序号
+        end: 结束序号
+
+    Returns:
+        list: 序号在范围内的文件路径（保持原顺序）
+    """
+    selected = []
+    for file_path in file_paths:
+        chapter_range = parse_chapter_range(os.path.basename(file_path))
+        if chapter_range and chapter_range[0] <= end and chapter_range[1] >= start:
+            selected.append(file_path)
+    return selected
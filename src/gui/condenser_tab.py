@@ -5,6 +5,7 @@
 """
 
 import os
+import importlib
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
                            QFileDialog, QMessageBox, QProgressBar, QTextEdit,
                            QSpinBox, QGroupBox, QLineEdit, QCheckBox, QComboBox, QFrame,
@@ -14,7 +15,9 @@ from PyQt5.QtCore import pyqtSignal, Qt
 from PyQt5.QtGui import QFont
 
 from src.core.novel_condenser import config, key_manager
-import src.core.novel_condenser.main as main_module
+# 包的 __init__ 导出了同名的 main 函数，需通过 importlib 取得模块本身
+main_module = importlib.import_module("src.core.novel_condenser.main")
+from src.core.utils import get_chapter_file_index
 
 from .worker import WorkerThread
 from .prompt_edit_dialog import PromptEditDialog
@@ -519,12 +522,11 @@ class CondenserTab(QWidget):
         self.txt_files = []
         files_text = ""
         
-        # 查找所有TXT文件
-        for file_name in os.listdir(folder_path):
-            if file_name.endswith('.txt'):
-                file_path = os.path.join(folder_path, file_name)
-                self.txt_files.append(file_path)
-                files_text += f"{file_name}\n"
+        # 查找所有TXT文件（章节索引只扫描一次目录，后续范围筛选复用）
+        index = get_chapter_file_index(folder_path)
+        for file_name in index.names:
+            self.txt_files.append(index.path(file_name))
+            files_text += f"{file_name}\n"
         
         # 更新文件列表显示
         self.files_text.setText(files_text)
@@ -559,8 +561,8 @@ class CondenserTab(QWidget):
                                   "未找到有效的API密钥配置。请先在设置中配置API密钥。")
                 return
         
-        # 获取当前选择的API类型，确保使用混合模式
-        api_type = "mixed"  # 始终使用混合模式
+        # 获取API类型与脱水比例（一键脱水共用同一设置）
+        condense_settings = self.get_condense_settings()
         
         # 检查Gemini API密钥管理器
         gemini_initialized = False
@@ -617,8 +619,8 @@ class CondenserTab(QWidget):
             QMessageBox.warning(self, "错误", "请选择有效的脱水输出目录")
             return
             
-        # 计算当前的目标脱水比例
-        target_ratio = (self.min_ratio_spin.value() + self.max_ratio_spin.value()) // 2
+        # 当前的目标脱水比例
+        target_ratio = condense_settings['target_condensation_ratio']
         
         # 准备参数
         args = {
@@ -627,10 +629,7 @@ class CondenserTab(QWidget):
             'end_chapter': self.end_chapter_spin.value(),
             'output_dir': self.output_dir,
             'force_regenerate': self.force_regenerate_checkbox.isChecked(),
-            'api_type': api_type,  # 始终使用混合模式
-            'min_condensation_ratio': self.min_ratio_spin.value(),
-            'max_condensation_ratio': self.max_ratio_spin.value(),
-            'target_condensation_ratio': target_ratio
+            **condense_settings
         }
         
         # 创建并启动工作线程
@@ -702,6 +701,17 @@ class CondenserTab(QWidget):
         else:  # 如果取消了自动换行
             self.log_text.setLineWrapMode(QTextEdit.NoWrap)
     
+    def get_condense_settings(self):
+        """返回API类型与当前的脱水比例设置（脱水处理与一键脱水共用）"""
+        min_ratio = self.min_ratio_spin.value()
+        max_ratio = self.max_ratio_spin.value()
+        return {
+            'api_type': 'mixed',  # 界面不提供API类型选择，始终使用混合模式
+            'min_condensation_ratio': min_ratio,
+            'max_condensation_ratio': max_ratio,
+            'target_condensation_ratio': (min_ratio + max_ratio) // 2,
+        }
+    
     def update_min_ratio(self, value):
         """更新最小脱水比例"""
         # 确保最小比例不大于最大比例
@@ -11,6 +11,7 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushBut
 from PyQt5.QtCore import pyqtSignal, Qt
 from PyQt5.QtGui import QFont
 
+from src.core.novel_condenser import config
 from .worker import WorkerThread
 from .ui_components import (
     create_stat_card,
@@ -30,6 +31,8 @@ class EpubSplitterTab(QWidget):
         super().__init__(parent)
         self.worker_thread = None
         self.book_base_dir = ""  # 保存书名目录路径
+        # 返回脱水设置（API类型与脱水比例）的回调，由主窗口指向脱水处理标签页
+        self.condense_settings_provider = None
         self.init_ui()
     
     def init_ui(self):
@@ -99,8 +102,27 @@ class EpubSplitterTab(QWidget):
         self.chapters_per_file_spin.setValue(1)
         self.chapters_per_file_spin.valueChanged.connect(self.refresh_summary)
         
+        self.jobs_label = QLabel("并行进程数:")
+        self.jobs_spin = QSpinBox()
+        self.jobs_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.jobs_spin.setValue(min(4, self.jobs_spin.maximum()))
+        self.jobs_spin.setToolTip("使用多个进程并行解析章节，输出内容与单进程完全一致")
+        
         options_layout.addWidget(self.chapters_per_file_label)
         options_layout.addWidget(self.chapters_per_file_spin)
+        options_layout.addSpacing(12)
+        self.incremental_checkbox = QCheckBox("增量更新")
+        self.incremental_checkbox.setToolTip("只重写内容有变化的文件并删除过期文件，未变化的文件保持原修改时间")
+        
+        options_layout.addWidget(self.jobs_label)
+        options_layout.addWidget(self.jobs_spin)
+        options_layout.addSpacing(12)
+        options_layout.addWidget(self.incremental_checkbox)
+        options_layout.addSpacing(12)
+        self.keep_txt_checkbox = QCheckBox("一键脱水时保留TXT")
+        self.keep_txt_checkbox.setToolTip("一键脱水时把原文章节和脱水结果保存到输出目录，再次运行可直接复用已脱水的章节")
+        self.keep_txt_checkbox.setChecked(True)
+        options_layout.addWidget(self.keep_txt_checkbox)
         options_layout.addStretch()
         options_group.setLayout(options_layout)
         
@@ -122,7 +144,13 @@ class EpubSplitterTab(QWidget):
         style_button(self.start_button, "primary")
         self.start_button.clicked.connect(self.start_splitting)
         
+        self.pipeline_button = QPushButton("一键脱水为EPUB")
+        style_button(self.pipeline_button, "secondary")
+        self.pipeline_button.setToolTip("边分割边脱水，按章节顺序直接写出 书名_脱水.epub（使用脱水页的API配置）")
+        self.pipeline_button.clicked.connect(self.start_pipeline)
+        
         button_layout.addStretch()
+        button_layout.addWidget(self.pipeline_button)
         button_layout.addWidget(self.start_button)
         
         left_panel.addWidget(file_group)
@@ -292,7 +320,9 @@ class EpubSplitterTab(QWidget):
         args = {
             'epub_path': epub_path,
             'output_dir': output_dir,
-            'chapters_per_file': self.chapters_per_file_spin.value()
+            'chapters_per_file': self.chapters_per_file_spin.value(),
+            'jobs': self.jobs_spin.value(),
+            'incremental': self.incremental_checkbox.isChecked()
         }
         
         # 创建并启动工作线程
@@ -304,6 +334,7 @@ class EpubSplitterTab(QWidget):
         # 更新UI状态
         self.start_button.setEnabled(False)
         self.start_button.setText("分割中...")
+        self.pipeline_button.setEnabled(False)
         self.progress_bar.setValue(0)
         self.status_label.setText("正在分割EPUB文件...")
         set_label_state(self.status_label, "working")
@@ -313,10 +344,87 @@ class EpubSplitterTab(QWidget):
         self.add_log(f"开始分割EPUB文件: {epub_path}")
         self.add_log(f"输出目录: {output_dir}")
         self.add_log(f"每个文件章节数: {self.chapters_per_file_spin.value()}")
+        self.add_log(f"并行进程数: {self.jobs_spin.value()}")
+        if self.incremental_checkbox.isChecked():
+            self.add_log("增量更新: 只写入有变化的文件")
         
         # 启动线程
         self.worker_thread.start()
     
+    def start_pipeline(self):
+        """开始EPUB一键脱水（分割、脱水、合并同时进行）"""
+        epub_path = self.epub_path_edit.text()
+        output_dir = self.output_dir_edit.text()
+        
+        if not epub_path or not os.path.exists(epub_path):
+            QMessageBox.warning(self, "错误", "请选择有效的EPUB文件")
+            return
+        
+        keep_txt = self.keep_txt_checkbox.isChecked()
+        if keep_txt and (not output_dir or not os.path.exists(output_dir)):
+            QMessageBox.warning(self, "错误", "请选择有效的输出目录")
+            return
+        
+        condense_settings = self.get_condense_settings()
+        args = {
+            'epub_path': epub_path,
+            'txt_dir': output_dir if keep_txt else None,
+            'jobs': self.jobs_spin.value(),
+            **condense_settings
+        }
+        
+        self.worker_thread = WorkerThread('pipeline', args)
+        self.worker_thread.update_progress.connect(self.update_progress)
+        self.worker_thread.operation_complete.connect(self.pipeline_complete)
+        self.worker_thread.log_message.connect(self.add_log)
+        
+        # 更新UI状态
+        self.start_button.setEnabled(False)
+        self.pipeline_button.setEnabled(False)
+        self.pipeline_button.setText("脱水中...")
+        self.progress_bar.setValue(0)
+        self.status_label.setText("正在一键脱水...")
+        set_label_state(self.status_label, "working")
+        self.refresh_summary()
+        
+        self.add_log(f"开始一键脱水EPUB文件: {epub_path}")
+        self.add_log(f"API类型: {condense_settings['api_type']}，脱水比例: "
+                     f"{condense_settings['min_condensation_ratio']}%-{condense_settings['max_condensation_ratio']}%")
+        if keep_txt:
+            self.add_log(f"TXT文件保存到: {output_dir}")
+        
+        self.worker_thread.start()
+    
+    def get_condense_settings(self):
+        """获取一键脱水使用的API类型与脱水比例，与脱水处理标签页的设置一致"""
+        if self.condense_settings_provider is not None:
+            return self.condense_settings_provider()
+        return {
+            'api_type': 'mixed',
+            'min_condensation_ratio': config.MIN_CONDENSATION_RATIO,
+            'max_condensation_ratio': config.MAX_CONDENSATION_RATIO,
+            'target_condensation_ratio': config.TARGET_CONDENSATION_RATIO,
+        }
+    
+    def pipeline_complete(self, success, message):
+        """一键脱水完成的处理函数"""
+        self.start_button.setEnabled(True)
+        self.pipeline_button.setEnabled(True)
+        self.pipeline_button.setText("一键脱水为EPUB")
+        
+        if success:
+            self.status_label.setText("一键脱水完成")
+            set_label_state(self.status_label, "success")
+            self.refresh_summary()
+            self.add_log("一键脱水成功完成")
+            show_completion_dialog(self, "一键脱水完成", message)
+        else:
+            self.status_label.setText("一键脱水失败")
+            set_label_state(self.status_label, "error")
+            self.refresh_summary()
+            self.add_log(f"一键脱水失败: {message}")
+            show_error_message(self, "一键脱水失败", message)
+    
     def update_progress(self, value, message):
         """更新进度条和状态标签"""
         self.progress_bar.setValue(value)
@@ -327,6 +435,7 @@ class EpubSplitterTab(QWidget):
         """操作完成的处理函数"""
         self.start_button.setEnabled(True)
         self.start_button.setText("开始分割")
+        self.pipeline_button.setEnabled(True)
         
         if success:
             self.status_label.setText("分割完成")
@@ -12,6 +12,7 @@ from PyQt5.QtCore import QSize, pyqtSignal, Qt
 from PyQt5.QtGui import QFont
 
 from src.version import get_version_string
+from src.core.novel_condenser import key_manager
 
 from .home_tab import HomeTab
 from .epub_splitter_tab import EpubSplitterTab
@@ -34,6 +35,9 @@ class MainWindow(QMainWindow):
     
     def __init__(self):
         super().__init__()
+        # GUI 中可随时进行提示词测试，脱水运行时为其保留密钥额度
+        key_manager.attach_interactive_client()
+        
         # 设置窗口样式
         self.setWindowFlags(self.windowFlags())
         
@@ -160,6 +164,9 @@ class MainWindow(QMainWindow):
         # 连接脱水处理标签页的信号
         self.condenser_tab.condense_complete.connect(self.on_condense_complete)
         
+        # 一键脱水使用脱水处理标签页的API类型与脱水比例
+        self.epub_splitter_tab.condense_settings_provider = self.condenser_tab.get_condense_settings
+        
         # 将主窗口信号连接到标签页
         self.split_path_changed.connect(self.condenser_tab.on_split_path_changed)
         self.condense_path_changed.connect(self.txt_to_epub_tab.on_condense_path_changed)
@@ -202,4 +209,5 @@ class MainWindow(QMainWindow):
             if thread:
                 thread.stop()
                 thread.wait(1000)
+        key_manager.detach_interactive_client()
         event.accept() 
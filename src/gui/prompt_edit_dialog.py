@@ -552,24 +552,26 @@ class CondensingTestThread(WorkerThread):
         # 导入API模块
         try:
             from src.core.novel_condenser.api_service import (
-                condense_novel_gemini, condense_novel_openai, generate_novel_condenser_prompt
+                condense_novel_interactive, generate_novel_condenser_prompt
             )
         except ImportError as e:
             logger.exception(f"[调试] 导入API服务模块失败: {e}")
             return result_data
         
-        # 调用相应API
+        # 调用相应API（走交互式优先通道，批量脱水运行中也能及时返回）
         api_caller = None
         if key_type == "gemini" and hasattr(config, 'GEMINI_API_CONFIG') and key_index < len(config.GEMINI_API_CONFIG):
-            api_caller = lambda: condense_novel_gemini(
+            api_caller = lambda: condense_novel_interactive(
+                "gemini",
                 content, 
-                api_key_config=config.GEMINI_API_CONFIG[key_index],
+                config.GEMINI_API_CONFIG[key_index],
                 custom_prompt_template=custom_prompt
             )
         elif key_type == "openai" and hasattr(config, 'OPENAI_API_CONFIG') and key_index < len(config.OPENAI_API_CONFIG):
-            api_caller = lambda: condense_novel_openai(
+            api_caller = lambda: condense_novel_interactive(
+                "openai",
                 content, 
-                api_key_config=config.OPENAI_API_CONFIG[key_index],
+                config.OPENAI_API_CONFIG[key_index],
                 custom_prompt_template=custom_prompt
             )
         
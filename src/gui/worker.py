@@ -6,19 +6,22 @@
 
 import os
 import sys
-import re
 import time
 import io
 import logging
 import threading
+import importlib
 
 from PyQt5.QtCore import QThread, pyqtSignal
 
 from src.core import epub_splitter
 from src.core import txt_to_epub
+from src.core import pipeline
+from src.core.utils import filter_files_by_chapter_range
 from src.core.novel_condenser import config, file_utils, api_service, key_manager, stats
-import src.core.novel_condenser.main as main_module
 from src.core.novel_condenser.main import process_single_file, process_files_concurrently
+# 包的 __init__ 导出了同名的 main 函数，需通过 importlib 取得模块本身
+main_module = importlib.import_module("src.core.novel_condenser.main")
 from src.core.novel_condenser.file_utils import OUTPUT_DIR
 
 class LogSignalHandler(logging.Handler):
@@ -57,7 +60,7 @@ class WorkerThread(QThread):
         初始化工作线程
         
         Args:
-            operation_type: 操作类型（'split', 'condense', 'merge'）
+            operation_type: 操作类型（'split', 'condense', 'merge', 'pipeline'）
             args: 操作参数
         """
         super().__init__()
@@ -117,6 +120,8 @@ class WorkerThread(QThread):
                 self._run_condense_operation()
             elif self.operation_type == 'merge':
                 self._run_merge_operation()
+            elif self.operation_type == 'pipeline':
+                self._run_pipeline_operation()
                 
             self.operation_complete.emit(True, "操作成功完成")
         except Exception as e:
@@ -134,32 +139,43 @@ class WorkerThread(QThread):
             return "脱水处理"
         elif self.operation_type == 'merge':
             return "TXT转EPUB"
+        elif self.operation_type == 'pipeline':
+            return "一键脱水"
         return "未知操作"
     
+    def _emit_progress(self, current, total, status=None):
+        """将核心模块的进度回调 (当前, 总数, 状态) 转发为进度信号"""
+        if total <= 0:
+            return
+        progress = min(int(current * 100 / total), 99)  # 100% 留给操作真正完成时
+        self.update_progress.emit(progress, f"{current}/{total}{' - ' + status if status else ''}")
+    
     def _run_split_operation(self):
         """执行EPUB分割操作"""
         epub_path = self.args.get('epub_path')
         output_dir = self.args.get('output_dir')
         chapters_per_file = self.args.get('chapters_per_file', 1)
+        jobs = self.args.get('jobs', 1)
+        incremental = self.args.get('incremental', False)
         
         self.logger.info(f"正在分割EPUB文件: {epub_path}")
         self.logger.info(f"输出目录: {output_dir}")
         self.logger.info(f"每个文件章节数: {chapters_per_file}")
         
-        # 调用epub_splitter的函数
+        # 调用epub_splitter的函数，按已处理的文档数汇报进度
         result = epub_splitter.split_epub(
             epub_path, 
             output_dir, 
-            chapters_per_file=chapters_per_file
+            chapters_per_file=chapters_per_file,
+            jobs=jobs,
+            incremental=incremental,
+            update_progress_func=self._emit_progress
         )
         
-        # 模拟进度更新
-        for i in range(101):
-            if not self.is_running:
-                break
-            self.update_progress.emit(i, f"正在处理: {i}%")
-            time.sleep(0.02)
+        if not result:
+            raise Exception("EPUB分割失败")
         
+        self.update_progress.emit(100, "EPUB分割完成")
         self.logger.info("EPUB分割完成")
     
     def _run_condense_operation(self):
@@ -253,16 +269,8 @@ class WorkerThread(QThread):
             self.logger.info(f"当前API密钥并发数: {concurrency}")
             self.logger.info(f"可用API密钥数量: {api_count}")
         
-        # 筛选出我们需要处理的章节
-        files_to_process = []
-        for file_path in input_files:
-            # 解析文件名中的章节编号
-            file_name = os.path.basename(file_path)
-            match = re.search(r'_\[?(\d+)', file_name)
-            if match:
-                chapter_num = int(match.group(1))
-                if start_chapter <= chapter_num <= end_chapter:
-                    files_to_process.append(file_path)
+        # 筛选出我们需要处理的章节（按文件名中的章节序号）
+        files_to_process = filter_files_by_chapter_range(input_files, start_chapter, end_chapter)
         
         total_files = len(files_to_process)
         self.logger.info(f"共有{total_files}个章节需要脱水处理")
@@ -492,7 +500,8 @@ class WorkerThread(QThread):
                 folder_path,  # 第一个参数是位置参数，不使用命名参数方式
                 output_path=output_path,
                 author=author,
-                novel_name=title
+                novel_name=title,
+                update_progress_func=self._emit_progress
             )
             
             if not result:
@@ -503,15 +512,41 @@ class WorkerThread(QThread):
             self.logger.exception(f"合并TXT文件时出错: {str(e)}")
             raise
         
-        # 模拟进度更新
-        for i in range(101):
-            if not self.is_running:
-                break
-            self.update_progress.emit(i, f"正在合并: {i}%")
-            time.sleep(0.02)
-        
+        self.update_progress.emit(100, "合并完成")
         self.logger.info(f"合并完成，EPUB文件已生成: {output_path}")
     
+    def _run_pipeline_operation(self):
+        """执行EPUB一键脱水流水线（边分割边脱水，直接写出脱水后的EPUB）"""
+        epub_path = self.args.get('epub_path')
+        txt_dir = self.args.get('txt_dir')
+        jobs = self.args.get('jobs', 1)
+        api_type = self.args.get('api_type', 'mixed')
+        
+        self.logger.info(f"正在一键脱水EPUB文件: {epub_path}")
+        self.logger.info(f"TXT文件目录: {txt_dir or '(不保留)'}")
+        
+        self._stop_event = threading.Event()
+        try:
+            result = pipeline.run_pipeline(
+                epub_path,
+                api_type=api_type,
+                txt_dir=txt_dir,
+                jobs=jobs,
+                stop_event=self._stop_event,
+                update_progress_func=self._emit_progress,
+                min_condensation_ratio=self.args.get('min_condensation_ratio'),
+                max_condensation_ratio=self.args.get('max_condensation_ratio'),
+                target_condensation_ratio=self.args.get('target_condensation_ratio')
+            )
+        finally:
+            self._stop_event = None
+        
+        if not result:
+            raise Exception("一键脱水失败")
+        
+        self.update_progress.emit(100, "一键脱水完成")
+        self.logger.info(f"一键脱水完成，EPUB文件已生成: {result}")
+    
     def stop(self):
         """停止线程"""
         self.is_running = False